@@ -0,0 +1,178 @@
+'''
+Benchmark of the DCAT JSON harvester gather stage
+(ckanext.dcat.harvesters._json.DCATJSONHarvester.gather_stage)
+
+It runs the real gather stage against a local HTTP server that serves a
+paginated data.json with `--guids` datasets in pages of `--page-size`, for
+a harvest source that already has `--in-db` harvested datasets (half of
+them not in the remote anymore, so they are deleted). Pages are fetched
+over HTTP, parsed and checked for the stop condition as in a real job.
+
+The database is not used: the query for the guids already harvested is
+mocked, and the harvest objects are counted instead of saved, so only the
+gather stage itself is timed. It needs CKAN and ckanext-harvest installed,
+but not a CKAN config file.
+
+Usage:
+
+    python benchmarks/json_gather.py [--guids 100000] [--page-size 1000]
+        [--in-db 50000] [--streaming]
+'''
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from ckantoolkit import config
+
+from ckanext.harvest.model import HarvestJob, HarvestSource
+
+from ckanext.dcat.harvesters._json import (
+    STREAMING_CONFIG,
+    DCATJSONHarvester,
+)
+
+
+def _guid(i):
+    return 'http://example.com/datasets/{0}'.format(i)
+
+
+def _pages(guids, page_size):
+    pages = []
+    for start in range(0, guids, page_size):
+        pages.append(json.dumps({'dataset': [
+            {
+                'identifier': _guid(i),
+                'title': 'Dataset {0}'.format(i),
+                'description': 'Description of dataset {0}'.format(i),
+                'keyword': ['benchmark', 'dataset'],
+                'modified': '2024-01-01',
+            }
+            for i in range(start, min(start + page_size, guids))
+        ]}).encode('utf8'))
+    return pages
+
+
+def _serve(pages):
+    '''
+    Starts a local server with the data.json pages, returning the server
+    and the URL of the first page
+    '''
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_HEAD(self):
+            # Like many servers, make the harvester fall back to a GET
+            self.send_response(405)
+            self.end_headers()
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            page = int(query.get('page', ['1'])[0])
+            if page > len(pages):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = pages[page - 1]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, 'http://127.0.0.1:{0}/data.json'.format(server.server_port)
+
+
+class _Query(object):
+    '''Stand-in for the SQLAlchemy queries made by the gather stage'''
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    filter_by = filter
+
+    def update(self, *args, **kwargs):
+        return 0
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class _Writer(object):
+    '''Stand-in for HarvestObjectWriter, counting the objects by status'''
+
+    statuses = Counter()
+
+    def __init__(self, *args, **kwargs):
+        self.ids = []
+
+    def add(self, obj):
+        self.statuses[obj.extras[0].value] += 1
+        self.ids.append(len(self.ids))
+
+    def flush(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--guids', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--in-db', type=int, default=50000)
+    parser.add_argument('--streaming', action='store_true')
+    args = parser.parse_args()
+
+    config[STREAMING_CONFIG] = args.streaming
+
+    # Half of the datasets in the database are not in the remote anymore
+    in_db = [_guid(i) for i in range(args.in_db // 2)] + [
+        'http://example.com/deleted/{0}'.format(i)
+        for i in range(args.in_db - args.in_db // 2)]
+    rows = [(guid, 'package-{0}'.format(i)) for i, guid in enumerate(in_db)]
+
+    server, url = _serve(_pages(args.guids, args.page_size))
+
+    harvest_job = HarvestJob(
+        source=HarvestSource(url=url, type='dcat_json', config=None))
+    harvester = DCATJSONHarvester()
+
+    session = mock.Mock()
+    session.query.side_effect = lambda *args: _Query(rows)
+
+    def _save_gather_error(msg, job):
+        raise RuntimeError(msg)
+
+    try:
+        with mock.patch('ckanext.dcat.harvesters._json.model.Session', session), \
+                mock.patch('ckanext.dcat.harvesters._json.HarvestObjectWriter',
+                           _Writer), \
+                mock.patch.object(harvester, '_save_gather_error',
+                                  side_effect=_save_gather_error):
+            start = time.perf_counter()
+            ids = harvester.gather_stage(harvest_job)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print('gather_stage ({0}): {1:.2f} s, {2} objects ({3})'.format(
+        'streaming' if args.streaming else 'not streaming', elapsed, len(ids),
+        ', '.join('{0} {1}'.format(count, status)
+                  for status, count in sorted(_Writer.statuses.items()))))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,6 +22,14 @@ def read_dataset(_id, _format=None, package_type=None):
     return utils.read_dataset_page(_id, _format)
 
 
+def read_catalog_index(_format, package_type=None):
+    return utils.read_catalog_index_page(_format)
+
+
+def read_catalog_changes(_format, package_type=None):
+    return utils.read_catalog_changes_page(_format)
+
+
 if endpoints_enabled():
 
     # requirements={'_format': 'xml|rdf|n3|ttl|jsonld'}
@@ -32,6 +40,13 @@ if endpoints_enabled():
         view_func=read_catalog,
     )
 
+    dcat.add_url_rule(
+        utils.CATALOG_INDEX_ENDPOINT, view_func=read_catalog_index
+    )
+    dcat.add_url_rule(
+        utils.CATALOG_CHANGES_ENDPOINT, view_func=read_catalog_changes
+    )
+
     # TODO: Generalize for all dataset types
     dcat.add_url_rule(
         "/dataset_series/<_id>.<_format>",
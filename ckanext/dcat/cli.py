@@ -41,7 +41,7 @@ def _get_profiles(profiles):
 
 
 @dcat.command(context_settings={"show_default": True})
-@click.argument("input", type=click.File(mode="r"))
+@click.argument("input", type=click.File(mode="rb"))
 @click.option(
     "-o",
     "--output",
@@ -76,13 +76,14 @@ def consume(input, output, format, profiles, pretty, compat_mode):
     Or be read from stdin:
 
         ckan dcat consume -
-    """
-    contents = input.read()
 
+    The input is read by the parser as a stream, without loading it first
+    in memory.
+    """
     profiles = _get_profiles(profiles)
 
     parser = RDFParser(profiles=profiles, compatibility_mode=compat_mode)
-    parser.parse(contents, _format=format)
+    parser.parse(input, _format=format)
 
     ckan_datasets = [d for d in parser.datasets()]
 
@@ -141,5 +142,56 @@ def produce(input, output, format, profiles, compat_mode):
     output.write(out)
 
 
+@dcat.command()
+@click.argument("source_id_or_name")
+@click.option(
+    "--replay",
+    is_flag=True,
+    help="Only use the pages stored in the harvest cache, without making any "
+    "requests (requires ckanext.dcat.harvest_cache_dir)",
+)
+@click.option(
+    "--force-import",
+    is_flag=True,
+    help="Import datasets even if they have not changed",
+)
+def run_harvest(source_id_or_name, replay, force_import):
+    """
+    Runs a harvest job for a source synchronously (gather, fetch and import).
+
+    With --replay, the remote pages are read from the harvest cache instead
+    of being downloaded, so for instance profile changes can be re-applied to
+    a whole source quickly:
+
+        ckan dcat run-harvest my-source --replay
+    """
+    from ckanext.harvest.utils import run_test_harvester
+    from ckanext.dcat.harvesters.cache import CACHE_DIR_CONFIG, REPLAY_CONFIG
+
+    if replay:
+        if not tk.config.get(CACHE_DIR_CONFIG):
+            raise click.UsageError(
+                f"--replay requires {CACHE_DIR_CONFIG} to be set")
+        tk.config[REPLAY_CONFIG] = True
+
+    run_test_harvester(source_id_or_name, force_import)
+
+
+@dcat.command()
+@click.argument("job_id")
+def reindex_harvest_job(job_id):
+    """
+    Reindexes the datasets of a harvest job.
+
+    Useful when ckanext.dcat.defer_indexing is enabled and the reindex at
+    the end of the job did not run (e.g. the job was interrupted).
+    """
+    from ckanext.dcat.harvesters.base import reindex_harvest_job
+
+    total = reindex_harvest_job(job_id)
+
+    click.secho(f"Reindexed {total} datasets", fg="green")
+
+
 def get_commands():
     return [dcat]
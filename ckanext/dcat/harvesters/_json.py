@@ -1,5 +1,7 @@
+import codecs
 import json
 import logging
+import re
 from hashlib import sha1
 import traceback
 import uuid
@@ -7,16 +9,26 @@ import uuid
 import requests
 import sqlalchemy as sa
 
+from ckantoolkit import config
+
 from ckan import model
 from ckan import logic
 from ckan import plugins as p
 from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
 from ckanext.harvest.logic.schema import unicode_safe
 from ckanext.dcat import converters
-from ckanext.dcat.harvesters.base import DCATHarvester
+from ckanext.dcat.harvesters.base import (
+    DCATHarvester,
+    HarvestObjectWriter,
+    decompress_content,
+    deferred_indexing,
+    report_request_stats,
+)
 
 log = logging.getLogger(__name__)
 
+STREAMING_CONFIG = 'ckanext.dcat.json_harvester.streaming'
+
 
 class DCATJSONHarvester(DCATHarvester):
 
@@ -44,17 +56,34 @@ class DCATJSONHarvester(DCATHarvester):
 
             as_string = json.dumps(dataset)
 
-            # Get identifier
-            guid = dataset.get('identifier')
-            if not guid:
-                # This is bad, any ideas welcomed
-                guid = sha1(as_string).hexdigest()
+            yield self._get_guid(dataset, as_string), as_string
+
+    def _get_guids_and_datasets_stream(self, chunks):
+        '''
+        Same as `_get_guids_and_datasets()`, but parsing the document
+        incrementally from an iterator of chunks, and returning the raw
+        JSON of each dataset as found in the document
+        '''
+
+        for dataset, as_string in iter_json_datasets(chunks):
+
+            if not isinstance(dataset, dict):
+                raise ValueError('Wrong JSON object')
+
+            yield self._get_guid(dataset, as_string), as_string
+
+    def _get_guid(self, dataset, as_string):
 
-            yield guid, as_string
+        guid = dataset.get('identifier')
+        if not guid:
+            # This is bad, any ideas welcomed
+            guid = sha1(as_string.encode('utf8')).hexdigest()
+
+        return guid
 
     def _get_package_dict(self, harvest_object):
 
-        content = harvest_object.content
+        content = decompress_content(harvest_object.content)
 
         dcat_dict = json.loads(content)
 
@@ -62,34 +91,34 @@ class DCATJSONHarvester(DCATHarvester):
 
         return package_dict, dcat_dict
 
+    @report_request_stats
     def gather_stage(self, harvest_job):
         log.debug('In DCATJSONHarvester gather_stage')
 
-        ids = []
+        writer = HarvestObjectWriter()
 
         # Get the previous guids for this source
         query = \
             model.Session.query(HarvestObject.guid, HarvestObject.package_id) \
             .filter(HarvestObject.current == True) \
             .filter(HarvestObject.harvest_source_id == harvest_job.source.id)
-        guid_to_package_id = {}
-
-        for guid, package_id in query:
-            guid_to_package_id[guid] = package_id
+        guid_to_package_id = dict(query)
 
-        guids_in_db = list(guid_to_package_id.keys())
-        guids_in_source = []
+        guids_in_source = set()
 
         # Get file contents
         url = harvest_job.source.url
+        stream = p.toolkit.asbool(config.get(STREAMING_CONFIG, False))
 
-        previous_guids = []
+        previous_guids = set()
+        previous_content_hash = None
         page = 1
         while True:
 
             try:
                 content, content_type = \
-                    self._get_content_and_type(url, harvest_job, page)
+                    self._get_content_and_type(url, harvest_job, page,
+                                               stream=stream)
             except requests.exceptions.HTTPError as error:
                 if error.response.status_code == 404:
                     if page > 1:
@@ -110,18 +139,27 @@ class DCATJSONHarvester(DCATHarvester):
             if not content:
                 return None
 
+            content_hash = sha1()
+
             try:
 
-                batch_guids = []
-                for guid, as_string in self._get_guids_and_datasets(content):
+                if stream:
+                    chunks = _hashed_chunks(content, content_hash)
+                    guids_and_datasets = self._get_guids_and_datasets_stream(
+                        chunks)
+                else:
+                    content_hash.update(content.encode('utf8'))
+                    guids_and_datasets = self._get_guids_and_datasets(content)
+
+                batch_guids = set()
+                for guid, as_string in guids_and_datasets:
 
-                    log.debug('Got identifier: {0}'
-                              .format(guid.encode('utf8')))
-                    batch_guids.append(guid)
+                    log.debug('Got identifier: %s', guid)
+                    batch_guids.add(guid)
 
                     if guid not in previous_guids:
 
-                        if guid in guids_in_db:
+                        if guid in guid_to_package_id:
                             # Dataset needs to be udpated
                             obj = HarvestObject(
                                 guid=guid, job=harvest_job,
@@ -136,12 +174,16 @@ class DCATJSONHarvester(DCATHarvester):
                                 content=as_string,
                                 extras=[HarvestObjectExtra(key='status',
                                                            value='new')])
-                        obj.save()
-                        ids.append(obj.id)
+                        writer.add(obj)
+
+                if stream:
+                    # Read the rest of the page after the datasets list, so
+                    # the whole page is hashed and stored in the page cache
+                    for _ in chunks:
+                        pass
 
-                if len(batch_guids) > 0:
-                    guids_in_source.extend(set(batch_guids)
-                                           - set(previous_guids))
+                if batch_guids:
+                    guids_in_source.update(batch_guids)
                 else:
                     log.debug('Empty document, no more records')
                     # Empty document, no more ids
@@ -152,7 +194,9 @@ class DCATJSONHarvester(DCATHarvester):
                 self._save_gather_error(msg, harvest_job)
                 return None
 
-            if sorted(previous_guids) == sorted(batch_guids):
+            content_hash = content_hash.digest()
+            if content_hash == previous_content_hash \
+                    or batch_guids == previous_guids:
                 # Server does not support pagination or no more pages
                 log.debug('Same content, no more pages')
                 break
@@ -160,25 +204,28 @@ class DCATJSONHarvester(DCATHarvester):
             page = page + 1
 
             previous_guids = batch_guids
+            previous_content_hash = content_hash
 
         # Check datasets that need to be deleted
-        guids_to_delete = set(guids_in_db) - set(guids_in_source)
+        guids_to_delete = guid_to_package_id.keys() - guids_in_source
         for guid in guids_to_delete:
             obj = HarvestObject(
                 guid=guid, job=harvest_job,
                 package_id=guid_to_package_id[guid],
                 extras=[HarvestObjectExtra(key='status', value='delete')])
-            ids.append(obj.id)
             model.Session.query(HarvestObject).\
                 filter_by(guid=guid).\
                 update({'current': False}, False)
-            obj.save()
+            writer.add(obj)
 
-        return ids
+        writer.flush()
+
+        return writer.ids
 
     def fetch_stage(self, harvest_object):
         return True
 
+    @deferred_indexing
     def import_stage(self, harvest_object):
         log.debug('In DCATJSONHarvester import_stage')
         if not harvest_object:
@@ -288,7 +335,7 @@ class DCATJSONHarvester(DCATHarvester):
                 log.info('%s dataset with id %s', message_status, package_id)
 
         except Exception as e:
-            dataset = json.loads(harvest_object.content)
+            dataset = json.loads(decompress_content(harvest_object.content))
             dataset_name = dataset.get('name', '')
 
             self._save_object_error('Error importing dataset %s: %r / %s' % (dataset_name, e, traceback.format_exc()), harvest_object, 'Import')
@@ -299,6 +346,135 @@ class DCATJSONHarvester(DCATHarvester):
 
         return True
 
+def _hashed_chunks(chunks, content_hash):
+    '''
+    Yields the provided chunks, updating the hash object with them
+    '''
+    for chunk in chunks:
+        content_hash.update(
+            chunk if isinstance(chunk, bytes) else chunk.encode('utf8'))
+        yield chunk
+
+
+class _JSONStream(object):
+    '''
+    Minimal incremental reader over an iterator of JSON text or UTF-8
+    bytes chunks, keeping in memory only the part of the document not
+    consumed yet
+    '''
+
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        if self.eof:
+            return False
+
+        # Drop what has already been consumed
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.eof = True
+            self.buffer += self._text_decoder.decode(b'', final=True)
+            return False
+
+        if isinstance(chunk, bytes):
+            chunk = self._text_decoder.decode(chunk)
+        self.buffer += chunk
+
+        return True
+
+    def peek(self):
+        '''
+        Skips whitespace and returns the next character, or an empty
+        string at the end of the document
+        '''
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                'Expecting one of {0} but found {1}'.format(
+                    ', '.join(chars), repr(char or 'end of document')))
+        self.pos += 1
+
+        return char
+
+    def value(self):
+        '''
+        Decodes the next JSON value, returning a tuple with the decoded
+        value and its raw JSON text
+        '''
+        self.peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(
+                    self.buffer, self.pos)
+                # A value at the end of the buffer (e.g. a number) might
+                # continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    raw = self.buffer[self.pos:end]
+                    self.pos = end
+                    return value, raw
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+
+
+def iter_json_datasets(chunks, key='dataset'):
+    '''
+    Incrementally parses a DCAT JSON document (either a list of datasets or
+    an object with a `dataset` list), yielding a tuple with each dataset
+    dict and its raw JSON text
+
+    Only one dataset is kept in memory at a time, so documents of any size
+    can be processed. Other members of the top level object are parsed and
+    discarded, and the contents after the datasets list are not read.
+
+    :param chunks: an iterable of str or UTF-8 encoded bytes
+    '''
+    stream = _JSONStream(chunks)
+
+    if stream.expect('[{') == '{':
+        while True:
+            if stream.peek() == '}':
+                return
+            name, _ = stream.value()
+            stream.expect(':')
+            if name == key and stream.peek() == '[':
+                break
+            stream.value()
+            if stream.expect(',}') == '}':
+                return
+        stream.expect('[')
+
+    if stream.peek() == ']':
+        return
+
+    while True:
+        yield stream.value()
+        if stream.expect(',]') == ']':
+            return
+
+
 def copy_across_resource_ids(existing_dataset, harvested_dataset):
     '''Compare the resources in a dataset existing in the CKAN database with
     the resources in a freshly harvested copy, and for any resources that are
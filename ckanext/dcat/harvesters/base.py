@@ -1,11 +1,19 @@
 import os
+import json
+import base64
 import logging
+import zlib
+from urllib.parse import urlparse
+from contextlib import contextmanager
+from functools import wraps
 
 import requests
 import rdflib
 
 from ckan import plugins as p
 from ckan import model
+from ckan.lib import search
+from ckan.model.types import make_uuid
 
 from ckantoolkit import config
 import ckan.plugins.toolkit as toolkit
@@ -14,10 +22,269 @@ from ckanext.harvest.harvesters import HarvesterBase
 from ckanext.harvest.model import HarvestObject
 
 from ckanext.dcat.interfaces import IDCATRDFHarvester
+from ckanext.dcat.harvesters.cache import get_page_cache, replay_mode
+from ckanext.dcat.harvesters.compression import (
+    decompress_chunks,
+    is_compressed_content_type,
+    strip_compression_extension,
+)
+from ckanext.dcat.harvesters.ratelimit import (
+    RequestStats,
+    get_request_settings,
+    send_request,
+    validate_request_settings,
+)
 
 
 log = logging.getLogger(__name__)
 
+GATHER_BATCH_SIZE_CONFIG = 'ckanext.dcat.gather_batch_size'
+DEFAULT_GATHER_BATCH_SIZE = 500
+
+COMPRESS_CONTENT_CONFIG = 'ckanext.dcat.compress_harvest_objects'
+COMPRESSED_CONTENT_PREFIX = 'zlib:'
+
+DEFER_INDEXING_CONFIG = 'ckanext.dcat.defer_indexing'
+REINDEX_IN_BACKGROUND_CONFIG = 'ckanext.dcat.reindex_in_background'
+REINDEX_BATCH_SIZE = 100
+
+
+@contextmanager
+def suppress_search_indexing():
+    '''
+    Disables the automatic search indexing of datasets done by CKAN when
+    they are created or updated (`ckan.search.automatic_indexing`) for the
+    duration of the block
+
+    This changes the process-wide config, so it is only meant to be used in
+    the harvest fetch consumers, which import one object at a time.
+    '''
+    previous = config.get('ckan.search.automatic_indexing', True)
+    config['ckan.search.automatic_indexing'] = False
+    try:
+        yield
+    finally:
+        config['ckan.search.automatic_indexing'] = previous
+
+
+def reindex_harvest_job(job_id, batch_size=REINDEX_BATCH_SIZE):
+    '''
+    Reindexes all the datasets created, updated or deleted by a harvest job,
+    committing the search index changes every `batch_size` datasets
+
+    Returns the number of datasets reindexed.
+    '''
+    package_ids = [
+        package_id for (package_id,) in
+        model.Session.query(HarvestObject.package_id)
+        .filter(HarvestObject.harvest_job_id == job_id)
+        .filter(HarvestObject.package_id != None)  # noqa: E711
+        .distinct()
+    ]
+    total = len(package_ids)
+    log.info('Reindexing %d datasets of harvest job %s', total, job_id)
+
+    package_index = search.index_for(model.Package)
+    context = {'ignore_auth': True, 'validate': False, 'use_cache': False}
+
+    for count, package_id in enumerate(package_ids, 1):
+        try:
+            package_dict = toolkit.get_action('package_show')(
+                context.copy(), {'id': package_id})
+        except toolkit.ObjectNotFound:
+            # The dataset failed to import
+            continue
+
+        # Deleted datasets are removed from the index
+        package_index.update_dict(package_dict, defer_commit=True)
+
+        if count % batch_size == 0:
+            package_index.commit()
+            log.info('Reindexed %d/%d datasets of harvest job %s',
+                     count, total, job_id)
+
+    package_index.commit()
+    log.info('Finished reindexing %d datasets of harvest job %s',
+             total, job_id)
+
+    return total
+
+
+def deferred_indexing(import_stage):
+    '''
+    Decorator for the harvesters `import_stage()` method
+
+    If `ckanext.dcat.defer_indexing` is enabled, the datasets are not
+    indexed when each harvest object is imported. Instead, once the last
+    object of the job has been imported, all the job datasets are reindexed
+    in batches, either straight away or in a background job (if
+    `ckanext.dcat.reindex_in_background` is enabled).
+
+    The check runs even if the import of the object fails. When it can't
+    tell whether the reindex will happen, a warning is logged.
+    '''
+    @wraps(import_stage)
+    def wrapper(self, harvest_object):
+        if (not harvest_object or not toolkit.asbool(
+                config.get(DEFER_INDEXING_CONFIG, False))):
+            return import_stage(self, harvest_object)
+
+        try:
+            with suppress_search_indexing():
+                return import_stage(self, harvest_object)
+        finally:
+            _reindex_if_last_object(harvest_object)
+
+    return wrapper
+
+
+def _reindex_if_last_object(harvest_object):
+    '''
+    Reindexes the datasets of the object job (or enqueues a background job
+    to do it) if all the other objects of the job have been imported or
+    failed
+
+    Errors are logged instead of raised, so they don't hide the ones of the
+    import stage.
+    '''
+    job_id = harvest_object.harvest_job_id
+    warning = ('Datasets of harvest job %s might not be reindexed. If they '
+               'are missing from the search results, run '
+               '`ckan dcat reindex-harvest-job %s`')
+    try:
+        states = _pending_object_states(harvest_object)
+        if states is None or states - {'IMPORT'}:
+            return
+        if states:
+            # The other pending objects are being imported at the same time
+            # by other fetch consumers, which might not see this one as
+            # finished either
+            log.warning(warning, job_id, job_id)
+            return
+
+        if toolkit.asbool(config.get(REINDEX_IN_BACKGROUND_CONFIG, False)):
+            toolkit.enqueue_job(
+                reindex_harvest_job, [job_id],
+                title='Reindex datasets of harvest job {0}'.format(job_id))
+        else:
+            reindex_harvest_job(job_id)
+    except Exception:
+        log.warning(warning, job_id, job_id, exc_info=True)
+
+
+def _pending_object_states(harvest_object):
+    '''
+    Returns the set of states of the other objects of the object job that
+    have not been imported or failed yet, or None if the gather stage of
+    the job has not finished
+    '''
+    job = harvest_object.job
+    if not job or not job.gather_finished:
+        return None
+
+    return set(
+        state for (state,) in
+        model.Session.query(HarvestObject.state)
+        .filter(HarvestObject.harvest_job_id == job.id)
+        .filter(HarvestObject.id != harvest_object.id)
+        .filter(HarvestObject.state.notin_(['COMPLETE', 'ERROR']))
+        .distinct()
+    )
+
+
+def compress_content(content):
+    '''
+    Compresses the content of a harvest object with zlib
+
+    The result is a base64 encoded string (as the content column is text)
+    prefixed with `zlib:`, so it can be told apart from plain content.
+    '''
+    compressed = zlib.compress(content.encode('utf8'))
+
+    return COMPRESSED_CONTENT_PREFIX + base64.b64encode(compressed).decode('ascii')
+
+
+def decompress_content(content):
+    '''
+    Returns the content of a harvest object, decompressing it if it was
+    stored with `compress_content()`
+    '''
+    if content and content.startswith(COMPRESSED_CONTENT_PREFIX):
+        compressed = base64.b64decode(content[len(COMPRESSED_CONTENT_PREFIX):])
+        content = zlib.decompress(compressed).decode('utf8')
+
+    return content
+
+
+def report_request_stats(gather_stage):
+    '''
+    Decorator for the harvesters `gather_stage()` method
+
+    Counts the remote requests made during the gather stage and logs a
+    summary once it finishes, as a warning if any of them were retried or
+    throttled by the server. Retried requests are not errors, so they are
+    not added to the harvest job report.
+    '''
+    @wraps(gather_stage)
+    def wrapper(self, harvest_job):
+        self._request_stats = stats = RequestStats()
+        try:
+            return gather_stage(self, harvest_job)
+        finally:
+            self._request_stats = None
+            if stats.retries or stats.throttled:
+                log.warning(
+                    'Harvest job %s: %s', harvest_job.id, stats.summary())
+            elif stats.requests:
+                log.info('Harvest job %s: %s', harvest_job.id, stats.summary())
+
+    return wrapper
+
+
+class HarvestObjectWriter(object):
+    '''
+    Buffers the HarvestObjects created in the gather stage and saves them
+    (and their extras) in batches, with one commit per batch instead of one
+    per object
+
+    Object ids are assigned when the objects are added, so they are
+    available in `ids` straight away. Call `flush()` before returning them
+    from the gather stage so all objects are committed.
+
+    If `ckanext.dcat.compress_harvest_objects` is enabled, the objects
+    content is compressed (see `compress_content()`).
+    '''
+
+    def __init__(self, batch_size=None, compress=None):
+        if batch_size is None:
+            batch_size = toolkit.asint(
+                config.get(GATHER_BATCH_SIZE_CONFIG, DEFAULT_GATHER_BATCH_SIZE))
+        if compress is None:
+            compress = toolkit.asbool(config.get(COMPRESS_CONTENT_CONFIG, False))
+        self.batch_size = max(batch_size, 1)
+        self.compress = compress
+        self.ids = []
+        self._pending = 0
+
+    def add(self, obj):
+        if not obj.id:
+            obj.id = make_uuid()
+        if self.compress and obj.content:
+            obj.content = compress_content(obj.content)
+        model.Session.add(obj)
+        self.ids.append(obj.id)
+
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+        return obj.id
+
+    def flush(self):
+        if self._pending:
+            model.Session.commit()
+            self._pending = 0
+
 
 class DCATHarvester(HarvesterBase):
 
@@ -26,35 +293,82 @@ class DCATHarvester(HarvesterBase):
 
     force_import = False
 
+    # Stats of the requests made by the current gather stage (see
+    # `report_request_stats()`)
+    _request_stats = None
+
+    def validate_config(self, source_config):
+        if not source_config:
+            return source_config
+
+        validate_request_settings(json.loads(source_config))
+
+        return source_config
+
+    def _get_request_settings(self, harvest_job):
+        '''
+        Returns the settings used to make requests to the harvest source of
+        a job (see `get_request_settings()`)
+        '''
+        source_config = None
+        if harvest_job and harvest_job.source.config:
+            try:
+                source_config = json.loads(harvest_job.source.config)
+            except ValueError:
+                pass
+
+        return get_request_settings(source_config)
+
     def _get_content_and_type(self, url, harvest_job, page=1,
-                              content_type=None):
+                              content_type=None, stream=False):
         '''
         Gets the content and type of the given url.
 
+        Compressed files (gzip, bzip2, xz or zip) are decompressed on the fly,
+        and the maximum file size is checked against the decompressed content.
+
         :param url: a web url (starting with http) or a local path
         :param harvest_job: the job, used for error reporting
         :param page: adds paging to the url
         :param content_type: will be returned as type
+        :param stream: if True, the content is returned as an iterator of
+            bytes chunks instead of a string, so it can be processed without
+            loading it all in memory. Errors raised while iterating it
+            (e.g. the file being too big) are raised as ValueError
         :return: a tuple containing the content and content-type
         '''
 
         if not url.lower().startswith('http'):
             # Check local file
             if os.path.exists(url):
-                with open(url, 'r') as f:
-                    content = f.read()
-                content_type = content_type or rdflib.util.guess_format(url)
-                return content, content_type
+                content_type = content_type or rdflib.util.guess_format(
+                    strip_compression_extension(url))
+                chunks = decompress_chunks(self._iter_file_chunks(url))
+                if stream:
+                    return chunks, content_type
+                return self._read_chunks(chunks, harvest_job), content_type
             else:
                 self._save_gather_error('Could not get content for this url',
                                         harvest_job)
                 return None, None
 
-        try:
+        if page > 1:
+            url = url + '&' if '?' in url else url + '?'
+            url = url + 'page={0}'.format(page)
+
+        cache = get_page_cache()
+        if cache and replay_mode():
+            cached = cache.get(url)
+            if not cached:
+                self._save_gather_error(
+                    'No cached content for {0} (replay mode)'.format(url),
+                    harvest_job)
+                return None, None
+            log.debug('Replaying cached file %s', url)
+            return self._get_cached_content(
+                cached, content_type, stream, harvest_job)
 
-            if page > 1:
-                url = url + '&' if '?' in url else url + '?'
-                url = url + 'page={0}'.format(page)
+        try:
 
             log.debug('Getting file %s', url)
 
@@ -63,15 +377,34 @@ class DCATHarvester(HarvesterBase):
             for harvester in p.PluginImplementations(IDCATRDFHarvester):
                 session = harvester.update_session(session)
 
+            # Make conditional requests for pages already in the cache
+            headers = cache.validators(url) if cache else {}
+
+            # Requests are rate limited and retried (see `send_request()`)
+            settings = self._get_request_settings(harvest_job)
+
+            def _get(headers=None):
+                return send_request(
+                    session, 'GET', url, settings, self._request_stats,
+                    stream=True, headers=headers)
+
             # first we try a HEAD request which may not be supported
             did_get = False
-            r = session.head(url)
+            r = send_request(session, 'HEAD', url, settings,
+                             self._request_stats, allow_redirects=False)
 
             if r.status_code == 405 or r.status_code == 400:
-                r = session.get(url, stream=True)
+                r = _get(headers)
                 did_get = True
             r.raise_for_status()
 
+            if cache and not did_get and cache.is_fresh(url, r.headers):
+                cached = cache.get(url)
+                if cached:
+                    log.debug('Remote file not modified, using cached file %s', url)
+                    return self._get_cached_content(
+                        cached, content_type, stream, harvest_job)
+
             max_file_size = 1024 * 1024 * toolkit.asint(config.get('ckanext.dcat.max_file_size', self.DEFAULT_MAX_FILE_SIZE_MB))
             cl = r.headers.get('content-length')
             if cl and int(cl) > max_file_size:
@@ -82,26 +415,38 @@ class DCATHarvester(HarvesterBase):
                 return None, None
 
             if not did_get:
-                r = session.get(url, stream=True)
+                r = _get(headers)
+                r.raise_for_status()
 
-            length = 0
-            content = b''
-            for chunk in r.iter_content(chunk_size=self.CHUNK_SIZE):
-                content = content + chunk
+            if r.status_code == 304:
+                r.close()
+                cached = cache.get(url) if cache else None
+                if cached:
+                    log.debug('Remote file not modified, using cached file %s', url)
+                    return self._get_cached_content(
+                        cached, content_type, stream, harvest_job)
 
-                length += len(chunk)
-
-                if length >= max_file_size:
-                    self._save_gather_error('Remote file is too big.',
-                                            harvest_job)
-                    return None, None
-
-            content = content.decode('utf-8')
+                # The cached file is not valid anymore, get it again
+                r = _get()
+                r.raise_for_status()
 
             if content_type is None and r.headers.get('content-type'):
                 content_type = r.headers.get('content-type').split(";", 1)[0]
+                if is_compressed_content_type(content_type):
+                    # Guess the format of the compressed file from its name
+                    content_type = rdflib.util.guess_format(
+                        strip_compression_extension(urlparse(url).path))
+
+            # The page cache stores the body as downloaded
+            chunks = self._iter_response_chunks(r)
+            if cache:
+                chunks = cache.store(url, chunks, r.headers, content_type)
+            chunks = decompress_chunks(chunks, max_file_size)
+
+            if stream:
+                return chunks, content_type
 
-            return content, content_type
+            return self._read_chunks(chunks, harvest_job), content_type
 
         except requests.exceptions.HTTPError as error:
             if page > 1 and error.response.status_code == 404:
@@ -123,6 +468,57 @@ class DCATHarvester(HarvesterBase):
             self._save_gather_error(msg, harvest_job)
             return None, None
 
+    def _get_cached_content(self, cached, content_type, stream, harvest_job):
+        '''
+        Returns a tuple with the content of a page cache entry (as a string
+        or as an iterator of bytes chunks if `stream` is True) and its
+        content type
+        '''
+        metadata, body_path = cached
+        content_type = content_type or metadata.get('content_type')
+        chunks = decompress_chunks(self._iter_file_chunks(body_path))
+        if stream:
+            return chunks, content_type
+
+        return self._read_chunks(chunks, harvest_job), content_type
+
+    def _read_chunks(self, chunks, harvest_job):
+        '''
+        Returns the contents of an iterator of bytes chunks as a string, or
+        None if there was an error reading them (e.g. the file was too big)
+        '''
+        try:
+            content = b''.join(chunks)
+        except ValueError as e:
+            self._save_gather_error(str(e), harvest_job)
+            return None
+
+        return content.decode('utf-8')
+
+    def _iter_file_chunks(self, path):
+        '''
+        Yields the contents of a local file in bytes chunks
+        '''
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _iter_response_chunks(self, response):
+        '''
+        Yields the body of a streamed response in bytes chunks
+        '''
+        try:
+            for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                yield chunk
+        except requests.exceptions.RequestException as error:
+            raise ValueError(
+                'Could not get content from {0}: {1}'.format(response.url, error))
+        finally:
+            response.close()
+
     def _get_object_extra(self, harvest_object, key):
         '''
         Helper function for retrieving the value from a harvest object extra,
@@ -0,0 +1,155 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import datetime
+
+from ckantoolkit import config
+import ckan.plugins.toolkit as toolkit
+
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR_CONFIG = 'ckanext.dcat.harvest_cache_dir'
+REPLAY_CONFIG = 'ckanext.dcat.harvest_cache_replay'
+
+
+def get_page_cache():
+    '''
+    Returns a PageCache object if `ckanext.dcat.harvest_cache_dir` is set,
+    None otherwise
+    '''
+    path = config.get(CACHE_DIR_CONFIG)
+    if not path:
+        return None
+
+    return PageCache(path)
+
+
+def replay_mode():
+    '''
+    Returns whether the harvesters should only read pages from the cache,
+    without making any requests
+    '''
+    return toolkit.asbool(config.get(REPLAY_CONFIG, False))
+
+
+class PageCache(object):
+    '''
+    On-disk cache of the pages downloaded by the harvesters
+
+    Each URL is stored as two files named after the SHA-1 of the URL: the
+    body as downloaded, and a JSON file with its metadata (the ETag and
+    Last-Modified headers used to make conditional requests, the content
+    type and the SHA-256 of the body, which is checked when reading it).
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf8')).hexdigest()
+        return (
+            os.path.join(self.path, key + '.json'),
+            os.path.join(self.path, key + '.body'),
+        )
+
+    def metadata(self, url):
+        '''
+        Returns the metadata dict of a cached URL, or None if not cached
+        '''
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not os.path.exists(body_path):
+            return None
+
+        return metadata
+
+    def get(self, url):
+        '''
+        Returns a tuple with the metadata and the path to the body of a
+        cached URL, or None if it is not cached or the body does not match
+        its hash
+        '''
+        metadata = self.metadata(url)
+        if not metadata:
+            return None
+
+        body_path = self._paths(url)[1]
+        body_hash = hashlib.sha256()
+        with open(body_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                body_hash.update(chunk)
+
+        if body_hash.hexdigest() != metadata.get('sha256'):
+            log.warning('Cached content for %s is corrupted, ignoring', url)
+            return None
+
+        return metadata, body_path
+
+    def validators(self, url):
+        '''
+        Returns the headers needed to make a conditional request for a
+        cached URL
+        '''
+        metadata = self.metadata(url) or {}
+        headers = {}
+        if metadata.get('etag'):
+            headers['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified'):
+            headers['If-Modified-Since'] = metadata['last_modified']
+
+        return headers
+
+    def is_fresh(self, url, headers):
+        '''
+        Checks if the response headers (e.g. from a HEAD request) have the
+        same ETag as the cached URL
+        '''
+        metadata = self.metadata(url) or {}
+        etag = headers.get('etag')
+
+        return bool(etag) and etag == metadata.get('etag')
+
+    def store(self, url, chunks, headers, content_type):
+        '''
+        Stores the body of a URL while it is read, yielding the chunks
+
+        The cache entry is only written once all chunks have been read, so
+        partial downloads are never stored.
+        '''
+        meta_path, body_path = self._paths(url)
+        body_hash = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    body_hash.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+
+            metadata = {
+                'url': url,
+                'etag': headers.get('etag'),
+                'last_modified': headers.get('last-modified'),
+                'content_type': content_type,
+                'sha256': body_hash.hexdigest(),
+                'size': size,
+                'fetched': datetime.datetime.utcnow().isoformat(),
+            }
+            os.replace(tmp_path, body_path)
+            with open(meta_path, 'w') as f:
+                json.dump(metadata, f)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,164 @@
+import os
+import json
+import logging
+import tempfile
+import datetime
+
+from ckantoolkit import config
+import ckan.plugins.toolkit as toolkit
+
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_DIR_CONFIG = 'ckanext.dcat.harvest_checkpoint_dir'
+MAX_RESUMES_CONFIG = 'ckanext.dcat.harvest_checkpoint_max_resumes'
+
+DEFAULT_MAX_RESUMES = 3
+
+
+def get_gather_checkpoints():
+    '''
+    Returns a GatherCheckpoints object if
+    `ckanext.dcat.harvest_checkpoint_dir` is set, None otherwise
+    '''
+    path = config.get(CHECKPOINT_DIR_CONFIG)
+    if not path:
+        return None
+
+    return GatherCheckpoints(
+        path,
+        toolkit.asint(config.get(MAX_RESUMES_CONFIG, DEFAULT_MAX_RESUMES)))
+
+
+class GatherCheckpoints(object):
+    '''
+    On-disk store of the progress of the harvesters gather stage
+
+    There are two files per harvest source, both removed once the gather
+    stage finishes successfully:
+
+    * `<source_id>.json`, with the state of the gather stage, rewritten
+      after each page has been gathered
+    * `<source_id>.log`, to which a line with the datasets gathered in each
+      page is appended, so saving a checkpoint does not get slower as more
+      datasets are gathered
+
+    If a gather stage fails, the next job of the source can resume it from
+    the last completed page. A checkpoint contains:
+
+    * `job_id`: the last job that saved it
+    * `source_url` and `source_config`: the source settings when it was
+      created (checkpoints are ignored if they change)
+    * `next_page_url`: the URL of the next page to gather
+    * `content_hash`: the hash of the first page, used to detect remotes
+      that return the same content for all pages
+    * `pages`: the number of pages gathered so far
+    * `incremental`: whether only the datasets modified since the last
+      successful job are being gathered
+    * `resumes`: the number of times the gather stage was resumed from the
+      current page (checkpoints are ignored after `max_resumes`)
+    * `log_size`: the size of the log when it was saved
+    * `guids`, `names` and `object_ids`: the dataset guids and names and
+      the ids of the harvest objects gathered so far (read from the log)
+    '''
+
+    def __init__(self, path, max_resumes=DEFAULT_MAX_RESUMES):
+        self.path = path
+        self.max_resumes = max_resumes
+        os.makedirs(path, exist_ok=True)
+
+    def _path(self, source_id, extension='.json'):
+        return os.path.join(self.path, source_id + extension)
+
+    def load(self, harvest_source):
+        '''
+        Returns the checkpoint dict of a harvest source, or None if there is
+        no checkpoint, it was created with a different URL or config, or it
+        was already resumed `max_resumes` times from the same page
+
+        Checkpoints that are ignored are not removed, as the harvest objects
+        kept for them need to be cleaned up first (see `clear()`).
+        '''
+        try:
+            with open(self._path(harvest_source.id), 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if checkpoint.get('source_url') != harvest_source.url \
+                or checkpoint.get('source_config') != harvest_source.config:
+            log.info('Harvest source %s has changed, ignoring checkpoint',
+                     harvest_source.id)
+            return None
+
+        if checkpoint.get('resumes', 0) >= self.max_resumes:
+            log.warning('The gather stage of harvest source %s failed %d '
+                        'times after resuming it from %s, ignoring checkpoint',
+                        harvest_source.id, checkpoint['resumes'],
+                        checkpoint['next_page_url'])
+            return None
+
+        checkpoint.update({'guids': [], 'names': [], 'object_ids': []})
+        log_path = self._path(harvest_source.id, '.log')
+        try:
+            with open(log_path, 'rb') as f:
+                lines = f.read(checkpoint['log_size'])
+            if len(lines) != checkpoint['log_size']:
+                raise ValueError('Log is shorter than expected')
+            for line in lines.splitlines():
+                page = json.loads(line)
+                for key in ('guids', 'names', 'object_ids'):
+                    checkpoint[key].extend(page[key])
+            # Drop the lines of pages saved after the checkpoint, if any
+            os.truncate(log_path, checkpoint['log_size'])
+        except (OSError, ValueError, KeyError) as e:
+            log.warning('Could not read the checkpoint log of harvest '
+                        'source %s, ignoring checkpoint: %s',
+                        harvest_source.id, e)
+            return None
+
+        return checkpoint
+
+    def save(self, harvest_job, guids=(), names=(), object_ids=(),
+             **checkpoint):
+        '''
+        Stores the checkpoint of a harvest job, replacing the previous one
+        of its source
+
+        The `guids`, `names` and `object_ids` gathered since the previous
+        checkpoint are appended to the log.
+        '''
+        source = harvest_job.source
+
+        with open(self._path(source.id, '.log'), 'ab') as f:
+            if guids or names or object_ids:
+                f.write(json.dumps({
+                    'guids': list(guids),
+                    'names': list(names),
+                    'object_ids': list(object_ids),
+                }).encode('utf8') + b'\n')
+            log_size = f.tell()
+
+        checkpoint.update({
+            'job_id': harvest_job.id,
+            'source_url': source.url,
+            'source_config': source.config,
+            'log_size': log_size,
+            'saved': datetime.datetime.utcnow().isoformat(),
+        })
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, self._path(source.id))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self, harvest_source):
+        for extension in ('.json', '.log'):
+            try:
+                os.remove(self._path(harvest_source.id, extension))
+            except FileNotFoundError:
+                pass
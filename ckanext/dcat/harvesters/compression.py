@@ -0,0 +1,169 @@
+import bz2
+import lzma
+import tempfile
+import zipfile
+import zlib
+
+
+CHUNK_SIZE = 1024 * 512
+
+# Magic bytes at the start of compressed files
+MAGIC_BYTES = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'PK\x03\x04', 'zip'),
+]
+
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zip': 'zip',
+}
+
+COMPRESSION_CONTENT_TYPES = {
+    'application/gzip': 'gzip',
+    'application/x-gzip': 'gzip',
+    'application/x-bzip2': 'bz2',
+    'application/x-xz': 'xz',
+    'application/zip': 'zip',
+    'application/x-zip-compressed': 'zip',
+}
+
+
+def detect_compression(head):
+    '''
+    Returns the compression format of a file (`gzip`, `bz2`, `xz` or
+    `zip`) based on its first bytes, or None if it is not compressed
+    '''
+    for magic, compression in MAGIC_BYTES:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def strip_compression_extension(path):
+    '''
+    Removes the compression extension (if any) from a file name or URL
+    path, e.g. `catalog.nt.gz` -> `catalog.nt`
+    '''
+    lower_path = path.lower()
+    for extension in COMPRESSION_EXTENSIONS:
+        if lower_path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+
+def is_compressed_content_type(content_type):
+    return content_type in COMPRESSION_CONTENT_TYPES
+
+
+def decompress_chunks(chunks, max_size=None):
+    '''
+    Yields the decompressed contents of an iterator of bytes chunks
+
+    The compression format is detected from the first bytes, so plain
+    content is yielded as is. Zip files must contain a single file (or the
+    first one is used), and are spooled to a temporary file first as they
+    can not be read sequentially (`max_size` also applies to the spooled
+    compressed file).
+
+    If `max_size` is provided, a ValueError is raised once the decompressed
+    size reaches it. Decompressors are never asked for more than a chunk at
+    a time, so highly compressed files are not fully expanded in memory
+    before the check.
+    '''
+    chunks = iter(chunks)
+
+    # Read enough bytes to detect the format
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= 6:
+            break
+
+    compression = detect_compression(head)
+
+    def _all_chunks():
+        if head:
+            yield head
+        yield from chunks
+
+    if compression == 'zip':
+        decompressed = _iter_zip(_all_chunks(), max_size)
+    elif compression:
+        decompressed = _iter_stream(_all_chunks(), compression)
+    else:
+        decompressed = _all_chunks()
+
+    length = 0
+    for chunk in decompressed:
+        length += len(chunk)
+        if max_size and length >= max_size:
+            raise ValueError('Remote file is too big.')
+        yield chunk
+
+
+def _new_decompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == 'bz2':
+        return bz2.BZ2Decompressor()
+    return lzma.LZMADecompressor()
+
+
+def _iter_stream(chunks, compression):
+    decompressor = None
+    try:
+        for chunk in chunks:
+            data = chunk
+            while data:
+                if decompressor is None or decompressor.eof:
+                    # First stream, or the next of concatenated streams (e.g.
+                    # multi-member gzip files)
+                    decompressor = _new_decompressor(compression)
+
+                output = decompressor.decompress(data, CHUNK_SIZE)
+                if output:
+                    yield output
+
+                if compression == 'gzip':
+                    data = decompressor.unused_data if decompressor.eof \
+                        else decompressor.unconsumed_tail
+                else:
+                    # Get the output buffered by the decompressor
+                    while not decompressor.eof and not decompressor.needs_input:
+                        output = decompressor.decompress(b'', CHUNK_SIZE)
+                        if output:
+                            yield output
+                    data = decompressor.unused_data if decompressor.eof else b''
+    except (zlib.error, lzma.LZMAError, OSError, EOFError) as e:
+        raise ValueError('Could not decompress file: {0}'.format(e))
+
+    if decompressor is None or not decompressor.eof:
+        raise ValueError('Compressed file ended before the end of the stream')
+
+
+def _iter_zip(chunks, max_size=None):
+    with tempfile.TemporaryFile() as f:
+        length = 0
+        for chunk in chunks:
+            length += len(chunk)
+            if max_size and length >= max_size:
+                raise ValueError('Remote file is too big.')
+            f.write(chunk)
+        f.seek(0)
+
+        try:
+            with zipfile.ZipFile(f) as zip_file:
+                members = [i for i in zip_file.infolist() if not i.is_dir()]
+                if not members:
+                    raise ValueError('Empty zip file')
+                with zip_file.open(members[0]) as member:
+                    for chunk in iter(lambda: member.read(CHUNK_SIZE), b''):
+                        yield chunk
+        except zipfile.BadZipFile as e:
+            raise ValueError('Could not read zip file: {0}'.format(e))
+
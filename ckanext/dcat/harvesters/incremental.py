@@ -0,0 +1,125 @@
+import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qs, parse_qsl, urlencode
+
+from rdflib import URIRef
+from rdflib.namespace import RDF
+
+from ckantoolkit import config
+import ckan.plugins.toolkit as toolkit
+
+from ckanext.dcat.processors import (
+    DCAT,
+    SUPPORTED_PAGINATION_COLLECTION_DESIGNS,
+)
+
+
+INCREMENTAL_CONFIG = 'ckanext.dcat.harvest_incremental'
+FULL_INTERVAL_CONFIG = 'ckanext.dcat.harvest_full_interval'
+
+DEFAULT_FULL_INTERVAL = 7
+
+MODIFIED_SINCE_PARAM = 'modified_since'
+
+# Datasets modified shortly before the previous job started are requested
+# again, to allow for differences between the local and remote clocks
+MODIFIED_SINCE_MARGIN = datetime.timedelta(hours=1)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _incremental_mode(value):
+    if isinstance(value, str) and value.lower() == 'auto':
+        return 'auto'
+    return toolkit.asbool(value)
+
+
+def get_incremental_settings(source_config=None):
+    '''
+    Returns a dict with the incremental harvesting settings of a harvest
+    source (`incremental` and `full_harvest_interval`)
+
+    `incremental` is either True, False or `auto`. The values defined in the
+    harvest source configuration override the ones in the CKAN config.
+    '''
+    settings = {
+        'incremental': _incremental_mode(config.get(INCREMENTAL_CONFIG, False)),
+        'full_harvest_interval': float(
+            config.get(FULL_INTERVAL_CONFIG, DEFAULT_FULL_INTERVAL)),
+    }
+    if source_config:
+        if source_config.get('incremental') is not None:
+            settings['incremental'] = _incremental_mode(
+                source_config['incremental'])
+        if source_config.get('full_harvest_interval') is not None:
+            settings['full_harvest_interval'] = float(
+                source_config['full_harvest_interval'])
+
+    return settings
+
+
+def validate_incremental_settings(source_config):
+    '''
+    Checks the incremental harvesting settings of a harvest source
+    configuration dict, raising a ValueError if they are not valid
+    '''
+    if 'incremental' in source_config:
+        value = source_config['incremental']
+        if not isinstance(value, bool) and value != 'auto':
+            raise ValueError('incremental must be true, false or "auto"')
+    if 'full_harvest_interval' in source_config:
+        value = source_config['full_harvest_interval']
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or value <= 0:
+            raise ValueError('full_harvest_interval must be a positive number')
+
+
+def is_full_harvest_due(last_harvest, now, interval):
+    '''
+    Checks if a full harvest is needed, ie if the last successful harvest
+    and the current one fall in different periods of `interval` days
+    (counted from 1970-01-01 UTC)
+
+    The first successful job of each period is always a full harvest, as
+    the last successful job before it was in a previous period.
+    '''
+    period = datetime.timedelta(days=interval)
+
+    return (last_harvest - EPOCH) // period != (now - EPOCH) // period
+
+
+def add_modified_since(url, modified_since):
+    '''
+    Returns the URL with the `modified_since` query parameter set to the
+    given (UTC) datetime, replacing any previous value
+    '''
+    parts = urlsplit(url)
+    query = [(key, value)
+             for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key != MODIFIED_SINCE_PARAM]
+    query.append(
+        (MODIFIED_SINCE_PARAM, modified_since.strftime('%Y-%m-%dT%H:%M:%S')))
+
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def supports_modified_since(graph):
+    '''
+    Checks if a page requested with the `modified_since` parameter was
+    filtered by the remote catalog
+
+    ckanext-dcat endpoints keep the parameter in the pagination URLs, and
+    return no pagination info when no datasets were modified. Pages that
+    have datasets but no pagination URLs with the parameter come from
+    remotes that ignored it, and contain the full listing.
+    '''
+    if (None, RDF.type, DCAT.Dataset) not in graph:
+        return True
+
+    for collection_type in SUPPORTED_PAGINATION_COLLECTION_DESIGNS:
+        for node in graph.subjects(RDF.type, collection_type):
+            for uri in [node] + list(graph.objects(node)):
+                if isinstance(uri, URIRef) and MODIFIED_SINCE_PARAM in \
+                        parse_qs(urlsplit(str(uri)).query):
+                    return True
+
+    return False
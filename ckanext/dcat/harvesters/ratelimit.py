@@ -0,0 +1,269 @@
+import time
+import random
+import logging
+import datetime
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from ckantoolkit import config
+import ckan.plugins.toolkit as toolkit
+
+
+log = logging.getLogger(__name__)
+
+RATE_LIMIT_CONFIG = 'ckanext.dcat.harvest_rate_limit'
+MAX_RETRIES_CONFIG = 'ckanext.dcat.harvest_max_retries'
+TIMEOUT_CONFIG = 'ckanext.dcat.harvest_timeout'
+
+DEFAULT_RATE_LIMIT = 0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_TIMEOUT = 60
+
+# Responses that mean that the remote server is (temporarily) overloaded
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Exponential backoff (in seconds) when there is no Retry-After header
+BACKOFF_FACTOR = 1
+# Maximum time to wait (in seconds) before retrying a request
+MAX_RETRY_WAIT = 300
+
+# Adaptive rate: halved when the server throttles the requests (starting
+# from INITIAL_THROTTLED_RATE if there is no limit), and increased by
+# RATE_INCREASE on each successful request until the configured limit
+MIN_RATE = 0.05
+INITIAL_THROTTLED_RATE = 1.0
+RATE_INCREASE = 0.1
+# Hosts without a configured limit are not limited any more once their
+# adaptive rate gets to this value
+MAX_ADAPTIVE_RATE = 10.0
+
+
+def get_request_settings(source_config=None):
+    '''
+    Returns a dict with the settings used to make requests to a harvest
+    source (`rate_limit`, `max_retries` and `timeout`)
+
+    The values defined in the harvest source configuration override the
+    ones in the CKAN config.
+    '''
+    settings = {
+        'rate_limit': float(config.get(RATE_LIMIT_CONFIG, DEFAULT_RATE_LIMIT)),
+        'max_retries': toolkit.asint(
+            config.get(MAX_RETRIES_CONFIG, DEFAULT_MAX_RETRIES)),
+        'timeout': float(config.get(TIMEOUT_CONFIG, DEFAULT_TIMEOUT)),
+    }
+    for key in settings:
+        if source_config and source_config.get(key) is not None:
+            settings[key] = type(settings[key])(source_config[key])
+
+    return settings
+
+
+def validate_request_settings(source_config):
+    '''
+    Checks the request settings of a harvest source configuration dict,
+    raising a ValueError if they are not valid
+    '''
+    for key, allow_zero in (
+            ('rate_limit', True), ('max_retries', True), ('timeout', False)):
+        if key not in source_config:
+            continue
+        value = source_config[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or value < 0 or (value == 0 and not allow_zero):
+            raise ValueError(
+                '{0} must be a {1} number'.format(
+                    key, 'non-negative' if allow_zero else 'positive'))
+        if key == 'max_retries' and not isinstance(value, int):
+            raise ValueError('max_retries must be an integer')
+
+
+class TokenBucket(object):
+    '''
+    Token bucket that limits the rate of requests to a host
+
+    The rate adapts to the server responses: it is halved each time the
+    server throttles a request (429 or 503 responses) and slowly increased
+    again with each successful one, up to the configured limit. A rate of
+    None means no limit.
+    '''
+
+    def __init__(self, rate=None, clock=time.monotonic):
+        self.limit = rate or None
+        self.rate = self.limit
+        self.tokens = 1.0
+        self.paused_until = 0
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Waits until a request can be made, returning the seconds waited
+        '''
+        with self._lock:
+            now = self._clock()
+            wait = max(self.paused_until - now, 0)
+            if self.rate:
+                self.tokens = min(
+                    self.tokens + (now - self._updated) * self.rate,
+                    max(self.rate, 1.0))
+                if self.tokens < 1:
+                    wait = max(wait, (1 - self.tokens) / self.rate)
+                self.tokens -= 1
+            self._updated = now
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self, retry_after=None):
+        '''
+        Called when the server throttled a request: halves the rate and
+        stops all requests to the host for `retry_after` seconds
+        '''
+        with self._lock:
+            self.rate = max((self.rate or INITIAL_THROTTLED_RATE) / 2, MIN_RATE)
+            self.tokens = min(self.tokens, 0)
+            if retry_after:
+                self.paused_until = max(
+                    self.paused_until,
+                    self._clock() + min(retry_after, MAX_RETRY_WAIT))
+
+    def succeeded(self):
+        '''
+        Called after a successful request, increases the rate back
+        '''
+        with self._lock:
+            if self.rate is None or self.rate == self.limit:
+                return
+            self.rate += RATE_INCREASE
+            if self.limit and self.rate >= self.limit:
+                self.rate = self.limit
+            elif not self.limit and self.rate >= MAX_ADAPTIVE_RATE:
+                self.rate = None
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_host_bucket(url, rate_limit=None):
+    '''
+    Returns the TokenBucket shared by all requests (in this process) to the
+    host of the given URL with the same rate limit
+
+    Sources on the same host with different rate limits get different
+    buckets, so they don't reset each other's limit and adapted rate.
+    '''
+    key = (urlparse(url).netloc.lower(), rate_limit or None)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(rate_limit)
+
+    return bucket
+
+
+class RequestStats(object):
+    '''
+    Counts the requests made during a harvest job, and the retries and
+    waits caused by the rate limiting
+    '''
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def summary(self):
+        return (
+            'Remote requests: {0} ({1} retries, {2} throttled by the server). '
+            'Waited {3:.1f} seconds for rate limiting and backoff'.format(
+                self.requests, self.retries, self.throttled, self.waited))
+
+
+def get_retry_after(response):
+    '''
+    Returns the seconds to wait set in the Retry-After header of a response
+    (either as seconds or as an HTTP date), or None
+    '''
+    value = response.headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    return max((date - now).total_seconds(), 0)
+
+
+def send_request(session, method, url, settings, stats=None, **kwargs):
+    '''
+    Makes a request with the given `requests` session, waiting for the rate
+    limit of the host and retrying it with exponential backoff on connection
+    errors, timeouts and 429, 502, 503 and 504 responses (honoring their
+    Retry-After header)
+
+    Returns the last response, or raises the last exception once
+    `max_retries` retries have failed.
+    '''
+    bucket = get_host_bucket(url, settings['rate_limit'])
+    if stats is None:
+        stats = RequestStats()
+    kwargs.setdefault('timeout', settings['timeout'])
+
+    attempt = 0
+    while True:
+        stats.waited += bucket.acquire()
+        stats.requests += 1
+
+        error = response = retry_after = None
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as e:
+            error = e
+
+        if response is not None:
+            if response.status_code not in RETRY_STATUS_CODES:
+                bucket.succeeded()
+                return response
+            retry_after = get_retry_after(response)
+            if response.status_code in THROTTLE_STATUS_CODES:
+                stats.throttled += 1
+                bucket.throttled(retry_after)
+
+        if attempt >= settings['max_retries']:
+            if error is not None:
+                raise error
+            return response
+
+        wait = retry_after
+        if wait is None:
+            wait = BACKOFF_FACTOR * 2 ** attempt
+            wait += random.uniform(0, wait / 2)
+        wait = min(wait, MAX_RETRY_WAIT)
+
+        log.info('Request to %s failed (%s), retrying in %.1f seconds',
+                 url, error or response.status_code, wait)
+        if response is not None:
+            response.close()
+
+        time.sleep(wait)
+        stats.waited += wait
+        stats.retries += 1
+        attempt += 1
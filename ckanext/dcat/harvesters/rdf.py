@@ -1,9 +1,14 @@
+import os
 import json
 import uuid
 import logging
 import hashlib
 import traceback
+import zlib
+import datetime
+from contextlib import contextmanager
 
+import rdflib
 import sqlalchemy as sa
 
 import ckan.plugins as p
@@ -11,9 +16,29 @@ import ckan.model as model
 
 import ckan.lib.plugins as lib_plugins
 
-from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
+from ckanext.harvest.model import (
+    HarvestObject,
+    HarvestObjectError,
+    HarvestObjectExtra,
+)
 from ckanext.harvest.logic.schema import unicode_safe
-from ckanext.dcat.harvesters.base import DCATHarvester
+from ckanext.dcat.harvesters.base import (
+    DCATHarvester,
+    HarvestObjectWriter,
+    decompress_content,
+    deferred_indexing,
+    report_request_stats,
+)
+from ckanext.dcat.harvesters.checkpoint import get_gather_checkpoints
+from ckanext.dcat.harvesters.compression import detect_compression
+from ckanext.dcat.harvesters.incremental import (
+    MODIFIED_SINCE_MARGIN,
+    add_modified_since,
+    get_incremental_settings,
+    is_full_harvest_due,
+    supports_modified_since,
+    validate_incremental_settings,
+)
 from ckanext.dcat.processors import RDFParserException, RDFParser
 from ckanext.dcat.interfaces import IDCATRDFHarvester
 
@@ -95,21 +120,17 @@ class DCATRDFHarvester(DCATHarvester):
         Returns a list with the ids of the Harvest Objects to delete.
         '''
 
-        object_ids = []
+        writer = HarvestObjectWriter()
 
         # Get all previous current guids and dataset ids for this source
         query = model.Session.query(HarvestObject.guid, HarvestObject.package_id) \
                              .filter(HarvestObject.current==True) \
                              .filter(HarvestObject.harvest_source_id==harvest_job.source.id)
 
-        guid_to_package_id = {}
-        for guid, package_id in query:
-            guid_to_package_id[guid] = package_id
-
-        guids_in_db = list(guid_to_package_id.keys())
+        guid_to_package_id = dict(query)
 
         # Get objects/datasets to delete (ie in the DB but not in the source)
-        guids_to_delete = set(guids_in_db) - set(guids_in_source)
+        guids_to_delete = guid_to_package_id.keys() - set(guids_in_source)
 
         # Create a harvest object for each of them, flagged for deletion
         for guid in guids_to_delete:
@@ -122,16 +143,84 @@ class DCATRDFHarvester(DCATHarvester):
             model.Session.query(HarvestObject) \
                          .filter_by(guid=guid) \
                          .update({'current': False}, False)
-            obj.save()
-            object_ids.append(obj.id)
+            writer.add(obj)
+
+        writer.flush()
+
+        return writer.ids
+
+    def _resume_harvest_objects(self, object_ids, harvest_job):
+        '''
+        Moves the harvest objects created by a previous gather stage that
+        did not finish to the current job
+
+        Returns the list of object ids, or None if some of them no longer
+        exist or have been processed already (in which case none are moved).
+        '''
+        if not object_ids:
+            return []
+
+        query = model.Session.query(HarvestObject) \
+                             .filter(HarvestObject.id.in_(object_ids)) \
+                             .filter(HarvestObject.state == 'WAITING')
+
+        if query.count() != len(set(object_ids)):
+            return None
+
+        query.update({'harvest_job_id': harvest_job.id}, synchronize_session=False)
+        model.Session.commit()
 
         return object_ids
 
+    def _detach_harvest_objects(self, harvest_job, checkpoints):
+        '''
+        Detaches the harvest objects stored in the checkpoint of a failed
+        gather stage from its job, so they are not deleted or flagged as
+        errors with it and can be resumed by the next job of the source
+        '''
+        checkpoint = checkpoints.load(harvest_job.source)
+        if not checkpoint or not checkpoint['object_ids']:
+            return
+
+        model.Session.query(HarvestObject) \
+                     .filter(HarvestObject.id.in_(checkpoint['object_ids'])) \
+                     .filter(HarvestObject.state == 'WAITING') \
+                     .update({'harvest_job_id': None}, synchronize_session=False)
+        model.Session.commit()
+
+    def _discard_checkpoint(self, harvest_source, checkpoints):
+        '''
+        Removes the checkpoint of a source, deleting the harvest objects
+        kept for it by `_detach_harvest_objects()` (the waiting objects of
+        the source without a job)
+        '''
+        detached = model.Session.query(HarvestObject.id) \
+                                .filter(HarvestObject.harvest_source_id == harvest_source.id) \
+                                .filter(HarvestObject.harvest_job_id == None) \
+                                .filter(HarvestObject.state == 'WAITING')  # noqa: E711
+        count = detached.count()
+        if count:
+            for model_class in (HarvestObjectExtra, HarvestObjectError):
+                model.Session.query(model_class) \
+                             .filter(model_class.harvest_object_id.in_(detached)) \
+                             .delete(synchronize_session=False)
+            model.Session.query(HarvestObject) \
+                         .filter(HarvestObject.id.in_(detached)) \
+                         .delete(synchronize_session=False)
+            model.Session.commit()
+            log.info('Deleted %d harvest objects of the discarded checkpoint '
+                     'of harvest source %s', count, harvest_source.id)
+
+        checkpoints.clear(harvest_source)
+
     def validate_config(self, source_config):
+        source_config = super(DCATRDFHarvester, self).validate_config(
+            source_config)
         if not source_config:
             return source_config
 
         source_config_obj = json.loads(source_config)
+        validate_incremental_settings(source_config_obj)
         if 'rdf_format' in source_config_obj:
             rdf_format = source_config_obj['rdf_format']
             if not isinstance(rdf_format, str):
@@ -142,21 +231,173 @@ class DCATRDFHarvester(DCATHarvester):
 
         return source_config
 
+    def _get_modified_since(self, harvest_job, settings):
+        '''
+        Returns the date from which to request only the modified datasets
+        (the start of the last successful job of the source, minus a margin),
+        or None if all datasets need to be requested
+
+        All datasets are requested if incremental harvesting is disabled for
+        the source, there is no previous successful job or a full harvest is
+        due (see `is_full_harvest_due()`).
+        '''
+        if not settings['incremental'] or \
+                not harvest_job.source.url.lower().startswith('http'):
+            return None
+
+        last_job = self.last_error_free_job(harvest_job)
+        if not last_job:
+            log.info('No previous successful job for source %s, '
+                     'harvesting all datasets', harvest_job.source.id)
+            return None
+
+        now = harvest_job.gather_started or datetime.datetime.utcnow()
+        if is_full_harvest_due(last_job.gather_started, now,
+                               settings['full_harvest_interval']):
+            log.info('Full harvest due for source %s', harvest_job.source.id)
+            return None
+
+        return last_job.gather_started - MODIFIED_SINCE_MARGIN
+
+    def _can_stream_file(self, url):
+        '''
+        Checks if a harvest source URL is a local uncompressed file that can
+        be passed to the parser as a stream
+
+        Plugins that modify the file contents in `after_download()` expect a
+        string, so files are not streamed if there are any.
+        '''
+        if url.lower().startswith('http') or not os.path.isfile(url):
+            return False
+
+        for harvester in p.PluginImplementations(IDCATRDFHarvester):
+            if type(harvester).after_download is not \
+                    IDCATRDFHarvester.after_download:
+                return False
+
+        with open(url, 'rb') as f:
+            head = f.read(6)
+
+        return bool(head) and not detect_compression(head)
+
+    @contextmanager
+    def _get_page_content(self, url, harvest_job, rdf_format):
+        '''
+        Context manager that returns a tuple with the content of a page and
+        its format
+
+        Local files are returned as a file object opened in binary mode if
+        possible (see `_can_stream_file()`), so large files are not loaded in
+        a string before parsing them. Otherwise the content is a string, as
+        returned by `_get_content_and_type()`.
+        '''
+        if self._can_stream_file(url):
+            rdf_format = rdf_format or rdflib.util.guess_format(url)
+            with open(url, 'rb') as f:
+                yield f, rdf_format
+        else:
+            yield self._get_content_and_type(
+                url, harvest_job, 1, content_type=rdf_format)
+
+    def _get_content_hash(self, content):
+        '''
+        Returns the MD5 hash of a page content, either a string or a binary
+        file object (which is rewound after reading it)
+        '''
+        content_hash = hashlib.md5()
+        if isinstance(content, str):
+            content_hash.update(content.encode('utf8'))
+        elif content:
+            for chunk in iter(lambda: content.read(self.CHUNK_SIZE), b''):
+                content_hash.update(chunk)
+            content.seek(0)
+
+        return content_hash
+
+    @report_request_stats
     def gather_stage(self, harvest_job):
 
         log.debug('In DCATRDFHarvester gather_stage')
 
-        rdf_format = None
+        checkpoints = get_gather_checkpoints()
+        try:
+            object_ids = self._gather_pages(harvest_job, checkpoints)
+        except Exception:
+            if checkpoints:
+                model.Session.rollback()
+                self._detach_harvest_objects(harvest_job, checkpoints)
+            raise
+
+        if checkpoints and not object_ids:
+            self._detach_harvest_objects(harvest_job, checkpoints)
+
+        return object_ids
+
+    def _gather_pages(self, harvest_job, checkpoints):
+
+        source_config = {}
         if harvest_job.source.config:
-            rdf_format = json.loads(harvest_job.source.config).get("rdf_format")
+            source_config = json.loads(harvest_job.source.config)
+        rdf_format = source_config.get("rdf_format")
+        incremental_settings = get_incremental_settings(source_config)
 
         # Get file contents of first page
         next_page_url = harvest_job.source.url
+        incremental = False
 
         guids_in_source = []
-        object_ids = []
+        writer = HarvestObjectWriter()
         last_content_hash = None
         self._names_taken = []
+        resumed_object_ids = []
+        pages = 0
+
+        # Resume a previous gather stage of this source that did not finish
+        checkpoint = checkpoints.load(harvest_job.source) if checkpoints else None
+        if checkpoint:
+            resumed_object_ids = self._resume_harvest_objects(
+                checkpoint['object_ids'], harvest_job)
+            if resumed_object_ids is None:
+                log.warning('Harvest objects of the checkpoint of job %s are '
+                            'missing, gathering from the first page',
+                            checkpoint['job_id'])
+                checkpoint = None
+                resumed_object_ids = []
+        if checkpoint:
+            log.info('Resuming gather stage of job %s from page %d: %s',
+                     checkpoint['job_id'], checkpoint['pages'] + 1,
+                     checkpoint['next_page_url'])
+            next_page_url = checkpoint['next_page_url']
+            last_content_hash = checkpoint['content_hash']
+            guids_in_source = checkpoint['guids']
+            self._names_taken = checkpoint['names']
+            pages = checkpoint['pages']
+            incremental = checkpoint.get('incremental', False)
+            # Count the attempts to gather the next page
+            checkpoints.save(
+                harvest_job,
+                next_page_url=next_page_url,
+                content_hash=last_content_hash,
+                pages=pages,
+                incremental=incremental,
+                resumes=checkpoint.get('resumes', 0) + 1,
+            )
+        elif checkpoints:
+            # Remove any checkpoint that can't be resumed, and the objects
+            # kept for it
+            self._discard_checkpoint(harvest_job.source, checkpoints)
+
+        # Guids, names and objects already in the checkpoint log
+        saved = (len(guids_in_source), len(self._names_taken), 0)
+
+        if not pages:
+            modified_since = self._get_modified_since(
+                harvest_job, incremental_settings)
+            if modified_since:
+                log.info('Requesting datasets modified since %s UTC',
+                         modified_since.isoformat())
+                next_page_url = add_modified_since(next_page_url, modified_since)
+                incremental = True
 
         while next_page_url:
             for harvester in p.PluginImplementations(IDCATRDFHarvester):
@@ -168,37 +409,51 @@ class DCATRDFHarvester(DCATHarvester):
                 if not next_page_url:
                     return []
 
-            content, rdf_format = self._get_content_and_type(next_page_url, harvest_job, 1, content_type=rdf_format)
+            with self._get_page_content(next_page_url, harvest_job, rdf_format) as (content, rdf_format):
 
-            content_hash = hashlib.md5()
-            if content:
-                content_hash.update(content.encode('utf8'))
+                content_hash = self._get_content_hash(content).hexdigest()
 
-            if last_content_hash:
-                if content_hash.digest() == last_content_hash.digest():
-                    log.warning('Remote content was the same even when using a paginated URL, skipping')
-                    break
-            else:
-                last_content_hash = content_hash
+                if last_content_hash:
+                    if content_hash == last_content_hash:
+                        log.warning('Remote content was the same even when using a paginated URL, skipping')
+                        break
+                else:
+                    last_content_hash = content_hash
 
-            # TODO: store content?
-            for harvester in p.PluginImplementations(IDCATRDFHarvester):
-                content, after_download_errors = harvester.after_download(content, harvest_job)
+                # Pages are stored in the harvest cache (if enabled) by
+                # _get_content_and_type()
+                for harvester in p.PluginImplementations(IDCATRDFHarvester):
+                    content, after_download_errors = harvester.after_download(content, harvest_job)
 
-                for error_msg in after_download_errors:
-                    self._save_gather_error(error_msg, harvest_job)
+                    for error_msg in after_download_errors:
+                        self._save_gather_error(error_msg, harvest_job)
 
-            if not content:
-                return []
+                if not content:
+                    return []
 
-            # TODO: profiles conf
-            parser = RDFParser()
+                # TODO: profiles conf
+                parser = RDFParser()
 
-            try:
-                parser.parse(content, _format=rdf_format)
-            except RDFParserException as e:
-                self._save_gather_error('Error parsing the RDF file: {0}'.format(e), harvest_job)
-                return []
+                try:
+                    parser.parse(content, _format=rdf_format)
+                except RDFParserException as e:
+                    self._save_gather_error('Error parsing the RDF file: {0}'.format(e), harvest_job)
+                    return []
+
+                if incremental and not pages and \
+                        not supports_modified_since(parser.g):
+                    if incremental_settings['incremental'] == 'auto':
+                        log.info('The remote catalog ignored the '
+                                 'modified_since parameter, harvesting all '
+                                 'datasets')
+                        incremental = False
+                    else:
+                        log.warning(
+                            'The remote catalog of harvest source %s seems '
+                            'to ignore the modified_since parameter. Deleted '
+                            'datasets will not be detected until the next '
+                            'full harvest, consider setting incremental to '
+                            '"auto"', harvest_job.source.id)
 
             for harvester in p.PluginImplementations(IDCATRDFHarvester):
                 parser, after_parsing_errors = harvester.after_parsing(parser, harvest_job)
@@ -241,8 +496,7 @@ class DCATRDFHarvester(DCATHarvester):
                     obj = HarvestObject(guid=guid, job=harvest_job,
                                         content=json.dumps(dataset))
 
-                    obj.save()
-                    object_ids.append(obj.id)
+                    writer.add(obj)
             except Exception as e:
                 self._save_gather_error('Error when processsing dataset: %r / %s' % (e, traceback.format_exc()),
                                         harvest_job)
@@ -251,17 +505,42 @@ class DCATRDFHarvester(DCATHarvester):
             # get the next page
             next_page_url = parser.next_page()
 
-        # Check if some datasets need to be deleted
-        object_ids_to_delete = self._mark_datasets_for_deletion(guids_in_source, harvest_job)
-
-        object_ids.extend(object_ids_to_delete)
-
-        return object_ids
+            pages += 1
+            if checkpoints and next_page_url:
+                # The objects need to be saved before the checkpoint
+                writer.flush()
+                checkpoints.save(
+                    harvest_job,
+                    next_page_url=next_page_url,
+                    content_hash=last_content_hash,
+                    guids=guids_in_source[saved[0]:],
+                    names=self._names_taken[saved[1]:],
+                    object_ids=writer.ids[saved[2]:],
+                    pages=pages,
+                    incremental=incremental,
+                )
+                saved = (len(guids_in_source), len(self._names_taken),
+                         len(writer.ids))
+
+        writer.flush()
+
+        # Check if some datasets need to be deleted. Incremental harvests
+        # only get the modified datasets, so this is left to the next full one
+        if incremental:
+            object_ids_to_delete = []
+        else:
+            object_ids_to_delete = self._mark_datasets_for_deletion(guids_in_source, harvest_job)
+
+        if checkpoints:
+            checkpoints.clear(harvest_job.source)
+
+        return resumed_object_ids + writer.ids + object_ids_to_delete
 
     def fetch_stage(self, harvest_object):
         # Nothing to do here
         return True
 
+    @deferred_indexing
     def import_stage(self, harvest_object):
 
         log.debug('In DCATRDFHarvester import_stage')
@@ -287,8 +566,8 @@ class DCATRDFHarvester(DCATHarvester):
             return False
 
         try:
-            dataset = json.loads(harvest_object.content)
-        except ValueError:
+            dataset = json.loads(decompress_content(harvest_object.content))
+        except (ValueError, zlib.error):
             self._save_object_error('Could not parse content for object {0}'.format(harvest_object.id),
                                     harvest_object, 'Import')
             return False
@@ -2,6 +2,8 @@
 Helpers used by templates
 """
 
+import threading
+
 import simplejson as json
 
 import ckantoolkit as toolkit
@@ -25,14 +27,64 @@ def get_endpoint(_type="dataset"):
     return "dcat.read_dataset" if _type == "dataset" else "dcat.read_catalog"
 
 
+# Compiled JSON-LD frames, keyed by the canonical form of their context
+_compiled_frames = {}
+_compiled_frames_lock = threading.Lock()
+
+
+def _offline_document_loader(url, options=None):
+    """
+    pyld document loader that never goes to the network
+
+    All the contexts used for framing are provided inline, so any attempt to
+    dereference a remote document is an error.
+    """
+    raise jsonld.JsonLdError(
+        "Remote JSON-LD documents are not loaded when framing",
+        "jsonld.LoadDocumentError",
+        {"url": url},
+        code="loading document failed",
+    )
+
+
+def _compiled_frame(context, _type):
+    """
+    Returns a tuple with the frame and the pyld options to frame documents of
+    the given type with the given context
+
+    Frames are built once per process and context. The context is
+    processed upfront so pyld keeps the resolved version in its shared cache,
+    and framing is configured to use an offline document loader.
+    """
+    key = (json.dumps(context, sort_keys=True), _type)
+    with _compiled_frames_lock:
+        compiled = _compiled_frames.get(key)
+    if compiled is None:
+        frame = {"@context": context, "@type": _type}
+        options = {"documentLoader": _offline_document_loader}
+        # Process the context once so the resolved version is cached by pyld
+        jsonld.expand({"@context": context}, options)
+        with _compiled_frames_lock:
+            compiled = _compiled_frames.setdefault(key, (frame, options))
+
+    return compiled
+
+
 def _get_serialization(
-    dataset_dict, profiles=None, _format="jsonld", context=None, frame=None
+    dataset_dict,
+    profiles=None,
+    _format="jsonld",
+    context=None,
+    frame=None,
+    frame_options=None,
 ):
 
     serializer = RDFSerializer(profiles=profiles)
 
+    # When framing, the frame context is used to compact the final output, so
+    # there is no need to compact the intermediate serialization as well
     output = serializer.serialize_dataset(
-        dataset_dict, _format=_format, context=context
+        dataset_dict, _format=_format, context=None if frame else context
     )
 
     # parse result again to prevent UnicodeDecodeError and add formatting
@@ -42,7 +94,7 @@ def _get_serialization(
             json_data = json.loads(output)
 
             if frame:
-                json_data = jsonld.frame(json_data, frame)
+                json_data = jsonld.frame(json_data, frame, frame_options)
 
             return json.dumps(
                 json_data,
@@ -84,8 +136,13 @@ def croissant(dataset_dict, profiles=None, jsonld_context=None):
 
     context = jsonld_context or JSONLD_CONTEXT
 
-    frame = {"@context": context, "@type": "sc:Dataset"}
+    frame, frame_options = _compiled_frame(context, "sc:Dataset")
 
     return _get_serialization(
-        dataset_dict, profiles, "jsonld", context=context, frame=frame
+        dataset_dict,
+        profiles,
+        "jsonld",
+        context=context,
+        frame=frame,
+        frame_options=frame_options,
     )
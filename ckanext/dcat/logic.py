@@ -1,16 +1,23 @@
 import math
+import datetime
+from urllib.parse import urlencode
 
+import sqlalchemy as sa
 from ckantoolkit import config
 from dateutil.parser import parse as dateutil_parse
 
+import ckan.model as model
 from ckan.plugins import toolkit
 
 import ckanext.dcat.converters as converters
 
 from ckanext.dcat.processors import RDFSerializer
-from ckanext.dcat.utils import catalog_uri
+from ckanext.dcat.utils import catalog_uri, dataset_uri
 
 DATASETS_PER_PAGE = 100
+CATALOG_INDEX_PAGE_SIZE = 10000
+
+EXCLUDED_DATASET_TYPES = ('harvest', 'showcase')
 
 wrong_page_exception = toolkit.ValidationError(
     'Page param must be a positive integer starting in 1')
@@ -78,6 +85,284 @@ def dcat_datasets_list(context, data_dict):
             for ckan_dataset in ckan_datasets]
 
 
+@toolkit.side_effect_free
+def dcat_catalog_index(context, data_dict):
+    '''
+    Returns the URI, modification date and state of all the public datasets
+    of the catalog, including deleted ones, so clients can find out which
+    datasets changed without getting their full metadata
+
+    Datasets are ordered by modification date and paginated with a cursor.
+
+    :param modified_since: only return datasets modified since this
+        ISO-8601 date (optional)
+    :param cursor: the `next` value returned with the previous page
+        (optional)
+    :param limit: maximum number of datasets returned, up to
+        `ckanext.dcat.catalog_index_page_size` (optional)
+
+    Returns a dict with `datasets`, a list of dicts with `uri`,
+    `metadata_modified` and `state` keys, and `next`, the cursor of the
+    next page (None if this is the last one).
+    '''
+    toolkit.check_access('dcat_catalog_index', context, data_dict)
+
+    page_size = int(config.get('ckanext.dcat.catalog_index_page_size',
+                               CATALOG_INDEX_PAGE_SIZE))
+    try:
+        limit = int(data_dict.get('limit') or page_size)
+        if limit < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise toolkit.ValidationError('Limit param must be a positive integer')
+    limit = min(limit, page_size)
+
+    rows = _catalog_changes_query(data_dict).limit(limit).all()
+
+    datasets = [{
+        'uri': uri,
+        'metadata_modified': row.metadata_modified.isoformat(),
+        'state': row.state,
+    } for row, uri in zip(rows, _rows_dataset_uris(rows))]
+
+    return {
+        'datasets': datasets,
+        'next': _row_cursor(rows[-1]) if len(rows) == limit else None,
+    }
+
+
+@toolkit.side_effect_free
+def dcat_catalog_changes(context, data_dict):
+    '''
+    Returns an RDF serialization of the datasets modified since a date or
+    cursor, ordered by modification date
+
+    Deleted datasets are included as tombstones (`as:Tombstone` resources
+    with the date of the change), so clients can remove them. Private
+    datasets are only included as tombstones if
+    `ckanext.dcat.changes_include_private` is enabled. The output is
+    paginated with a cursor, included in the Hydra `next` link.
+
+    :param modified_since: only return datasets modified since this
+        ISO-8601 date (optional)
+    :param cursor: the cursor included in the `next` link of the previous
+        page (optional)
+    :param format: RDF serialization format (optional)
+    :param profiles: list of profiles used to serialize the datasets
+        (optional)
+    '''
+    toolkit.check_access('dcat_catalog_changes', context, data_dict)
+
+    n = int(config.get('ckanext.dcat.datasets_per_page', DATASETS_PER_PAGE))
+
+    include_private = toolkit.asbool(
+        config.get('ckanext.dcat.changes_include_private', False))
+
+    rows = _catalog_changes_query(
+        data_dict, include_private=include_private).limit(n).all()
+
+    dataset_dicts = _get_datasets_by_id(
+        context,
+        [row.id for row in rows if row.state == 'active' and not row.private])
+
+    removed = [row for row in rows if row.state == 'deleted' or row.private]
+    tombstones = [{
+        'uri': uri,
+        'deleted': row.metadata_modified.isoformat(),
+    } for row, uri in zip(removed, _rows_dataset_uris(removed))]
+
+    pagination_info = {
+        'items_per_page': n,
+        'current': _changes_page_url(data_dict.get('cursor')),
+    }
+    if len(rows) == n:
+        pagination_info['next'] = _changes_page_url(_row_cursor(rows[-1]))
+
+    serializer = RDFSerializer(profiles=data_dict.get('profiles'))
+
+    output = serializer.serialize_catalog({}, dataset_dicts,
+                                          _format=data_dict.get('format'),
+                                          pagination_info=pagination_info,
+                                          tombstones=tombstones)
+
+    return output
+
+
+def _catalog_changes_query(data_dict, include_private=False):
+    '''
+    Returns a query for the package table fields and organization of the
+    datasets of the catalog (active and deleted), ordered by modification
+    date and filtered by the `modified_since` and `cursor` params of
+    `data_dict`
+    '''
+    query = model.Session.query(
+        model.Package.id,
+        model.Package.name,
+        model.Package.title,
+        model.Package.type,
+        model.Package.owner_org,
+        model.Package.metadata_modified,
+        model.Package.state,
+        model.Package.private,
+        model.Group.name.label('organization_name'),
+        model.Group.title.label('organization_title'),
+    ).outerjoin(
+        model.Group, model.Group.id == model.Package.owner_org,
+    ).filter(
+        model.Package.state.in_(['active', 'deleted']),
+        ~model.Package.type.in_(EXCLUDED_DATASET_TYPES),
+    )
+
+    if not include_private:
+        query = query.filter(model.Package.private == False)  # noqa: E712
+
+    modified_since = _parse_modified_since(data_dict.get('modified_since'))
+    if modified_since:
+        query = query.filter(model.Package.metadata_modified >= modified_since)
+
+    if data_dict.get('cursor'):
+        query = query.filter(
+            sa.tuple_(model.Package.metadata_modified, model.Package.id)
+            > _decode_cursor(data_dict['cursor']))
+
+    return query.order_by(model.Package.metadata_modified, model.Package.id)
+
+
+def _rows_dataset_uris(rows):
+    '''
+    Returns the URIs of the datasets of `_catalog_changes_query()` rows, in
+    the same order
+
+    The dataset dicts passed to `dataset_uri()` (and so to the
+    `IDCATURIGenerator` plugins) are built from the database without
+    calling `package_show`, to keep the index fast. They have the package
+    table fields, the organization and the extras (both in `extras` and as
+    top level fields, like custom schema fields), but not the resources,
+    tags or groups.
+    '''
+    extras = {}
+    if rows:
+        query = model.Session.query(
+            model.PackageExtra.package_id,
+            model.PackageExtra.key,
+            model.PackageExtra.value,
+        ).filter(
+            model.PackageExtra.package_id.in_([row.id for row in rows]),
+            model.PackageExtra.state == 'active',
+        )
+        for package_id, key, value in query:
+            extras.setdefault(package_id, []).append(
+                {'key': key, 'value': value})
+
+    uris = []
+    for row in rows:
+        row_extras = extras.get(row.id, [])
+        dataset_dict = dict((extra['key'], extra['value'])
+                            for extra in row_extras)
+        dataset_dict.update({
+            'id': row.id,
+            'name': row.name,
+            'title': row.title,
+            'type': row.type,
+            'owner_org': row.owner_org,
+            'organization': {
+                'id': row.owner_org,
+                'name': row.organization_name,
+                'title': row.organization_title,
+            } if row.owner_org else None,
+            'metadata_modified': row.metadata_modified.isoformat(),
+            'state': row.state,
+            'private': row.private,
+            'extras': row_extras,
+        })
+        uris.append(dataset_uri(dataset_dict))
+
+    return uris
+
+
+def _row_cursor(row):
+    return _encode_cursor(row.metadata_modified, row.id)
+
+
+def _get_datasets_by_id(context, dataset_ids):
+    '''
+    Returns the dicts of the given public datasets, in the same order
+
+    The datasets are requested to the search index in a single query, with
+    `package_show` as a fallback for the ones not indexed yet.
+    '''
+    if not dataset_ids:
+        return []
+
+    query = toolkit.get_action('package_search')(dict(context), {
+        'fq': 'id:({0})'.format(' OR '.join(dataset_ids)),
+        'rows': len(dataset_ids),
+    })
+    datasets = dict((d['id'], d) for d in query['results'])
+
+    dataset_dicts = []
+    for dataset_id in dataset_ids:
+        if dataset_id not in datasets:
+            try:
+                datasets[dataset_id] = toolkit.get_action('package_show')(
+                    dict(context), {'id': dataset_id})
+            except (toolkit.ObjectNotFound, toolkit.NotAuthorized):
+                continue
+        dataset_dicts.append(datasets[dataset_id])
+
+    return dataset_dicts
+
+
+def _changes_page_url(cursor):
+    '''
+    Returns the URL of a page of the change feed, keeping the
+    `modified_since` and `profiles` params of the current request
+    '''
+    params = [(key, value) for key, value in toolkit.request.args.items()
+              if key in ('modified_since', 'profiles')]
+    if cursor:
+        params.append(('cursor', cursor))
+
+    url = '{0}{1}'.format(catalog_uri().rstrip('/'), toolkit.request.path)
+
+    return url + ('?' + urlencode(params) if params else '')
+
+
+def _parse_modified_since(modified_since):
+    '''
+    Parses the `modified_since` param into a naive UTC datetime, as stored
+    in the database
+    '''
+    if not modified_since:
+        return None
+    try:
+        modified_since = dateutil_parse(modified_since)
+    except (ValueError, OverflowError, AttributeError):
+        raise toolkit.ValidationError(
+            'Wrong modified date format. Use ISO-8601 format')
+    if modified_since.tzinfo:
+        modified_since = modified_since.astimezone(
+            datetime.timezone.utc).replace(tzinfo=None)
+
+    return modified_since
+
+
+def _encode_cursor(metadata_modified, dataset_id):
+    return '{0},{1}'.format(metadata_modified.isoformat(), dataset_id)
+
+
+def _decode_cursor(cursor):
+    '''
+    Returns the (metadata_modified, id) tuple of the last dataset of a page
+    from a cursor created with `_encode_cursor()`
+    '''
+    try:
+        metadata_modified, dataset_id = cursor.split(',')
+        return datetime.datetime.fromisoformat(metadata_modified), dataset_id
+    except (AttributeError, ValueError):
+        raise toolkit.ValidationError('Wrong cursor param')
+
+
 def _search_ckan_datasets(context, data_dict):
 
     n = int(config.get('ckanext.dcat.datasets_per_page', DATASETS_PER_PAGE))
@@ -109,8 +394,8 @@ def _search_ckan_datasets(context, data_dict):
     search_data_dict['fq_list'] = []
 
     # Exclude certain dataset types
-    search_data_dict['fq_list'].append('-dataset_type:harvest')
-    search_data_dict['fq_list'].append('-dataset_type:showcase')
+    for dataset_type in EXCLUDED_DATASET_TYPES:
+        search_data_dict['fq_list'].append('-dataset_type:' + dataset_type)
 
     if modified_since:
         search_data_dict['fq_list'].append(
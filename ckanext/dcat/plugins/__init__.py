@@ -3,6 +3,7 @@
 from functools import wraps
 import os
 import json
+import datetime
 
 from ckantoolkit import config
 
@@ -16,6 +17,8 @@ import ckanext.dcat.cli as cli
 from ckanext.dcat.logic import (dcat_dataset_show,
                                 dcat_catalog_show,
                                 dcat_catalog_search,
+                                dcat_catalog_index,
+                                dcat_catalog_changes,
                                 dcat_datasets_list,
                                 dcat_auth,
                                 )
@@ -62,6 +65,44 @@ def _get_dataset_schema(dataset_type="dataset"):
     return schema
 
 
+# Indexing plans per dataset type, as (schema, plan) tuples
+_index_plans = {}
+
+
+def _get_index_plan(dataset_type, schema):
+    """
+    Returns the fields that need to be flattened when indexing datasets
+    of the provided schema
+
+    The plan is a list of (field_name, index_keys) tuples, one for each
+    field with repeating subfields, where index_keys maps each subfield
+    name to its flattened index key (`extras_<field>__<subfield>`).
+
+    Plans are computed once per schema. If the schema object returned by
+    ckanext-scheming changes (e.g. the schemas were reloaded), the plan is
+    computed again.
+    """
+    cached = _index_plans.get(dataset_type)
+    if cached and cached[0] is schema:
+        return cached[1]
+
+    plan = []
+    for field in schema.get("dataset_fields", []):
+        if "repeating_subfields" not in field:
+            continue
+        field_name = field["field_name"]
+        index_keys = {
+            subfield["field_name"]: f"extras_{field_name}__{subfield['field_name']}"
+            for subfield in field["repeating_subfields"]
+            if "field_name" in subfield
+        }
+        plan.append((field_name, index_keys))
+
+    _index_plans[dataset_type] = (schema, plan)
+
+    return plan
+
+
 @config_declaration
 class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
 
@@ -125,6 +166,8 @@ class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
             'dcat_dataset_show': dcat_dataset_show,
             'dcat_catalog_show': dcat_catalog_show,
             'dcat_catalog_search': dcat_catalog_search,
+            'dcat_catalog_index': dcat_catalog_index,
+            'dcat_catalog_changes': dcat_catalog_changes,
         }
 
     # IAuthFunctions
@@ -134,6 +177,8 @@ class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
             'dcat_dataset_show': dcat_auth,
             'dcat_catalog_show': dcat_auth,
             'dcat_catalog_search': dcat_auth,
+            'dcat_catalog_index': dcat_auth,
+            'dcat_catalog_changes': dcat_auth,
         }
 
     # IValidators
@@ -142,6 +187,11 @@ class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
 
     # IPackageController
 
+    def delete(self, entity):
+        # package_delete doesn't update the modification date, which is
+        # needed to include the deletion in the catalog change feed
+        entity.metadata_modified = datetime.datetime.utcnow()
+
     # CKAN < 2.10 hooks
     def after_show(self, context, data_dict):
         return self.after_dataset_show(context, data_dict)
@@ -167,10 +217,8 @@ class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
             field_labels = utils.field_labels()
 
             def set_titles(object_dict):
-                for key, value in object_dict.copy().items():
-                    if key in field_labels:
-                        object_dict[field_labels[key]] = object_dict[key]
-                        del object_dict[key]
+                for key in [k for k in object_dict if k in field_labels]:
+                    object_dict[field_labels[key]] = object_dict.pop(key)
 
             for resource in data_dict.get('resources', []):
                 set_titles(resource)
@@ -185,30 +233,37 @@ class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
         schema = _get_dataset_schema(dataset_dict["type"])
         spatial = None
         if schema:
-            for field in schema['dataset_fields']:
-                if field['field_name'] in dataset_dict and 'repeating_subfields' in field:
-                    # Check value because of ckan/ckan#8953
-                    value = dataset_dict[field['field_name']]
-                    if isinstance(value, str):
-                        try:
-                            value = json.loads(value)
-                        except ValueError:
-                            continue
-
-                    for item in value:
-                        for key in item:
-                            value = item[key]
-                            if not isinstance(value, dict):
-                                # Index a flattened version
-                                new_key = f'extras_{field["field_name"]}__{key}'
-                                if not dataset_dict.get(new_key):
-                                    dataset_dict[new_key] = str(value)
-                                else:
-                                    dataset_dict[new_key] += ' ' + str(value)
-
-                    subfields = dataset_dict.pop(field['field_name'], None)
-                    if field['field_name'] == 'spatial_coverage':
-                        spatial = subfields
+            for field_name, index_keys in _get_index_plan(
+                dataset_dict["type"], schema
+            ):
+                if field_name not in dataset_dict:
+                    continue
+                # Check value because of ckan/ckan#8953
+                value = dataset_dict[field_name]
+                if isinstance(value, str):
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        continue
+
+                # Index a flattened version
+                flattened = {}
+                for item in value or []:
+                    if not isinstance(item, dict):
+                        continue
+                    for key, subvalue in item.items():
+                        if not isinstance(subvalue, dict):
+                            flattened.setdefault(key, []).append(str(subvalue))
+
+                for key, values in flattened.items():
+                    new_key = index_keys.get(key) or f"extras_{field_name}__{key}"
+                    if dataset_dict.get(new_key):
+                        values.insert(0, str(dataset_dict[new_key]))
+                    dataset_dict[new_key] = " ".join(values)
+
+                dataset_dict.pop(field_name, None)
+                if field_name == "spatial_coverage":
+                    spatial = value
 
         # Store the first geometry found so ckanext-spatial can pick it up for indexing
         def _check_for_a_geom(spatial_dict):
@@ -226,14 +281,9 @@ class DCATPlugin(p.SingletonPlugin, DefaultTranslation):
             return value
 
         if spatial and not dataset_dict.get('spatial'):
-            # Check value because of ckan/ckan#8953
-            if isinstance(spatial, str):
-                try:
-                    spatial = json.loads(spatial)
-                except ValueError:
-                    pass
-
             for item in spatial:
+                if not isinstance(item, dict):
+                    continue
 
                 value = _check_for_a_geom(item)
                 if value:
@@ -2,6 +2,8 @@ import sys
 import argparse
 import xml
 import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pkg_resources import iter_entry_points
 
 from ckantoolkit import config
@@ -9,20 +11,26 @@ from ckantoolkit import config
 import rdflib
 import rdflib.parser
 from rdflib import URIRef, BNode, Literal
-from rdflib.namespace import Namespace, RDF
+from rdflib.namespace import Namespace, RDF, XSD
 
 import ckan.plugins as p
+import ckan.model as model
 
 from ckanext.dcat.utils import catalog_uri, dataset_uri, url_to_rdflib_format, DCAT_EXPOSE_SUBCATALOGS
-from ckanext.dcat.profiles import DCAT, DCT, FOAF
+from ckanext.dcat.profiles import DCAT, DCT, FOAF, RDFProfile
 from ckanext.dcat.exceptions import RDFProfileException, RDFParserException
 
 HYDRA = Namespace('http://www.w3.org/ns/hydra/core#')
+AS = Namespace('https://www.w3.org/ns/activitystreams#')
 DCAT = Namespace("http://www.w3.org/ns/dcat#")
 
 RDF_PROFILES_ENTRY_POINT_GROUP = 'ckan.rdf.profiles'
 RDF_PROFILES_CONFIG_OPTION = 'ckanext.dcat.rdf.profiles'
 COMPAT_MODE_CONFIG_OPTION = 'ckanext.dcat.compatibility_mode'
+SERIALIZER_WORKERS_CONFIG_OPTION = 'ckanext.dcat.serializer.workers'
+SERIALIZER_GRAPH_BACKEND_CONFIG_OPTION = 'ckanext.dcat.serializer.graph_backend'
+
+DEFAULT_GRAPH_BACKEND = 'conjunctive'
 
 DEFAULT_RDF_PROFILES = ['euro_dcat_ap_3']
 
@@ -33,6 +41,11 @@ def _get_default_rdf_profiles():
 
 SUPPORTED_PAGINATION_COLLECTION_DESIGNS = [HYDRA.PartialCollectionView, HYDRA.PagedCollection]
 
+# Max number of organizations requested at once when prefetching a catalog
+# page (organization_list limits the number of results returned with
+# all_fields)
+PREFETCH_ORGANIZATIONS_CHUNK_SIZE = 25
+
 
 class RDFProcessor(object):
 
@@ -69,7 +82,13 @@ class RDFProcessor(object):
                 config.get(COMPAT_MODE_CONFIG_OPTION, False))
         self.compatibility_mode = compatibility_mode
 
-        self.g = rdflib.ConjunctiveGraph()
+        self.g = self._create_graph()
+
+    def _create_graph(self):
+        '''
+        Returns a new, empty graph to be used by this processor
+        '''
+        return rdflib.ConjunctiveGraph()
 
     def _load_profiles(self, profile_names):
         '''
@@ -144,6 +163,9 @@ class RDFParser(RDFProcessor):
         ... ). By default RF/XML is expected. The optional parameter _format
         can be used to tell rdflib otherwise.
 
+        Data can also be a file-like object opened in binary mode, which is
+        read by the rdflib parsers without loading it first in a string.
+
         It raises a ``RDFParserException`` if there was some error during
         the parsing.
 
@@ -155,13 +177,17 @@ class RDFParser(RDFProcessor):
             _format = 'xml'
 
         try:
-            self.g.parse(data=data, format=_format)
+            if hasattr(data, 'read'):
+                self.g.parse(source=data, format=_format)
+            else:
+                self.g.parse(data=data, format=_format)
         # Apparently there is no single way of catching exceptions from all
         # rdflib parsers at once, so if you use a new one and the parsing
         # exceptions are not cached, add them here.
         # PluginException indicates that an unknown format was passed.
         except (SyntaxError, xml.sax.SAXParseException,
-                rdflib.plugin.PluginException, TypeError) as e:
+                rdflib.plugin.PluginException, TypeError,
+                UnicodeDecodeError) as e:
 
             raise RDFParserException(e)
 
@@ -180,17 +206,22 @@ class RDFParser(RDFProcessor):
         Each dataset is passed to all the loaded profiles before being
         yielded, so it can be further modified by each one of them.
 
+        The properties of each subject are loaded once for each dataset (see
+        `SubjectView`) and shared by all profiles.
+
         Returns a dataset dict that can be passed to eg `package_create`
         or `package_update`
         '''
         for dataset_ref in self._datasets():
             dataset_dict = {}
+            subject_views = {}
             for profile_class in self._profiles:
                 profile = profile_class(
                     self.g,
                     dataset_type=self.dataset_type,
                     compatibility_mode=self.compatibility_mode
                 )
+                profile._subject_views = subject_views
                 profile.parse_dataset(dataset_dict, dataset_ref)
 
             yield dataset_dict
@@ -203,6 +234,135 @@ class RDFSerializer(RDFProcessor):
     Supports different profiles which are the ones that will generate
     the RDF graph.
     '''
+
+    # Dataset schema loaded during the prefetch phase, passed to all profiles
+    _dataset_schema = None
+
+    def __init__(self, profiles=None, dataset_type='dataset',
+                 compatibility_mode=False, graph_backend=None):
+        '''
+        Creates a serializer instance
+
+        On top of the parameters supported by `RDFProcessor`, the backend used
+        for the serializer graph can be passed in `graph_backend`. It can be
+        one of:
+
+        * `conjunctive`: a context-aware `rdflib.ConjunctiveGraph` (the default)
+        * `graph`: a plain `rdflib.Graph`, using the rdflib in-memory store
+        * `simple`: a plain `rdflib.Graph` using the `SimpleMemory` store,
+          which keeps less indexes and doesn't track contexts
+
+        If not provided, the value of the `ckanext.dcat.serializer.graph_backend`
+        config option is used. As the serializers only output triples, the
+        graph contexts of the default backend are never used.
+        '''
+        if not graph_backend:
+            graph_backend = config.get(
+                SERIALIZER_GRAPH_BACKEND_CONFIG_OPTION, DEFAULT_GRAPH_BACKEND)
+        if graph_backend not in ('conjunctive', 'graph', 'simple'):
+            raise ValueError(
+                'Unknown graph backend: {0}'.format(graph_backend))
+        self.graph_backend = graph_backend
+
+        super(RDFSerializer, self).__init__(
+            profiles, dataset_type, compatibility_mode)
+
+    def _create_graph(self, conjunctive=True):
+        '''
+        Returns a new, empty graph using the configured graph backend
+
+        If `conjunctive` is False, a plain graph will be returned even if the
+        `conjunctive` backend is configured.
+        '''
+        if self.graph_backend == 'simple':
+            return rdflib.Graph(store='SimpleMemory')
+        elif self.graph_backend == 'graph' or not conjunctive:
+            return rdflib.Graph()
+        return rdflib.ConjunctiveGraph()
+
+    def _get_profile(self, profile_class, graph=None, dict_indexes=None):
+        '''
+        Returns an instance of the provided profile class for this serializer
+
+        If the dataset schema was already loaded by `prefetch()` it is passed
+        to the profile so it doesn't need to look it up again.
+
+        The profile will add triples to the class graph unless another `graph`
+        is provided.
+
+        `dict_indexes` is a dict where the profile will store the indexes of
+        the dict extras it looks up (see `RDFProfile._get_dict_value()`). The
+        same dict should be passed to all profiles serializing a dataset.
+        '''
+        kwargs = {'compatibility_mode': self.compatibility_mode}
+        if self._dataset_schema is not None:
+            kwargs['dataset_schema'] = self._dataset_schema
+
+        profile = profile_class(
+            graph if graph is not None else self.g, **kwargs)
+        if dict_indexes is not None:
+            profile._dict_indexes = dict_indexes
+
+        return profile
+
+    def prefetch(self, dataset_dicts):
+        '''
+        Gathers in bulk the external lookups needed by the profiles to
+        serialize the provided datasets
+
+        This is called by `serialize_catalog()` so the per-dataset graph
+        building doesn't need to call back into CKAN:
+
+        * The scheming dataset schema is loaded once and passed to all
+          profile instances, instead of being requested by each profile for
+          each dataset.
+        * The organizations of all datasets are requested in bulk with
+          `organization_list` and stored in the profiles organization cache
+          used for the publisher fallback.
+
+        Groups are not requested, as the dataset dicts returned by
+        `package_search` already include all the group details needed.
+        '''
+        try:
+            schema_show = p.toolkit.get_action('scheming_dataset_schema_show')
+            self._dataset_schema = schema_show({}, {'type': 'dataset'})
+        except (KeyError, p.toolkit.ObjectNotFound):
+            # No scheming or no schema for this type, profiles will handle it
+            pass
+
+        org_names = []
+        for dataset_dict in dataset_dicts:
+            org = dataset_dict.get('organization')
+            if (org and org.get('name') and not RDFProfile._get_cached_org(org.get('id'))
+                    and org['name'] not in org_names):
+                org_names.append(org['name'])
+
+        try:
+            org_list = p.toolkit.get_action('organization_list')
+        except KeyError:
+            return
+
+        for i in range(0, len(org_names), PREFETCH_ORGANIZATIONS_CHUNK_SIZE):
+            names = org_names[i:i + PREFETCH_ORGANIZATIONS_CHUNK_SIZE]
+            try:
+                org_dicts = org_list({'ignore_auth': True}, {
+                    'organizations': names,
+                    'all_fields': True,
+                    'include_extras': True,
+                    'include_dataset_count': False,
+                    'limit': len(names),
+                })
+            except p.toolkit.ValidationError:
+                # Profiles will fall back to organization_show
+                return
+
+            for org_dict in org_dicts:
+                # Extras are returned as a list, expose them at the root
+                # level as organization_show does with scheming
+                for extra in org_dict.get('extras') or []:
+                    org_dict.setdefault(extra['key'], extra['value'])
+                RDFProfile._set_cached_org(org_dict['id'], org_dict)
+
     def _add_pagination_triples(self, paging_info):
         '''
         Adds pagination triples to the graph using the paging info provided
@@ -246,6 +406,23 @@ class RDFSerializer(RDFProcessor):
 
         return pagination_ref
 
+    def _add_tombstone_triples(self, tombstones):
+        '''
+        Adds an `as:Tombstone` resource for each of the datasets provided,
+        which have been deleted (or are no longer public)
+
+        Each tombstone is a dict with the dataset `uri` and the date when it
+        was `deleted`.
+        '''
+        self.g.bind('as', AS)
+
+        for tombstone in tombstones:
+            tombstone_ref = URIRef(tombstone['uri'])
+            self.g.add((tombstone_ref, RDF.type, AS.Tombstone))
+            self.g.add((tombstone_ref, AS.formerType, DCAT.Dataset))
+            self.g.add((tombstone_ref, AS.deleted,
+                        Literal(tombstone['deleted'], datatype=XSD.dateTime)))
+
     def graph_from_dataset(self, dataset_dict):
         '''
         Given a CKAN dataset dict, creates a graph using the loaded profiles
@@ -258,12 +435,88 @@ class RDFSerializer(RDFProcessor):
 
         dataset_ref = URIRef(dataset_uri(dataset_dict))
 
+        dict_indexes = {}
         for profile_class in self._profiles:
-            profile = profile_class(self.g, compatibility_mode=self.compatibility_mode)
+            profile = self._get_profile(profile_class, dict_indexes=dict_indexes)
             profile.graph_from_dataset(dataset_dict, dataset_ref)
 
         return dataset_ref
 
+    def _graph_from_dataset_worker(self, dataset_dict):
+        '''
+        Builds the graph of a single dataset on its own separate graph
+
+        Runs on the worker threads of `graphs_from_datasets()`. Returns a
+        tuple with the dataset reference and the dataset graph.
+        '''
+        graph = self._create_graph(conjunctive=False)
+        dataset_ref = URIRef(dataset_uri(dataset_dict))
+
+        dict_indexes = {}
+        try:
+            for profile_class in self._profiles:
+                profile = self._get_profile(profile_class, graph, dict_indexes)
+                profile.graph_from_dataset(dataset_dict, dataset_ref)
+        finally:
+            # Release the database session of this worker thread, if any
+            # profile needed to query the database
+            model.Session.remove()
+
+        return dataset_ref, graph
+
+    def _merge_graph(self, graph, default_namespaces):
+        '''
+        Adds all triples and namespace bindings of the provided graph to the
+        class graph
+
+        Blank nodes keep their labels, so the result is the same as building
+        the dataset graph directly on the class graph. Blank nodes created
+        with `BNode()` get unique labels, so they never clash with the nodes
+        of other datasets, while blank nodes created with an explicit label
+        are merged across datasets, as they would be when serializing the
+        datasets sequentially.
+        '''
+        for prefix, namespace in graph.namespaces():
+            if (prefix, namespace) not in default_namespaces:
+                self.g.bind(prefix, namespace, replace=True)
+
+        for triple in graph:
+            self.g.add(triple)
+
+    def graphs_from_datasets(self, dataset_dicts, workers):
+        '''
+        Given a list of CKAN dataset dicts, creates their graphs in parallel
+        using the loaded profiles
+
+        Each dataset graph is built on a separate graph by a pool of
+        `workers` threads, and then merged into the class RDFLib graph
+        (accessible via `serializer.g`) in the same order as the provided
+        datasets.
+
+        Returns a list with the references to the datasets, in the same
+        order as `dataset_dicts`.
+        '''
+        default_namespaces = set(rdflib.Graph().namespaces())
+        dataset_refs = []
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Run each dataset in a copy of the current context so the
+            # workers have access to the CKAN app and request context
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self._graph_from_dataset_worker,
+                    dataset_dict
+                )
+                for dataset_dict in dataset_dicts
+            ]
+            for future in futures:
+                dataset_ref, graph = future.result()
+                self._merge_graph(graph, default_namespaces)
+                dataset_refs.append(dataset_ref)
+
+        return dataset_refs
+
     def graph_from_catalog(self, catalog_dict=None):
         '''
         Creates a graph for the catalog (CKAN site) using the loaded profiles
@@ -277,7 +530,7 @@ class RDFSerializer(RDFProcessor):
         catalog_ref = URIRef(catalog_uri())
 
         for profile_class in self._profiles:
-            profile = profile_class(self.g, compatibility_mode=self.compatibility_mode)
+            profile = self._get_profile(profile_class)
             profile.graph_from_catalog(catalog_dict, catalog_ref)
 
         return catalog_ref
@@ -330,7 +583,8 @@ class RDFSerializer(RDFProcessor):
 
 
     def serialize_catalog(self, catalog_dict=None, dataset_dicts=None,
-                          _format='xml', pagination_info=None):
+                          _format='xml', pagination_info=None, workers=None,
+                          tombstones=None):
         '''
         Returns an RDF serialization of the whole catalog
 
@@ -349,14 +603,34 @@ class RDFSerializer(RDFProcessor):
         `pagination_info` may be a dict containing keys describing the results
         pagination. See the `_add_pagination_triples()` method for details.
 
+        `workers` is the number of threads used to build the dataset graphs.
+        If not provided, the value of `ckanext.dcat.serializer.workers` is
+        used. See `graphs_from_datasets()` for details.
+
+        `tombstones` may be a list of dicts describing deleted datasets. See
+        the `_add_tombstone_triples()` method for details.
+
         Returns a string with the serialized catalog
         '''
 
+        if dataset_dicts:
+            self.prefetch(dataset_dicts)
+
+        if workers is None:
+            workers = p.toolkit.asint(
+                config.get(SERIALIZER_WORKERS_CONFIG_OPTION, 1))
+
         catalog_ref = self.graph_from_catalog(catalog_dict)
         if dataset_dicts:
-            for dataset_dict in dataset_dicts:
-                dataset_ref = self.graph_from_dataset(dataset_dict)
+            if workers > 1 and len(dataset_dicts) > 1:
+                dataset_refs = self.graphs_from_datasets(dataset_dicts, workers)
+            else:
+                dataset_refs = [
+                    self.graph_from_dataset(dataset_dict)
+                    for dataset_dict in dataset_dicts
+                ]
 
+            for dataset_dict, dataset_ref in zip(dataset_dicts, dataset_refs):
                 cat_ref = self._add_source_catalog(catalog_ref, dataset_dict, dataset_ref)
                 if not cat_ref:
                     self.g.add((catalog_ref, DCAT.dataset, dataset_ref))
@@ -364,6 +638,9 @@ class RDFSerializer(RDFProcessor):
         if pagination_info:
             self._add_pagination_triples(pagination_info)
 
+        if tombstones:
+            self._add_tombstone_triples(tombstones)
+
         if not _format:
             _format = 'xml'
         _format = url_to_rdflib_format(_format)
@@ -1,17 +1,19 @@
-import datetime
+import hashlib
 import json
+import math
+import threading
+from collections import OrderedDict
 from urllib.parse import quote
 
 from ckan.lib.helpers import resource_formats
 from ckan.model.license import LicenseRegister
-from ckantoolkit import ObjectNotFound, asbool, aslist, config, get_action, url_for
-from dateutil.parser import parse as parse_date
+from ckantoolkit import ObjectNotFound, asbool, asint, aslist, config, get_action, url_for
 from geomet import InvalidGeoJSONException, wkt
 from rdflib import BNode, Literal, URIRef, term, PROV
 from rdflib.namespace import ORG, RDF, RDFS, SKOS, XSD, Namespace
 
 from ckanext.dcat.utils import DCAT_EXPOSE_SUBCATALOGS
-from ckanext.dcat.validators import is_date, is_year, is_year_month
+from ckanext.dcat.validators import parse_dcat_date
 
 CNT = Namespace("http://www.w3.org/2011/content#")
 CR = Namespace("http://mlcommons.org/croissant/")
@@ -55,6 +57,17 @@ GEOJSON_IMT = "https://www.iana.org/assignments/media-types/application/vnd.geo+
 
 DEFAULT_SPATIAL_FORMATS = ["wkt"]
 
+# Modes for output geometries with more vertices than
+# ckanext.dcat.output_spatial_max_vertices
+LARGE_GEOMETRY_MODES = ["bbox", "simplify"]
+
+# Max number of geometry conversions kept in memory, and max total size (in
+# characters) of their results. Results bigger than
+# GEOMETRY_CACHE_MAX_ITEM_SIZE are not cached
+GEOMETRY_CACHE_SIZE = 256
+GEOMETRY_CACHE_MAX_SIZE = 16 * 1024 * 1024
+GEOMETRY_CACHE_MAX_ITEM_SIZE = 1024 * 1024
+
 ROOT_DATASET_FIELDS = [
     'name',
     'title',
@@ -120,6 +133,185 @@ class CleanedURIRef(object):
         return URIRef(value)
 
 
+class SubjectView(object):
+    """Read-only view of all the properties of a subject in a graph.
+
+    All the (predicate, object) pairs of the subject are loaded with a single
+    lookup on the graph index and grouped by predicate, so further lookups
+    for the same subject don't need to traverse the graph again. Objects are
+    returned in the same order as `graph.objects()`.
+
+    The view is not updated if the graph changes after it was created.
+    """
+
+    def __init__(self, graph, subject):
+        self.subject = subject
+        self._objects = {}
+        for predicate, _object in graph.predicate_objects(subject):
+            self._objects.setdefault(predicate, []).append(_object)
+
+    def objects(self, predicate):
+        """Returns a list with all the objects for the given predicate"""
+        return self._objects.get(predicate, [])
+
+    def predicates(self):
+        """Returns a list with all the predicates of the subject"""
+        return list(self._objects)
+
+
+def _iter_positions(coordinates):
+    """Yields all the positions in a GeoJSON coordinates array"""
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+    else:
+        for item in coordinates or []:
+            yield from _iter_positions(item)
+
+
+def _geometry_coordinates(geometry):
+    """Returns the coordinates of a GeoJSON geometry, including collections"""
+    if geometry.get("type") == "GeometryCollection":
+        return [
+            _geometry_coordinates(member) for member in geometry.get("geometries") or []
+        ]
+    return geometry.get("coordinates") or []
+
+
+def _simplify_coordinates(coordinates, stride):
+    """
+    Keeps one of each `stride` positions in all the lines and rings of a
+    GeoJSON coordinates array
+
+    The first and last positions of each line are always kept, so rings stay
+    closed, and rings are never reduced to less than four positions.
+    """
+    if not coordinates or isinstance(coordinates[0], (int, float)):
+        return coordinates
+    if coordinates[0] and isinstance(coordinates[0][0], (int, float)):
+        step = min(stride, max(1, (len(coordinates) - 1) // 3))
+        if step <= 1:
+            return coordinates
+        return coordinates[:-1:step] + [coordinates[-1]]
+    return [_simplify_coordinates(item, stride) for item in coordinates]
+
+
+def _is_json(value):
+    """
+    Returns True if the value is a valid JSON document, raises a ValueError
+    otherwise
+    """
+    json.loads(value)
+    return True
+
+
+class _GeometryCache(object):
+    """
+    Thread-safe LRU cache of geometry conversion results, bounded by the
+    number of entries and the total size of the results
+
+    Results are either strings, dicts of strings or flags, and their size is
+    the number of characters of the strings.
+    """
+
+    def __init__(self, max_entries, max_size, max_item_size):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.max_item_size = max_item_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _result_size(result):
+        if isinstance(result, str):
+            return len(result)
+        if isinstance(result, dict):
+            return sum(len(value) for value in result.values())
+        return 0
+
+    def get(self, key):
+        """
+        Returns the cached result for the key, raising a KeyError if there
+        is none
+        """
+        with self._lock:
+            result, size = self._entries[key]
+            self._entries.move_to_end(key)
+        return result
+
+    def set(self, key, result):
+        size = self._result_size(result)
+        if size > self.max_item_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self.size += size
+            while (len(self._entries) > self.max_entries
+                    or self.size > self.max_size):
+                self.size -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def limit_geometry_vertices(geometry, max_vertices, mode="bbox"):
+    """
+    Returns a smaller version of a GeoJSON geometry if it has more than
+    `max_vertices` vertices
+
+    With the `bbox` mode, the geometry is replaced by a polygon with its
+    bounding box. With the `simplify` mode, vertices are evenly dropped from
+    each line or ring until the total is around `max_vertices`.
+
+    Geometries under the limit (or any geometry if `max_vertices` is not
+    set) are returned as they are.
+    """
+    if not max_vertices or not isinstance(geometry, dict):
+        return geometry
+
+    coordinates = _geometry_coordinates(geometry)
+    positions = list(_iter_positions(coordinates))
+    if len(positions) <= max_vertices:
+        return geometry
+
+    if mode == "simplify":
+        stride = math.ceil(len(positions) / max_vertices)
+        if geometry.get("type") == "GeometryCollection":
+            return dict(
+                geometry,
+                geometries=[
+                    dict(
+                        member,
+                        coordinates=_simplify_coordinates(
+                            member.get("coordinates"), stride
+                        ),
+                    )
+                    if "coordinates" in member
+                    else member
+                    for member in geometry.get("geometries") or []
+                ],
+            )
+        return dict(geometry, coordinates=_simplify_coordinates(coordinates, stride))
+
+    xs = [position[0] for position in positions]
+    ys = [position[1] for position in positions]
+    min_x, min_y, max_x, max_y = min(xs), min(ys), max(xs), max(ys)
+    return {
+        "type": "Polygon",
+        "coordinates": [
+            [[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y], [min_x, min_y]]
+        ],
+    }
+
+
 class RDFProfile(object):
     """Base class with helper methods for implementing RDF parsing profiles
 
@@ -135,14 +327,39 @@ class RDFProfile(object):
     # _license().
     _licenceregister_cache = None
 
-    # Cache for organization_show details (used for publisher fallback)
+    # Cache for organization_show details (used for publisher fallback).
+    # Shared by the serializer worker threads, so always accessed with
+    # _get_cached_org() and _set_cached_org()
     _org_cache: dict = {}
+    _org_cache_lock = threading.Lock()
 
-    def __init__(self, graph, dataset_type="dataset", compatibility_mode=False):
+    # Cache for geometry conversions (GeoJSON <-> WKT), keyed by a hash of the
+    # source geometry
+    _geometry_cache = _GeometryCache(
+        GEOMETRY_CACHE_SIZE, GEOMETRY_CACHE_MAX_SIZE, GEOMETRY_CACHE_MAX_ITEM_SIZE
+    )
+
+    # Indexes of the extras of the dicts being serialized, used by
+    # _get_dict_value(). Set by the serializer for each dataset, so it is
+    # shared by all profiles
+    _dict_indexes = None
+
+    # SubjectView objects of the subjects being parsed, used by _objects().
+    # Set by the parser for each dataset, so it is shared by all profiles
+    _subject_views = None
+
+    def __init__(
+        self,
+        graph,
+        dataset_type="dataset",
+        compatibility_mode=False,
+        dataset_schema=None,
+    ):
         """Class constructor
         Graph is an rdflib.Graph instance.
         A scheming dataset type can be provided, in which case the scheming schema
-        will be loaded so it can be used by profiles.
+        will be loaded so it can be used by profiles. If the schema has already
+        been loaded (eg by the serializer) it can be passed as `dataset_schema`.
         In compatibility mode, some fields are modified to maintain
         compatibility with previous versions of the ckanext-dcat parsers
         (eg adding the `dcat_` prefix or storing comma separated lists instead
@@ -155,22 +372,53 @@ class RDFProfile(object):
 
         self._default_lang = config.get("ckan.locale_default", "en")
 
-
-        try:
-            schema_show = get_action("scheming_dataset_schema_show")
+        if dataset_schema is not None:
+            self._dataset_schema = dataset_schema
+        else:
             try:
-                schema = schema_show({}, {"type": dataset_type})
-            except ObjectNotFound:
-                raise ObjectNotFound(f"Unknown dataset schema: {dataset_type}")
+                schema_show = get_action("scheming_dataset_schema_show")
+                try:
+                    schema = schema_show({}, {"type": dataset_type})
+                except ObjectNotFound:
+                    raise ObjectNotFound(f"Unknown dataset schema: {dataset_type}")
 
-            self._dataset_schema = schema
+                self._dataset_schema = schema
 
-        except KeyError:
-            pass
+            except KeyError:
+                pass
 
         if self._dataset_schema:
             self._form_languages = self._dataset_schema.get("form_languages")
 
+    @classmethod
+    def _get_cached_org(cls, org_id):
+        """
+        Returns the organization dict cached for the provided id, or None
+        """
+        with cls._org_cache_lock:
+            return cls._org_cache.get(org_id)
+
+    @classmethod
+    def _set_cached_org(cls, org_id, org_dict):
+        with cls._org_cache_lock:
+            cls._org_cache[org_id] = org_dict
+
+    def _objects(self, subject, predicate):
+        """
+        Returns an iterable with all the objects for this subject and predicate
+
+        When parsing, the objects are read from a `SubjectView` of the
+        subject, built the first time it is looked up, instead of querying
+        the graph each time.
+        """
+        if self._subject_views is None or subject is None:
+            return self.g.objects(subject, predicate)
+
+        view = self._subject_views.get(subject)
+        if view is None:
+            view = self._subject_views[subject] = SubjectView(self.g, subject)
+        return view.objects(predicate)
+
     def _datasets(self):
         """
         Generator that returns all DCAT datasets on the graph
@@ -188,7 +436,7 @@ class RDFProfile(object):
         Yields term.URIRef objects that can be used on graph lookups
         and queries
         """
-        for distribution in self.g.objects(dataset, DCAT.distribution):
+        for distribution in self._objects(dataset, DCAT.distribution):
             yield distribution
 
     def _keywords(self, dataset_ref):
@@ -211,7 +459,7 @@ class RDFProfile(object):
 
         Returns an rdflib reference (URIRef or BNode) or None if not found
         """
-        for _object in self.g.objects(subject, predicate):
+        for _object in self._objects(subject, predicate):
             return _object
         return None
 
@@ -243,7 +491,7 @@ class RDFProfile(object):
         if multilingual:
             return self._object_value_multilingual(subject, predicate)
         fallback = ""
-        for o in self.g.objects(subject, predicate):
+        for o in self._objects(subject, predicate):
             if isinstance(o, Literal):
                 if o.language and o.language == self._default_lang:
                     return str(o)
@@ -251,23 +499,23 @@ class RDFProfile(object):
                 # language is available
                 elif fallback == "":
                     fallback = str(o)
-            elif len(list(self.g.objects(o, RDFS.label))):
-                return str(next(self.g.objects(o, RDFS.label)))
+            elif len(list(self._objects(o, RDFS.label))):
+                return str(next(iter(self._objects(o, RDFS.label))))
             else:
                 return str(o)
         return fallback
 
     def _object_value_multilingual(self, subject, predicate):
         out = {}
-        for o in self.g.objects(subject, predicate):
+        for o in self._objects(subject, predicate):
 
             if isinstance(o, Literal):
                 if o.language:
                     out[o.language] = str(o)
                 else:
                     out[self._default_lang] = str(o)
-            elif len(list(self.g.objects(o, RDFS.label))):
-                for label in self.g.objects(o, RDFS.label):
+            elif len(list(self._objects(o, RDFS.label))):
+                for label in self._objects(o, RDFS.label):
                     if label.language:
                         out[label.language] = str(label)
                     else:
@@ -326,7 +574,7 @@ class RDFProfile(object):
         If the value can not be parsed as integer, returns an empty list
         """
         object_values = []
-        for object in self.g.objects(subject, predicate):
+        for object in self._objects(subject, predicate):
             if object:
                 try:
                     object_values.append(int(float(object)))
@@ -344,7 +592,7 @@ class RDFProfile(object):
         If the value can not be parsed as a float, returns an empty list
         """
         object_values = []
-        for object in self.g.objects(subject, predicate):
+        for object in self._objects(subject, predicate):
             if object:
                 try:
                     object_values.append(float(object))
@@ -361,7 +609,7 @@ class RDFProfile(object):
 
         If no values found, returns an empty list
         """
-        return [str(o) for o in self.g.objects(subject, predicate)]
+        return [str(o) for o in self._objects(subject, predicate)]
 
     def _object_value_list_multilingual(self, subject, predicate):
         """
@@ -386,7 +634,7 @@ class RDFProfile(object):
         If no values found, returns an empty list
         """
         out = {}
-        for o in self.g.objects(subject, predicate):
+        for o in self._objects(subject, predicate):
             lang = o.language or self._default_lang
             if lang not in out:
                 out[lang] = []
@@ -459,7 +707,7 @@ class RDFProfile(object):
     def _read_time_interval_schema_org(self, subject, predicate):
         start_date = end_date = None
 
-        for interval in self.g.objects(subject, predicate):
+        for interval in self._objects(subject, predicate):
             start_date = self._object_value(interval, SCHEMA.startDate)
             end_date = self._object_value(interval, SCHEMA.endDate)
 
@@ -471,7 +719,7 @@ class RDFProfile(object):
     def _read_time_interval_dcat(self, subject, predicate):
         start_date = end_date = None
 
-        for interval in self.g.objects(subject, predicate):
+        for interval in self._objects(subject, predicate):
             start_date = self._object_value(interval, DCAT.startDate)
             end_date = self._object_value(interval, DCAT.endDate)
 
@@ -483,9 +731,9 @@ class RDFProfile(object):
     def _read_time_interval_time(self, subject, predicate):
         start_date = end_date = None
 
-        for interval in self.g.objects(subject, predicate):
-            start_nodes = [t for t in self.g.objects(interval, TIME.hasBeginning)]
-            end_nodes = [t for t in self.g.objects(interval, TIME.hasEnd)]
+        for interval in self._objects(subject, predicate):
+            start_nodes = [t for t in self._objects(interval, TIME.hasBeginning)]
+            end_nodes = [t for t in self._objects(interval, TIME.hasEnd)]
             if start_nodes:
                 start_date = self._object_value_multiple_predicate(
                     start_nodes[0],
@@ -536,11 +784,11 @@ class RDFProfile(object):
         default_locale = config.get("ckan.locale_default", "") or ""
         default_lang = default_locale.split("_")[0] if default_locale else None
 
-        for agent in self.g.objects(subject, predicate):
+        for agent in self._objects(subject, predicate):
             agent_details = {}
             agent_details["uri"] = str(agent) if isinstance(agent, term.URIRef) else ""
 
-            names = list(self.g.objects(agent, FOAF.name))
+            names = list(self._objects(agent, FOAF.name))
             translations = {}
             fallback_name = ""
             for name_literal in names:
@@ -592,7 +840,7 @@ class RDFProfile(object):
         """
 
         contacts = []
-        for agent in self.g.objects(subject, predicate):
+        for agent in self._objects(subject, predicate):
 
             contact = {}
             contact["uri"] = str(agent) if isinstance(agent, URIRef) else ""
@@ -620,20 +868,53 @@ class RDFProfile(object):
 
         Returns the String or None if the value is no valid GeoJSON or WKT geometry.
         """
-        for geometry in self.g.objects(spatial, datatype):
+        for geometry in self._objects(spatial, datatype):
             if geometry.datatype == URIRef(GEOJSON_IMT) or not geometry.datatype:
-                try:
-                    json.loads(str(geometry))
+                if self._convert_geometry(
+                    "geojson_check", str(geometry), _is_json
+                ):
                     cur_value = str(geometry)
-                except (ValueError, TypeError):
-                    pass
             if not cur_value and geometry.datatype == GSP.wktLiteral:
-                try:
-                    cur_value = json.dumps(wkt.loads(str(geometry)))
-                except (ValueError, TypeError):
-                    pass
+                cur_value = self._convert_geometry(
+                    "wkt_to_geojson",
+                    str(geometry),
+                    lambda value: json.dumps(wkt.loads(value)),
+                )
         return cur_value
 
+    def _convert_geometry(self, kind, value, convert):
+        """
+        Returns the result of calling `convert` on a geometry string, or None
+        if the conversion failed
+
+        Results are cached using the `kind` of conversion and a hash of the
+        value, as the same geometries (eg administrative boundaries) tend to be
+        repeated across many datasets. Results bigger than
+        `GEOMETRY_CACHE_MAX_ITEM_SIZE` characters are not cached.
+        """
+        key = (kind, hashlib.sha1(value.encode("utf-8")).digest())
+
+        try:
+            return self._geometry_cache.get(key)
+        except KeyError:
+            pass
+
+        try:
+            result = convert(value)
+        except (
+            TypeError,
+            ValueError,
+            KeyError,
+            IndexError,
+            AttributeError,
+            InvalidGeoJSONException,
+        ):
+            result = None
+
+        self._geometry_cache.set(key, result)
+
+        return result
+
     def _spatial(self, subject, predicate):
         """
         Returns a dict with details about the spatial location
@@ -657,7 +938,7 @@ class RDFProfile(object):
         bbox = None
         cent = None
 
-        for spatial in self.g.objects(subject, predicate):
+        for spatial in self._objects(subject, predicate):
 
             if isinstance(spatial, URIRef):
                 uri = str(spatial)
@@ -665,13 +946,13 @@ class RDFProfile(object):
             if isinstance(spatial, Literal):
                 text = str(spatial)
 
-            if (spatial, RDF.type, DCT.Location) in self.g:
+            if DCT.Location in self._objects(spatial, RDF.type):
                 geom = self._parse_geodata(spatial, LOCN.geometry, geom)
                 bbox = self._parse_geodata(spatial, DCAT.bbox, bbox)
                 cent = self._parse_geodata(spatial, DCAT.centroid, cent)
-                for label in self.g.objects(spatial, SKOS.prefLabel):
+                for label in self._objects(spatial, SKOS.prefLabel):
                     text = str(label)
-                for label in self.g.objects(spatial, RDFS.label):
+                for label in self._objects(spatial, RDFS.label):
                     text = str(label)
 
         return {
@@ -821,12 +1102,45 @@ class RDFProfile(object):
         if key in _dict:
             return _dict[key]
 
-        for extra in _dict.get("extras", []):
+        extras = _dict.get("extras")
+        if not extras:
+            return default
+
+        if self._dict_indexes is not None:
+            return self._extras_index(extras).get(key, default)
+
+        for extra in extras:
             if extra["key"] == key or extra["key"] == "dcat_" + key:
                 return extra["value"]
 
         return default
 
+    def _extras_index(self, extras):
+        """
+        Returns a dict mapping keys to values for the provided list of extras
+
+        Extras with the `dcat_` prefix are also indexed without it. As in the
+        linear lookup, the first matching extra in the list takes precedence.
+
+        The index is built once for each list of extras and reused, unless
+        new extras were added to the list in the meantime.
+        """
+        cached = self._dict_indexes.get(id(extras))
+        if cached and cached[0] is extras and cached[1] == len(extras):
+            return cached[2]
+
+        index = {}
+        for extra in extras:
+            extra_key = extra["key"]
+            index.setdefault(extra_key, extra["value"])
+            if extra_key.startswith("dcat_"):
+                index.setdefault(extra_key[5:], extra["value"])
+
+        # Keep a reference to the list so its id is not reused
+        self._dict_indexes[id(extras)] = (extras, len(extras), index)
+
+        return index
+
     def _read_list_value(self, value):
         items = []
         # List of values
@@ -965,36 +1279,67 @@ class RDFProfile(object):
         spatial_formats = aslist(
             config.get("ckanext.dcat.output_spatial_format", DEFAULT_SPATIAL_FORMATS)
         )
-    
-        if isinstance(value, str):
+        max_vertices = asint(config.get("ckanext.dcat.output_spatial_max_vertices", 0))
+        large_geometry_mode = config.get(
+            "ckanext.dcat.output_spatial_large_geometries", LARGE_GEOMETRY_MODES[0]
+        )
+        if large_geometry_mode not in LARGE_GEOMETRY_MODES:
+            raise ValueError(
+                "Unknown mode for large geometries: {0}".format(large_geometry_mode)
+            )
+
+        output_formats = tuple(f for f in ("wkt", "geojson") if f in spatial_formats)
+        if not output_formats:
+            return
+
+        if not isinstance(value, str):
             try:
-                value = json.loads(value)
+                value = json.dumps(value)
             except (TypeError, ValueError):
                 return
 
+        def _convert(value):
+            geometry = limit_geometry_vertices(
+                json.loads(value), max_vertices, large_geometry_mode
+            )
+            out = {}
+            if "wkt" in output_formats:
+                try:
+                    out["wkt"] = wkt.dumps(geometry, decimals=4)
+                except (TypeError, ValueError, KeyError, InvalidGeoJSONException):
+                    pass
+            if "geojson" in output_formats:
+                out["geojson"] = json.dumps(geometry)
+            return out
+
+        # The GeoJSON value is parsed once and only converted to the output
+        # formats, so these and the vertices limit settings are part of the key
+        kind = "spatial:{}:{}:{}".format(
+            max_vertices, large_geometry_mode, ",".join(output_formats)
+        )
+        values = self._convert_geometry(kind, value, _convert)
+        if values is None:
+            return
+
         # Check if the predicate already exists for the spatial_ref. Location props have only one (0..1). https://github.com/mjanez/ckanext-dcat/issues/4
         if (spatial_ref, predicate, None) in self.g:
             return
     
-        if "wkt" in spatial_formats:
+        if values.get("wkt") is not None:
             # WKT, because GeoDCAT-AP says so
-            try:
-                self.g.add(
-                    (
-                        spatial_ref,
-                        predicate,
-                        Literal(
-                            wkt.dumps(value, decimals=4),
-                            datatype=GSP.wktLiteral,
-                        ),
-                    )
+            self.g.add(
+                (
+                    spatial_ref,
+                    predicate,
+                    Literal(values["wkt"], datatype=GSP.wktLiteral),
                 )
-            except (TypeError, ValueError, InvalidGeoJSONException):
-                pass
+            )
     
-        if "geojson" in spatial_formats:
+        if values.get("geojson") is not None:
             # GeoJSON
-            self.g.add((spatial_ref, predicate, Literal(json.dumps(value), datatype=GEOJSON_IMT)))
+            self.g.add(
+                (spatial_ref, predicate, Literal(values["geojson"], datatype=GEOJSON_IMT))
+            )
 
 
     def _add_spatial_to_dict(self, dataset_dict, key, spatial):
@@ -1281,22 +1626,11 @@ class RDFProfile(object):
         if not value:
             return
 
-        if is_year(value):
-            self.g.add((subject, predicate, _type(value, datatype=XSD.gYear)))
-        elif is_year_month(value):
-            self.g.add((subject, predicate, _type(value, datatype=XSD.gYearMonth)))
-        elif is_date(value):
-            self.g.add((subject, predicate, _type(value, datatype=XSD.date)))
+        xsd_type, date_value = parse_dcat_date(value)
+        if xsd_type:
+            self.g.add((subject, predicate, _type(date_value, datatype=XSD[xsd_type])))
         else:
-            try:
-                default_datetime = datetime.datetime(1, 1, 1, 0, 0, 0)
-                _date = parse_date(value, default=default_datetime)
-
-                self.g.add(
-                    (subject, predicate, _type(_date.isoformat(), datatype=XSD.dateTime))
-                )
-            except ValueError:
-                self.g.add((subject, predicate, _type(value)))
+            self.g.add((subject, predicate, _type(value)))
 
     def _last_catalog_modification(self):
         """
@@ -5,11 +5,20 @@
 # changes for clarity.
 
 import datetime
+import logging
 
+import sqlalchemy as sa
 from dateutil.parser import parse as parse_date
 from rdflib import URIRef, BNode, Literal
 from rdflib.namespace import Namespace
-from ckantoolkit import url_for, config, asbool, get_action
+from ckantoolkit import url_for, config, asbool, get_action, plugin_loaded
+
+try:
+    from ckanext.datastore.backend import DatastoreBackend
+    from ckanext.datastore.backend.postgres import DatastorePostgresqlBackend
+except ImportError:
+    DatastoreBackend = None
+    DatastorePostgresqlBackend = None
 
 from ckanext.dcat.utils import resource_uri
 from .base import RDFProfile, CleanedURIRef
@@ -19,6 +28,8 @@ from .base import (
     RDF,
 )
 
+log = logging.getLogger(__name__)
+
 # The Croissant validator insists on https and will consider invalid output that uses the http namespace
 SCHEMA = Namespace("https://schema.org/")
 
@@ -74,6 +85,28 @@ CROISSANT_FIELD_TYPES = {
     "timestamp": SCHEMA.Date,
 }
 
+# Columns, types and indexes of several DataStore tables, in the same form
+# as the `fields` returned by `datastore_info`
+DATASTORE_FIELDS_SQL = sa.text(
+    """
+    SELECT c.relname AS resource_id,
+           a.attname AS id,
+           t.typname AS type,
+           EXISTS (
+               SELECT 1 FROM pg_index ix
+               WHERE ix.indrelid = c.oid AND a.attnum = ANY(ix.indkey)
+           ) AS is_index
+    FROM pg_class c
+    JOIN pg_attribute a ON a.attrelid = c.oid
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE c.relkind = 'r'
+          AND c.relname IN :resource_ids
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum
+    """
+).bindparams(sa.bindparam("resource_ids", expanding=True))
+
 
 class CroissantProfile(RDFProfile):
     """
@@ -349,6 +382,12 @@ class CroissantProfile(RDFProfile):
         pass
 
     def _resources_graph(self, dataset_ref, dataset_dict):
+
+        # Get the DataStore fields of all resources upfront
+        self._datastore_fields = self._get_datastore_fields(
+            self._datastore_resources(dataset_dict.get("resources", []))
+        )
+
         for resource_dict in dataset_dict.get("resources", []):
             if isinstance(resource_dict, dict):
 
@@ -513,16 +552,12 @@ class CroissantProfile(RDFProfile):
             return
 
         # Get fields info
-        try:
-            datastore_info = get_action("datastore_info")(
-                {"ignore_auth": True},
-                {"id": resource_dict["id"]}
-            )
-        except KeyError:
-            # DataStore not enabled
-            return
+        datastore_fields = getattr(self, "_datastore_fields", None) or {}
+        if resource_dict["id"] not in datastore_fields:
+            datastore_fields = self._get_datastore_fields([resource_dict])
 
-        if not datastore_info or not datastore_info.get("fields"):
+        fields = datastore_fields.get(resource_dict["id"])
+        if not fields:
             return
 
         recordset_ref = URIRef(f"{resource_dict['id']}/records")
@@ -531,7 +566,7 @@ class CroissantProfile(RDFProfile):
 
         unique_fields = []
 
-        for field in datastore_info["fields"]:
+        for field in fields:
 
             field_ref = URIRef(f"{resource_dict['id']}/records/{field['id']}")
 
@@ -558,3 +593,93 @@ class CroissantProfile(RDFProfile):
                 self.g.add((recordset_ref, CR.key, unique_field_ref))
 
         self.g.add((dataset_ref, CR.recordSet, recordset_ref))
+
+    def _datastore_resources(self, resource_dicts):
+        """
+        Returns a list with all the resource dicts, including subresources,
+        that have data in the DataStore
+        """
+        out = []
+        for resource_dict in resource_dicts:
+            if not isinstance(resource_dict, dict):
+                continue
+            if resource_dict.get("id") and asbool(
+                resource_dict.get("datastore_active")
+            ):
+                out.append(resource_dict)
+            out.extend(
+                self._datastore_resources(resource_dict.get("subresources", []))
+            )
+        return out
+
+    def _get_datastore_fields(self, resource_dicts):
+        """
+        Returns a dict with the DataStore fields for each of the provided
+        resource dicts, keyed by resource id
+
+        When the DataStore uses the PostgreSQL backend, the fields of all
+        resources are read with a single query. Otherwise (or if that query
+        fails) `datastore_info` is called for each resource.
+        """
+        resource_ids = list(
+            dict.fromkeys(resource_dict["id"] for resource_dict in resource_dicts)
+        )
+        if not resource_ids:
+            return {}
+
+        out = _query_datastore_fields(resource_ids)
+        if out is not None:
+            return out
+
+        out = {}
+        for resource_id in resource_ids:
+            try:
+                datastore_info = get_action("datastore_info")(
+                    {"ignore_auth": True}, {"id": resource_id}
+                )
+            except KeyError:
+                # DataStore not enabled, no need to check other resources
+                for other_resource_id in resource_ids:
+                    out.setdefault(other_resource_id, [])
+                break
+
+            out[resource_id] = (datastore_info or {}).get("fields") or []
+
+        return out
+
+
+def _query_datastore_fields(resource_ids):
+    """
+    Returns a dict with the DataStore fields of the provided resource ids,
+    read from the DataStore database with a single query
+
+    Returns None if the DataStore is not enabled, it does not use the
+    PostgreSQL backend or the query failed.
+    """
+    if DatastorePostgresqlBackend is None or not plugin_loaded("datastore"):
+        return None
+
+    backend = DatastoreBackend.get_active_backend()
+    if not isinstance(backend, DatastorePostgresqlBackend):
+        return None
+
+    try:
+        # There is no public method to get the DataStore read engine
+        with backend._get_read_engine().connect() as conn:
+            rows = conn.execute(
+                DATASTORE_FIELDS_SQL, {"resource_ids": resource_ids}
+            ).fetchall()
+    except sa.exc.SQLAlchemyError as e:
+        log.warning("Could not query the DataStore fields: %s", e)
+        return None
+
+    out = {resource_id: [] for resource_id in resource_ids}
+    for row in rows:
+        # Skip internal columns like _id and _full_text
+        if row.id.startswith("_"):
+            continue
+        out[row.resource_id].append(
+            {"id": row.id, "type": row.type, "schema": {"is_index": row.is_index}}
+        )
+
+    return out
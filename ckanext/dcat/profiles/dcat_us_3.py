@@ -64,9 +64,7 @@ class DCATUS3Profile(EuropeanDCATAP3Profile):
 
     def _data_dictionary_parse(self, data_dict, subject):
 
-        g = self.g
-
-        for data_dictionary_ref in g.objects(subject, DCATUS.describedBy):
+        for data_dictionary_ref in self._objects(subject, DCATUS.describedBy):
             if isinstance(data_dictionary_ref, Literal):
                 data_dict["data_dictionary"] = str(data_dictionary_ref)
             else:
@@ -142,10 +140,8 @@ class DCATUS3Profile(EuropeanDCATAP3Profile):
 
     def _parse_dataset_v3_us(self, dataset_dict, dataset_ref):
 
-        g = self.g
-
         # Bounding box
-        for bbox_ref in g.objects(dataset_ref, DCATUS.geographicBoundingBox):
+        for bbox_ref in self._objects(dataset_ref, DCATUS.geographicBoundingBox):
             if not dataset_dict.get("bbox"):
                 dataset_dict["bbox"] = []
             dataset_dict["bbox"].append(
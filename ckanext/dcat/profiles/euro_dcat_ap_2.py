@@ -65,12 +65,12 @@ class EuropeanDCATAP2Profile(BaseEuropeanDCATAPProfile):
         super().parse_dataset(dataset_dict, dataset_ref)
 
         # --- Provenance deserialization ---
-        was_generated_by = self.g.value(dataset_ref, PROV.wasGeneratedBy)
+        was_generated_by = self._object(dataset_ref, PROV.wasGeneratedBy)
         if was_generated_by:
             activity_dict = {}
             activity_dict["uri"] = str(was_generated_by)
             activity_dict["type"] = [
-                str(t) for t in self.g.objects(was_generated_by, RDF.type)
+                str(t) for t in self._objects(was_generated_by, RDF.type)
             ]
             activity_dict["label"] = self._object_value(was_generated_by, RDFS.label)
             activity_dict["seeAlso"] = self._object_value(was_generated_by, RDFS.seeAlso)
@@ -179,7 +179,7 @@ class EuropeanDCATAP2Profile(BaseEuropeanDCATAPProfile):
                     # Access services
                     access_service_list = []
 
-                    for access_service in self.g.objects(
+                    for access_service in self._objects(
                         distribution, DCAT.accessService
                     ):
                         access_service_dict = {}
@@ -584,11 +584,11 @@ class EuropeanDCATAP2Profile(BaseEuropeanDCATAPProfile):
         
     def _parse_qualified_attributions(self, dataset_ref):
         attributions = []
-        for qual_attr_ref in self.g.objects(dataset_ref, PROV.qualifiedAttribution):
+        for qual_attr_ref in self._objects(dataset_ref, PROV.qualifiedAttribution):
             attr = {}
 
             # Get role
-            for role_ref in self.g.objects(qual_attr_ref, DCAT.hadRole):
+            for role_ref in self._objects(qual_attr_ref, DCAT.hadRole):
                 attr["role"] = str(role_ref)
                 break
 
@@ -293,7 +293,7 @@ class BaseEuropeanDCATAPProfile(RDFProfile):
                 resource_dict["size"] = size
 
             # Checksum
-            for checksum in self.g.objects(distribution, SPDX.checksum):
+            for checksum in self._objects(distribution, SPDX.checksum):
                 algorithm = self._object_value(checksum, SPDX.algorithm)
                 checksum_value = self._object_value(checksum, SPDX.checksumValue)
                 if algorithm:
@@ -461,15 +461,13 @@ class BaseEuropeanDCATAPProfile(RDFProfile):
         elif dataset_dict.get("organization"):
             # Fall back to dataset org
             org_id = dataset_dict["organization"]["id"]
-            org_dict = None
-            if org_id in self._org_cache:
-                org_dict = self._org_cache[org_id]
-            else:
+            org_dict = self._get_cached_org(org_id)
+            if org_dict is None:
                 try:
                     org_dict = toolkit.get_action("organization_show")(
                         {"ignore_auth": True}, {"id": org_id}
                     )
-                    self._org_cache[org_id] = org_dict
+                    self._set_cached_org(org_id, org_dict)
                 except toolkit.ObjectNotFound:
                     pass
             if org_dict:
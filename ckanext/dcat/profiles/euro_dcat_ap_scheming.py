@@ -321,7 +321,7 @@ class EuropeanDCATAPSchemingProfile(RDFProfile):
         """
 
         relations = []
-        for relation in self.g.objects(subject, predicate):
+        for relation in self._objects(subject, predicate):
             relation_details = {}
             relation_details["uri"] = (
                 str(relation) if isinstance(relation, term.URIRef) else ""
@@ -137,7 +137,7 @@ class EuropeanHealthDCATAPProfile(EuropeanDCATAP3Profile):
         quality_annotation = []
 
         # Find all quality annotations for this dataset
-        for annotation_ref in self.g.objects(dataset_ref, DQV.hasQualityAnnotation):
+        for annotation_ref in self._objects(dataset_ref, DQV.hasQualityAnnotation):
             annotation_dict = {}
 
             # Get the body (must be a URI)
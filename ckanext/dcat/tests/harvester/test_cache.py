@@ -0,0 +1,76 @@
+import os
+
+from ckanext.dcat.harvesters.cache import PageCache
+
+
+URL = 'http://some.dcat.file.rdf?page=2'
+
+
+def _store(cache, url, chunks, headers=None, content_type='text/turtle'):
+    return list(cache.store(url, chunks, headers or {}, content_type))
+
+
+def test_store_and_get(tmp_path):
+
+    cache = PageCache(str(tmp_path))
+
+    chunks = [b'<a> <b> ', b'<c> .']
+    assert _store(cache, URL, chunks, {'etag': '"abc"'}) == chunks
+
+    metadata, body_path = cache.get(URL)
+
+    assert metadata['url'] == URL
+    assert metadata['etag'] == '"abc"'
+    assert metadata['content_type'] == 'text/turtle'
+    assert metadata['size'] == 13
+    with open(body_path, 'rb') as f:
+        assert f.read() == b'<a> <b> <c> .'
+
+
+def test_get_not_cached(tmp_path):
+
+    cache = PageCache(str(tmp_path))
+
+    assert cache.get(URL) is None
+    assert cache.validators(URL) == {}
+
+
+def test_validators(tmp_path):
+
+    cache = PageCache(str(tmp_path))
+
+    _store(cache, URL, [b'content'], {
+        'etag': '"abc"', 'last-modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+    assert cache.validators(URL) == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+    }
+    assert cache.is_fresh(URL, {'etag': '"abc"'})
+    assert not cache.is_fresh(URL, {'etag': '"def"'})
+    assert not cache.is_fresh(URL, {})
+
+
+def test_partial_download_not_stored(tmp_path):
+
+    cache = PageCache(str(tmp_path))
+
+    chunks = cache.store(URL, iter([b'one', b'two']), {}, 'text/turtle')
+    next(chunks)
+    chunks.close()
+
+    assert cache.get(URL) is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_corrupted_body_ignored(tmp_path):
+
+    cache = PageCache(str(tmp_path))
+
+    _store(cache, URL, [b'content'])
+
+    _, body_path = cache.get(URL)
+    with open(body_path, 'wb') as f:
+        f.write(b'other content')
+
+    assert cache.get(URL) is None
@@ -0,0 +1,134 @@
+from collections import namedtuple
+
+from ckanext.dcat.harvesters.checkpoint import GatherCheckpoints
+
+
+Source = namedtuple('Source', ['id', 'url', 'config'])
+Job = namedtuple('Job', ['id', 'source'])
+
+SOURCE = Source('source-id', 'http://some.dcat.file.rdf', '{"rdf_format": "xml"}')
+
+
+def _save(checkpoints, job, **kwargs):
+    checkpoint = {
+        'next_page_url': 'http://some.dcat.file.rdf?page=2',
+        'content_hash': 'abc',
+        'guids': ['guid-1', 'guid-2'],
+        'names': ['dataset-1', 'dataset-2'],
+        'object_ids': ['object-1', 'object-2'],
+        'pages': 1,
+    }
+    checkpoint.update(kwargs)
+    checkpoints.save(job, **checkpoint)
+
+
+def test_save_and_load(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+    _save(checkpoints, Job('job-id', SOURCE))
+
+    checkpoint = checkpoints.load(SOURCE)
+
+    assert checkpoint['job_id'] == 'job-id'
+    assert checkpoint['next_page_url'] == 'http://some.dcat.file.rdf?page=2'
+    assert checkpoint['guids'] == ['guid-1', 'guid-2']
+    assert checkpoint['object_ids'] == ['object-1', 'object-2']
+    assert checkpoint['pages'] == 1
+
+
+def test_save_appends_to_log(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+    _save(checkpoints, Job('job-id', SOURCE))
+    _save(checkpoints, Job('job-id', SOURCE), pages=2,
+          guids=['guid-3'], names=['dataset-3'], object_ids=['object-3'])
+    # Nothing new in this page
+    _save(checkpoints, Job('job-id', SOURCE), pages=3,
+          guids=[], names=[], object_ids=[])
+
+    checkpoint = checkpoints.load(SOURCE)
+
+    assert checkpoint['pages'] == 3
+    assert checkpoint['guids'] == ['guid-1', 'guid-2', 'guid-3']
+    assert checkpoint['names'] == ['dataset-1', 'dataset-2', 'dataset-3']
+    assert checkpoint['object_ids'] == ['object-1', 'object-2', 'object-3']
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'source-id.json', 'source-id.log']
+    assert len((tmp_path / 'source-id.log').read_text().splitlines()) == 2
+
+
+def test_load_ignores_log_lines_after_checkpoint(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+    _save(checkpoints, Job('job-id', SOURCE))
+    log_size = (tmp_path / 'source-id.log').stat().st_size
+
+    # The process was killed between appending to the log and saving the
+    # checkpoint
+    with open(str(tmp_path / 'source-id.log'), 'a') as f:
+        f.write('{"guids": ["guid-3"], "names": [], "object_ids": []}\n')
+
+    checkpoint = checkpoints.load(SOURCE)
+
+    assert checkpoint['guids'] == ['guid-1', 'guid-2']
+    assert (tmp_path / 'source-id.log').stat().st_size == log_size
+
+
+def test_load_log_missing(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+    _save(checkpoints, Job('job-id', SOURCE))
+    (tmp_path / 'source-id.log').unlink()
+
+    assert checkpoints.load(SOURCE) is None
+
+
+def test_load_no_checkpoint(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+
+    assert checkpoints.load(SOURCE) is None
+
+
+def test_load_source_changed(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+    _save(checkpoints, Job('job-id', SOURCE))
+
+    assert checkpoints.load(SOURCE._replace(url='http://other.dcat.file.rdf')) is None
+    assert checkpoints.load(SOURCE._replace(config='{}')) is None
+
+    # The outdated checkpoint is kept until it is cleared by the harvester
+    assert checkpoints.load(SOURCE)['job_id'] == 'job-id'
+
+
+def test_load_max_resumes(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path), max_resumes=2)
+    _save(checkpoints, Job('job-id', SOURCE), resumes=1)
+
+    assert checkpoints.load(SOURCE)['resumes'] == 1
+
+    _save(checkpoints, Job('job-id', SOURCE), resumes=2,
+          guids=[], names=[], object_ids=[])
+
+    assert checkpoints.load(SOURCE) is None
+
+    # Gathering a new page resets the count
+    _save(checkpoints, Job('job-id', SOURCE), pages=2,
+          guids=[], names=[], object_ids=[])
+
+    assert checkpoints.load(SOURCE)['pages'] == 2
+
+
+def test_clear(tmp_path):
+
+    checkpoints = GatherCheckpoints(str(tmp_path))
+    _save(checkpoints, Job('job-id', SOURCE))
+
+    checkpoints.clear(SOURCE)
+    checkpoints.clear(SOURCE)
+
+    assert checkpoints.load(SOURCE) is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,109 @@
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+
+import pytest
+
+from ckanext.dcat.harvesters.compression import (
+    decompress_chunks,
+    detect_compression,
+    strip_compression_extension,
+)
+
+
+CONTENT = b''.join(
+    '<http://example.org/{0}> <http://example.org/p> "{0}" .\n'.format(i).encode('utf8')
+    for i in range(10000)
+)
+
+
+def _chunks(content, size=1000):
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+def _zip(content):
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('catalog.nt', content)
+    return f.getvalue()
+
+
+@pytest.mark.parametrize('compressed,compression', [
+    (gzip.compress(CONTENT), 'gzip'),
+    (bz2.compress(CONTENT), 'bz2'),
+    (lzma.compress(CONTENT), 'xz'),
+    (_zip(CONTENT), 'zip'),
+])
+def test_decompress(compressed, compression):
+
+    assert detect_compression(compressed[:6]) == compression
+
+    assert b''.join(decompress_chunks(_chunks(compressed))) == CONTENT
+
+
+def test_decompress_plain_content():
+
+    assert detect_compression(CONTENT[:6]) is None
+
+    assert b''.join(decompress_chunks(_chunks(CONTENT, 3))) == CONTENT
+
+
+def test_decompress_empty():
+
+    assert b''.join(decompress_chunks([])) == b''
+
+
+def test_decompress_concatenated_streams():
+
+    compressed = gzip.compress(CONTENT[:100]) + gzip.compress(CONTENT[100:])
+
+    assert b''.join(decompress_chunks(_chunks(compressed))) == CONTENT
+
+
+def test_decompress_truncated():
+
+    compressed = gzip.compress(CONTENT)[:-100]
+
+    with pytest.raises(ValueError):
+        b''.join(decompress_chunks(_chunks(compressed)))
+
+
+def test_decompress_max_size():
+
+    compressed = gzip.compress(b' ' * 1024 * 1024 * 10)
+
+    assert len(compressed) < 1024 * 1024
+
+    with pytest.raises(ValueError) as e:
+        b''.join(decompress_chunks(_chunks(compressed), 1024 * 1024))
+
+    assert str(e.value) == 'Remote file is too big.'
+
+
+def test_decompress_zip_max_size():
+
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED) as zip_file:
+        zip_file.writestr('catalog.nt', b' ' * 1024 * 1024 * 2)
+    read = []
+
+    def chunks():
+        for chunk in _chunks(f.getvalue(), 1024):
+            read.append(chunk)
+            yield chunk
+
+    with pytest.raises(ValueError) as e:
+        b''.join(decompress_chunks(chunks(), 1024 * 1024))
+
+    assert str(e.value) == 'Remote file is too big.'
+    # The compressed file is not spooled to disk past the limit
+    assert len(b''.join(read)) <= 1024 * 1024
+
+
+def test_strip_compression_extension():
+
+    assert strip_compression_extension('/data/catalog.ttl.gz') == '/data/catalog.ttl'
+    assert strip_compression_extension('catalog.rdf.XZ') == 'catalog.rdf'
+    assert strip_compression_extension('catalog.ttl') == 'catalog.ttl'
@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
 
 from collections import defaultdict
+import bz2
+import gzip
+import json
+import os
 import re
+from urllib.parse import parse_qs, urlparse
 
 import pytest
 import responses
 try:
-    from unittest.mock import patch
+    from unittest.mock import Mock, patch
 except ImportError:
-    from mock import patch
+    from mock import Mock, patch
 
 import ckan.plugins as p
 from ckantoolkit import config
@@ -18,7 +23,18 @@ import ckanext.harvest.model as harvest_model
 from ckanext.harvest import queue
 
 from ckanext.dcat.harvesters import DCATRDFHarvester
+from ckanext.dcat.harvesters import ratelimit
+from ckanext.dcat.harvesters.checkpoint import GatherCheckpoints
+from ckanext.dcat.harvesters.base import (
+    HarvestObjectWriter,
+    compress_content,
+    decompress_content,
+    _reindex_if_last_object,
+    reindex_harvest_job,
+    suppress_search_indexing,
+)
 from ckanext.dcat.interfaces import IDCATRDFHarvester
+from ckanext.dcat.processors import RDFParser
 import ckanext.dcat.harvesters.rdf
 
 
@@ -265,6 +281,101 @@ class TestDCATHarvestUnit(object):
 
         assert guid == None
 
+    def test_get_content_local_compressed_file(self, tmp_path):
+
+        path = tmp_path / 'catalog.ttl.bz2'
+        path.write_bytes(bz2.compress(b'<http://a> <http://b> <http://c> .'))
+
+        content, content_type = DCATRDFHarvester()._get_content_and_type(
+            str(path), None)
+
+        assert content == '<http://a> <http://b> <http://c> .'
+        assert content_type == 'turtle'
+
+
+class TestHarvestObjectWriter(object):
+
+    class MockHarvestObject(object):
+        id = None
+
+    @patch('ckanext.dcat.harvesters.base.model.Session')
+    def test_commits_in_batches(self, mock_session):
+
+        writer = HarvestObjectWriter(batch_size=2)
+
+        objects = [self.MockHarvestObject() for i in range(5)]
+        for obj in objects:
+            writer.add(obj)
+
+        assert mock_session.add.call_count == 5
+        assert mock_session.commit.call_count == 2
+
+        writer.flush()
+
+        assert mock_session.commit.call_count == 3
+
+        writer.flush()
+
+        assert mock_session.commit.call_count == 3
+
+        assert writer.ids == [obj.id for obj in objects]
+        assert all(writer.ids)
+        assert len(set(writer.ids)) == 5
+
+    @patch('ckanext.dcat.harvesters.base.model.Session')
+    def test_keeps_existing_ids(self, mock_session):
+
+        writer = HarvestObjectWriter(batch_size=2)
+
+        obj = self.MockHarvestObject()
+        obj.id = 'some-id'
+
+        assert writer.add(obj) == 'some-id'
+        assert writer.ids == ['some-id']
+
+    @pytest.mark.ckan_config('ckanext.dcat.gather_batch_size', '3')
+    def test_batch_size_from_config(self):
+
+        assert HarvestObjectWriter().batch_size == 3
+
+    @patch('ckanext.dcat.harvesters.base.model.Session')
+    def test_compress(self, mock_session):
+
+        writer = HarvestObjectWriter(compress=True)
+
+        obj = self.MockHarvestObject()
+        obj.content = '{"title": "Test dataset"}'
+        writer.add(obj)
+
+        assert obj.content.startswith('zlib:')
+        assert decompress_content(obj.content) == '{"title": "Test dataset"}'
+
+
+def test_compress_content():
+
+    content = json.dumps({'title': 'Dataset ñ', 'notes': 'Some notes ' * 100})
+
+    compressed = compress_content(content)
+
+    assert compressed.startswith('zlib:')
+    assert len(compressed) < len(content)
+    assert decompress_content(compressed) == content
+
+
+@pytest.mark.parametrize('content', [None, '', '{"title": "Test dataset"}'])
+def test_decompress_content_not_compressed(content):
+
+    assert decompress_content(content) == content
+
+
+@pytest.mark.ckan_config('ckan.search.automatic_indexing', True)
+def test_suppress_search_indexing():
+
+    with suppress_search_indexing():
+        assert config['ckan.search.automatic_indexing'] is False
+
+    assert config['ckan.search.automatic_indexing'] is True
+
 
 class FunctionalHarvestTest(object):
 
@@ -628,6 +739,88 @@ class TestDCATHarvestFunctional(FunctionalHarvestTest):
                                   self.rdf_content,
                                   self.rdf_content_type)
 
+    @pytest.mark.ckan_config('ckanext.dcat.defer_indexing', True)
+    def test_harvest_create_rdf_deferred_indexing(self):
+
+        with patch('ckanext.dcat.harvesters.base.reindex_harvest_job',
+                   wraps=reindex_harvest_job) as mock_reindex:
+            self._test_harvest_create(self.rdf_mock_url,
+                                      self.rdf_content,
+                                      self.rdf_content_type)
+
+            # Only called after the last object was imported
+            assert mock_reindex.call_count == 1
+
+    @pytest.mark.ckan_config('ckanext.dcat.defer_indexing', True)
+    @responses.activate
+    def test_harvest_deferred_indexing_last_object_fails(self):
+
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type)
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(self.rdf_mock_url)
+
+        self._create_harvest_job(harvest_source['id'])
+        self._run_jobs(harvest_source['id'])
+        self._gather_queue()
+
+        with patch('ckanext.dcat.harvesters.base.reindex_harvest_job') as mock_reindex:
+            self._fetch_queue()
+
+            assert mock_reindex.call_count == 0
+
+            # The import of the last object raises an exception
+            with patch('ckanext.dcat.harvesters.rdf.decompress_content',
+                       side_effect=Exception('Import failed')):
+                with pytest.raises(Exception, match='Import failed'):
+                    self._fetch_queue()
+
+            assert mock_reindex.call_count == 1
+
+    def test_deferred_indexing_concurrent_imports(self, caplog):
+
+        harvest_object = Mock(harvest_job_id='job-id')
+
+        # Another fetch consumer is importing the other pending object
+        with patch('ckanext.dcat.harvesters.base._pending_object_states',
+                   return_value={'IMPORT'}), \
+                patch('ckanext.dcat.harvesters.base.reindex_harvest_job') as mock_reindex:
+            _reindex_if_last_object(harvest_object)
+
+        assert mock_reindex.call_count == 0
+        assert 'ckan dcat reindex-harvest-job job-id' in caplog.text
+
+    @pytest.mark.ckan_config('ckanext.dcat.defer_indexing', True)
+    @responses.activate
+    def test_harvest_deferred_indexing_suppresses_indexing(self):
+
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type)
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(self.rdf_mock_url)
+
+        with patch('ckanext.dcat.harvesters.base.reindex_harvest_job'):
+            self._run_full_job(harvest_source['id'], num_objects=2)
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 0
+
+        job = helpers.call_action(
+            'harvest_job_list', {}, source_id=harvest_source['id'])[0]
+        assert reindex_harvest_job(job['id']) == 2
+
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 2
+
     def test_harvest_create_ttl(self):
 
         self._test_harvest_create(self.ttl_mock_url,
@@ -775,6 +968,295 @@ class TestDCATHarvestFunctional(FunctionalHarvestTest):
             ['Example dataset 1', 'Example dataset 2',
              'Example dataset 3', 'Example dataset 4'])
 
+    @responses.activate
+    @patch.dict(ratelimit._buckets, clear=True)
+    @patch('ckanext.dcat.harvesters.ratelimit.time.sleep')
+    def test_harvest_rdf_retry_throttled(self, mock_sleep, caplog):
+
+        self._add_responses_solr_passthru()
+
+        # The server throttles the first request
+        responses.add(responses.GET, self.rdf_mock_url,
+                      status=429, headers={'Retry-After': '10'})
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type)
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(self.rdf_mock_url)
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+
+        mock_sleep.assert_any_call(10)
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 2
+
+        # The retries are logged, but they are not job errors
+        assert harvest_model.Session.query(
+            harvest_model.HarvestGatherError).count() == 0
+        assert [
+            r for r in caplog.records
+            if r.levelname == 'WARNING' and
+            'Remote requests: 3 (1 retries, 1 throttled by the server)'
+            in r.getMessage()]
+
+    @responses.activate
+    def test_harvest_rdf_pagination_resume(self, ckan_config, monkeypatch, tmp_path):
+
+        monkeypatch.setitem(ckan_config, 'ckanext.dcat.harvest_checkpoint_dir', str(tmp_path))
+
+        self._add_responses_solr_passthru()
+
+        responses.add(responses.GET, self.rdf_mock_url_pagination_1,
+                      body=self.rdf_content_pagination_1,
+                      content_type=self.rdf_content_type)
+        # The second page fails
+        responses.add(responses.GET, self.rdf_mock_url_pagination_2,
+                      status=500)
+        for url in (self.rdf_mock_url_pagination_1, self.rdf_mock_url_pagination_2):
+            responses.add(responses.HEAD, url,
+                          status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(
+            self.rdf_mock_url_pagination_1)
+
+        self._run_full_job(harvest_source['id'], num_objects=0)
+        self._run_jobs()
+
+        checkpoint = GatherCheckpoints(str(tmp_path)).load(
+            harvest_model.HarvestSource.get(harvest_source['id']))
+        assert checkpoint['next_page_url'] == self.rdf_mock_url_pagination_2
+        assert len(checkpoint['object_ids']) == 2
+
+        # The failed job finished and the gathered objects were kept
+        first_job = helpers.call_action(
+            'harvest_job_list', {}, source_id=harvest_source['id'])[0]
+        assert first_job['status'] == 'Finished'
+
+        responses.replace(responses.GET, self.rdf_mock_url_pagination_2,
+                          body=self.rdf_content_pagination_2,
+                          content_type=self.rdf_content_type)
+
+        # The next job only gets the second page, and imports the objects of
+        # both pages
+        self._run_full_job(harvest_source['id'], num_objects=4)
+
+        page_1_calls = [
+            c for c in responses.calls
+            if c.request.method == 'GET'
+            and c.request.url.rstrip('/') == self.rdf_mock_url_pagination_1]
+        assert len(page_1_calls) == 1
+
+        assert list(tmp_path.iterdir()) == []
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 4
+
+    def _fail_second_page(self, tmp_path):
+        '''
+        Runs a job of a paginated source that fails gathering the second
+        page, leaving a checkpoint with the two objects of the first one
+        '''
+        self._add_responses_solr_passthru()
+
+        responses.add(responses.GET, self.rdf_mock_url_pagination_1,
+                      body=self.rdf_content_pagination_1,
+                      content_type=self.rdf_content_type)
+        responses.add(responses.GET, self.rdf_mock_url_pagination_2,
+                      status=500)
+        for url in (self.rdf_mock_url_pagination_1, self.rdf_mock_url_pagination_2):
+            responses.add(responses.HEAD, url,
+                          status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(
+            self.rdf_mock_url_pagination_1)
+
+        self._run_full_job(harvest_source['id'], num_objects=0)
+        self._run_jobs()
+
+        responses.replace(responses.GET, self.rdf_mock_url_pagination_2,
+                          body=self.rdf_content_pagination_2,
+                          content_type=self.rdf_content_type)
+
+        checkpoint = GatherCheckpoints(str(tmp_path)).load(
+            harvest_model.HarvestSource.get(harvest_source['id']))
+        assert len(checkpoint['object_ids']) == 2
+
+        return harvest_source, checkpoint['object_ids']
+
+    def _detached_objects(self, harvest_source_id):
+        return harvest_model.Session.query(harvest_model.HarvestObject) \
+            .filter_by(harvest_source_id=harvest_source_id,
+                       harvest_job_id=None) \
+            .all()
+
+    @responses.activate
+    def test_harvest_rdf_pagination_resume_source_changed(
+            self, ckan_config, monkeypatch, tmp_path):
+
+        monkeypatch.setitem(ckan_config, 'ckanext.dcat.harvest_checkpoint_dir', str(tmp_path))
+
+        harvest_source, object_ids = self._fail_second_page(tmp_path)
+        assert len(self._detached_objects(harvest_source['id'])) == 2
+
+        source = harvest_model.HarvestSource.get(harvest_source['id'])
+        source.config = '{"rdf_format": "xml"}'
+        harvest_model.Session.commit()
+
+        # The checkpoint is discarded with its objects, and both pages are
+        # gathered again
+        self._run_full_job(harvest_source['id'], num_objects=4)
+
+        assert self._detached_objects(harvest_source['id']) == []
+        assert harvest_model.Session.query(harvest_model.HarvestObject) \
+            .filter(harvest_model.HarvestObject.id.in_(object_ids)).count() == 0
+        assert list(tmp_path.iterdir()) == []
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 4
+
+    @responses.activate
+    def test_harvest_rdf_pagination_resume_objects_missing(
+            self, ckan_config, monkeypatch, tmp_path):
+
+        monkeypatch.setitem(ckan_config, 'ckanext.dcat.harvest_checkpoint_dir', str(tmp_path))
+
+        harvest_source, object_ids = self._fail_second_page(tmp_path)
+
+        # One of the objects of the checkpoint was processed somehow
+        harvest_object = harvest_model.HarvestObject.get(object_ids[0])
+        harvest_object.state = 'COMPLETE'
+        harvest_model.Session.commit()
+
+        # The checkpoint can't be resumed, so the rest of its objects are
+        # deleted and both pages are gathered again
+        self._run_full_job(harvest_source['id'], num_objects=4)
+
+        assert [o.id for o in self._detached_objects(harvest_source['id'])] == [
+            object_ids[0]]
+        assert harvest_model.HarvestObject.get(object_ids[1]) is None
+        assert list(tmp_path.iterdir()) == []
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 4
+
+    @responses.activate
+    def test_harvest_rdf_cache_and_replay(self, ckan_config, monkeypatch, tmp_path):
+
+        monkeypatch.setitem(ckan_config, 'ckanext.dcat.harvest_cache_dir', str(tmp_path))
+
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type,
+                      headers={'ETag': '"v1"'})
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(self.rdf_mock_url)
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+        self._run_jobs()
+
+        assert len(os.listdir(str(tmp_path))) == 2
+
+        # Conditional request, the server returns a 304
+        responses.replace(responses.GET, self.rdf_mock_url, status=304)
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+        self._run_jobs()
+
+        assert responses.calls[-1].request.headers['If-None-Match'] == '"v1"'
+
+        # Replay, no requests made
+        monkeypatch.setitem(ckan_config, 'ckanext.dcat.harvest_cache_replay', True)
+        num_calls = len(responses.calls)
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+
+        assert len([
+            c for c in responses.calls[num_calls:]
+            if c.request.url.startswith(self.rdf_mock_url)]) == 0
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 2
+
+    @pytest.mark.ckan_config('ckanext.dcat.compress_harvest_objects', True)
+    def test_harvest_create_rdf_compressed(self):
+
+        self.test_harvest_create_rdf()
+
+        obj = harvest_model.Session.query(harvest_model.HarvestObject).first()
+        assert obj.content.startswith('zlib:')
+
+    def test_harvest_create_ttl_local_file(self, tmp_path):
+
+        path = tmp_path / 'catalog.ttl'
+        path.write_text(self.ttl_content, encoding='utf8')
+
+        harvest_source = self._create_harvest_source(str(path))
+
+        with patch.object(RDFParser, 'parse', autospec=True,
+                          side_effect=RDFParser.parse) as mock_parse:
+            self._run_full_job(harvest_source['id'], num_objects=2)
+
+        # The file was passed to the parser as a stream
+        assert hasattr(mock_parse.call_args[0][1], 'read')
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 2
+        for result in results['results']:
+            assert result['title'] in ('Example dataset 1',
+                                       'Example dataset 2')
+
+    def test_harvest_create_rdf_gzip(self):
+
+        self._test_harvest_create(self.rdf_mock_url + '.gz',
+                                  gzip.compress(self.rdf_content.encode('utf8')),
+                                  'application/gzip')
+
+    @patch('ckanext.dcat.harvesters.DCATRDFHarvester._save_gather_error')
+    @responses.activate
+    @pytest.mark.ckan_config('ckanext.dcat.max_file_size', 1)
+    def test_harvest_compressed_file_size(self, mock_save_gather_error):
+        harvester = DCATRDFHarvester()
+        self._add_responses_solr_passthru()
+        url = self.ttl_mock_url + '.gz'
+
+        # Small compressed file that exceeds the max size once decompressed
+        responses.add(responses.GET, url,
+                      body=gzip.compress(b' ' * 1024 * 1024 * 2),
+                      content_type='application/gzip')
+        responses.add(responses.HEAD, url,
+                      status=405, content_type='application/gzip')
+
+        harvest_source = self._create_harvest_source(url)
+        harvest_job = self._create_harvest_job(harvest_source['id'])
+
+        content, content_type = harvester._get_content_and_type(
+            url, harvest_job, 1)
+
+        assert content is None
+        mock_save_gather_error.assert_called_once_with(
+            'Remote file is too big.', harvest_job)
+
+    @pytest.mark.ckan_config('ckanext.dcat.gather_batch_size', '1')
+    def test_harvest_create_rdf_pagination_batch_size(self):
+
+        self.test_harvest_create_rdf_pagination()
+
     @responses.activate
     def test_harvest_create_rdf_pagination_same_content(self):
 
@@ -999,6 +1481,108 @@ class TestDCATHarvestFunctional(FunctionalHarvestTest):
 
         assert results['results'][0]['title'] == 'Example dataset 1'
 
+    def _get_modified_since_params(self, url):
+        return [
+            parse_qs(urlparse(c.request.url).query).get('modified_since')
+            for c in responses.calls
+            if c.request.method == 'GET' and c.request.url.startswith(url)]
+
+    @responses.activate
+    def test_harvest_rdf_incremental(self, caplog):
+
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type)
+        # Only one of the datasets was modified since the first job
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_remote_file_small,
+                      content_type=self.rdf_content_type)
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(
+            self.rdf_mock_url, config='{"incremental": true}')
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+        self._run_jobs()
+
+        self._run_full_job(harvest_source['id'], num_objects=1)
+
+        first_job, second_job = self._get_modified_since_params(self.rdf_mock_url)
+        assert first_job is None
+        assert len(second_job) == 1
+
+        # The dataset not returned by the remote was not deleted
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 2
+
+        # The page has no pagination info with the modified_since parameter,
+        # so the remote might have ignored it
+        assert [
+            r for r in caplog.records
+            if r.levelname == 'WARNING' and
+            'seems to ignore the modified_since parameter' in r.getMessage()]
+
+    @responses.activate
+    def test_harvest_rdf_incremental_auto_not_supported(self):
+
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type)
+        # The remote ignores modified_since and returns the full listing
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_remote_file_small,
+                      content_type=self.rdf_content_type)
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(
+            self.rdf_mock_url, config='{"incremental": "auto"}')
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+        self._run_jobs()
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+
+        assert len(self._get_modified_since_params(self.rdf_mock_url)[1]) == 1
+
+        # Deleted datasets are still detected
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 1
+
+    @responses.activate
+    def test_harvest_rdf_incremental_full_harvest_due(self):
+
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_content, content_type=self.rdf_content_type)
+        responses.add(responses.GET, self.rdf_mock_url,
+                      body=self.rdf_remote_file_small,
+                      content_type=self.rdf_content_type)
+        responses.add(responses.HEAD, self.rdf_mock_url,
+                      status=405, content_type=self.rdf_content_type)
+
+        harvest_source = self._create_harvest_source(
+            self.rdf_mock_url, config='{"incremental": true}')
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+        self._run_jobs()
+
+        with patch('ckanext.dcat.harvesters.rdf.is_full_harvest_due',
+                   return_value=True):
+            self._run_full_job(harvest_source['id'], num_objects=2)
+
+        assert self._get_modified_since_params(self.rdf_mock_url) == [None, None]
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+
+        assert results['count'] == 1
+
     def test_harvest_bad_format_rdf(self):
 
         self._test_harvest_bad_format(self.rdf_mock_url,
@@ -1117,6 +1701,14 @@ class TestDCATHarvestFunctional(FunctionalHarvestTest):
 @pytest.mark.ckan_config('ckan.plugins', 'dcat harvest dcat_rdf_harvester test_rdf_harvester')
 class TestDCATHarvestFunctionalExtensionPoints(FunctionalHarvestTest):
 
+    def test_local_file_not_streamed_with_after_download(self, tmp_path):
+
+        path = tmp_path / 'catalog.ttl'
+        path.write_text(self.ttl_content, encoding='utf8')
+
+        # after_download() expects the content as a string
+        assert not DCATRDFHarvester()._can_stream_file(str(path))
+
     def test_harvest_before_download_extension_point_gets_called(self, reset_calls_counter):
         reset_calls_counter('test_rdf_harvester')
         plugin = p.get_plugin('test_rdf_harvester')
@@ -1663,13 +2255,17 @@ class TestDCATRDFHarvester(object):
     def test_validates_correct_config(self):
         harvester = DCATRDFHarvester()
 
-        for config in ['{}', '{"rdf_format":"text/turtle"}']:
+        for config in ['{}', '{"rdf_format":"text/turtle"}',
+                       '{"rate_limit": 0.5, "max_retries": 5, "timeout": 30}',
+                       '{"incremental": "auto", "full_harvest_interval": 30}']:
             assert config == harvester.validate_config(config)
 
     def test_does_not_validate_incorrect_config(self):
         harvester = DCATRDFHarvester()
 
-        for config in ['invalid', '{invalid}', '{rdf_format:invalid}']:
+        for config in ['invalid', '{invalid}', '{rdf_format:invalid}',
+                       '{"rate_limit": -1}', '{"max_retries": "many"}',
+                       '{"incremental": "yes"}', '{"full_harvest_interval": 0}']:
             try:
                 harvester.validate_config(config)
                 assert False
@@ -0,0 +1,134 @@
+import datetime
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.namespace import RDF
+
+from ckanext.dcat.harvesters.incremental import (
+    add_modified_since,
+    get_incremental_settings,
+    is_full_harvest_due,
+    supports_modified_since,
+    validate_incremental_settings,
+)
+from ckanext.dcat.processors import DCAT, HYDRA
+
+
+CATALOG_URL = 'https://data.some.org/catalog.ttl'
+
+
+def _graph(page_url=None, datasets=1):
+    g = Graph()
+    for i in range(datasets):
+        g.add((URIRef('https://data.some.org/dataset/{}'.format(i)),
+               RDF.type, DCAT.Dataset))
+    if page_url:
+        g.add((URIRef(page_url), RDF.type, HYDRA.PagedCollection))
+        g.add((URIRef(page_url), HYDRA.totalItems, Literal(datasets)))
+    return g
+
+
+class TestIncrementalSettings(object):
+
+    def test_defaults(self):
+
+        assert get_incremental_settings() == {
+            'incremental': False, 'full_harvest_interval': 7}
+
+    @pytest.mark.ckan_config('ckanext.dcat.harvest_incremental', 'auto')
+    @pytest.mark.ckan_config('ckanext.dcat.harvest_full_interval', '14')
+    def test_ckan_config(self):
+
+        assert get_incremental_settings() == {
+            'incremental': 'auto', 'full_harvest_interval': 14}
+
+    @pytest.mark.ckan_config('ckanext.dcat.harvest_incremental', 'auto')
+    def test_source_config_overrides(self):
+
+        settings = get_incremental_settings(
+            {'incremental': False, 'full_harvest_interval': 1})
+
+        assert settings == {'incremental': False, 'full_harvest_interval': 1}
+
+    @pytest.mark.parametrize('source_config', [
+        {'incremental': 'yes'},
+        {'incremental': 1},
+        {'full_harvest_interval': 0},
+        {'full_harvest_interval': 'weekly'},
+    ])
+    def test_validate_invalid(self, source_config):
+
+        with pytest.raises(ValueError):
+            validate_incremental_settings(source_config)
+
+    def test_validate_valid(self):
+
+        validate_incremental_settings(
+            {'incremental': 'auto', 'full_harvest_interval': 0.5})
+        validate_incremental_settings({'incremental': True})
+
+
+def test_is_full_harvest_due():
+
+    # 2024-01-01 was a Monday, weekly periods start on Thursdays
+    monday = datetime.datetime(2024, 1, 1, 10)
+
+    assert not is_full_harvest_due(monday, monday + datetime.timedelta(days=2), 7)
+    assert is_full_harvest_due(monday, monday + datetime.timedelta(days=3), 7)
+    assert is_full_harvest_due(monday, monday + datetime.timedelta(days=1), 1)
+    assert not is_full_harvest_due(
+        monday, monday + datetime.timedelta(hours=1), 1)
+
+
+def test_add_modified_since():
+
+    since = datetime.datetime(2024, 1, 1, 10, 30, 15, 123456)
+
+    url = add_modified_since(CATALOG_URL, since)
+
+    assert url.startswith(CATALOG_URL + '?')
+    assert parse_qs(urlparse(url).query) == {
+        'modified_since': ['2024-01-01T10:30:15']}
+
+
+def test_add_modified_since_existing_params():
+
+    since = datetime.datetime(2024, 1, 1)
+
+    url = add_modified_since(
+        CATALOG_URL + '?profiles=dcat_ap&modified_since=2020-01-01', since)
+
+    assert parse_qs(urlparse(url).query) == {
+        'profiles': ['dcat_ap'], 'modified_since': ['2024-01-01T00:00:00']}
+
+
+class TestSupportsModifiedSince(object):
+
+    def test_pagination_with_param(self):
+
+        graph = _graph(CATALOG_URL + '?modified_since=2024-01-01T00:00:00&page=1')
+
+        assert supports_modified_since(graph)
+
+    def test_pagination_links_with_param(self):
+
+        graph = _graph()
+        node = BNode()
+        graph.add((node, RDF.type, HYDRA.PartialCollectionView))
+        graph.add((node, HYDRA.first,
+                   URIRef(CATALOG_URL + '?modified_since=2024-01-01&page=1')))
+
+        assert supports_modified_since(graph)
+
+    def test_no_datasets(self):
+
+        assert supports_modified_since(_graph(datasets=0))
+
+    def test_pagination_without_param(self):
+
+        assert not supports_modified_since(_graph(CATALOG_URL + '?page=1'))
+
+    def test_no_pagination(self):
+
+        assert not supports_modified_since(_graph())
@@ -1,3 +1,7 @@
+import os
+import json
+from urllib.parse import parse_qs, urlparse
+
 import responses
 import pytest
 try:
@@ -8,8 +12,13 @@ except ImportError:
 from ckantoolkit.tests import helpers
 
 import ckan.tests.factories as factories
+import ckanext.harvest.model as harvest_model
 
-from ckanext.dcat.harvesters._json import copy_across_resource_ids, DCATJSONHarvester
+from ckanext.dcat.harvesters._json import (
+    copy_across_resource_ids,
+    iter_json_datasets,
+    DCATJSONHarvester,
+)
 
 from .test_harvester import FunctionalHarvestTest, clean_queues
 
@@ -212,6 +221,53 @@ class TestDCATJSONHarvestFunctional(FunctionalHarvestTest):
 
         return (existing_resources, new_resources)
 
+    @pytest.mark.ckan_config('ckanext.dcat.json_harvester.streaming', True)
+    def test_harvest_create_streaming(self):
+
+        self._test_harvest_create(self.json_mock_url,
+                                  self.json_content,
+                                  self.json_content_type,
+                                  exp_titles=['Example dataset 1', 'Example dataset 2'])
+
+    @pytest.mark.ckan_config('ckanext.dcat.json_harvester.streaming', True)
+    @responses.activate
+    def test_harvest_streaming_cache_and_replay(
+            self, ckan_config, monkeypatch, tmp_path):
+
+        monkeypatch.setitem(
+            ckan_config, 'ckanext.dcat.harvest_cache_dir', str(tmp_path))
+
+        url = self.json_mock_url
+        self._add_responses_solr_passthru()
+        responses.add(responses.GET, url,
+                      body=self.json_content, content_type=self.json_content_type)
+        responses.add(responses.HEAD, url,
+                      status=405, content_type=self.json_content_type)
+
+        harvest_source = self._create_harvest_source(url, source_type='dcat_json')
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+        self._run_jobs()
+
+        # The remote ignores the page parameter, so both requested pages
+        # were stored even if the parser stops reading at the datasets list
+        assert len(os.listdir(str(tmp_path))) == 4
+
+        # Replay, no requests made
+        monkeypatch.setitem(ckan_config, 'ckanext.dcat.harvest_cache_replay', True)
+        num_calls = len(responses.calls)
+
+        self._run_full_job(harvest_source['id'], num_objects=2)
+
+        assert len([
+            c for c in responses.calls[num_calls:]
+            if c.request.url.startswith(url)]) == 0
+
+    @pytest.mark.ckan_config('ckanext.dcat.compress_harvest_objects', True)
+    def test_harvest_create_compressed(self):
+
+        self.test_harvest_create()
+
     def test_harvest_does_not_create_with_invalid_tags(self):
         self._test_harvest_create(
             'http://some.dcat.file.invalid.json',
@@ -220,6 +276,154 @@ class TestDCATJSONHarvestFunctional(FunctionalHarvestTest):
             num_datasets=1,
             exp_num_datasets=0)
 
+    def _json_page(self, *guids, **kwargs):
+        title = kwargs.get('title', 'Example dataset')
+        return json.dumps({'dataset': [
+            {
+                'identifier': 'http://example.com/datasets/{0}'.format(guid),
+                'title': '{0} {1}'.format(title, guid),
+            }
+            for guid in guids
+        ]})
+
+    def _add_json_pages(self, url, pages):
+        '''
+        Mocks a paginated DCAT JSON endpoint. `pages` is a list with the
+        content of each page, the ones after it return a 404. It can be
+        modified to change the content returned by later jobs.
+        '''
+        calls = []
+
+        def callback(request):
+            page = int(parse_qs(urlparse(request.url).query).get('page', [1])[0])
+            calls.append(page)
+            if page > len(pages):
+                return (404, {}, '')
+            return (200, {'Content-Type': self.json_content_type}, pages[page - 1])
+
+        responses.add_callback(responses.GET, url, callback=callback)
+        responses.add(responses.HEAD, url,
+                      status=405, content_type=self.json_content_type)
+
+        return calls
+
+    @pytest.mark.parametrize('same_content', [True, False])
+    @responses.activate
+    def test_harvest_pagination_stops_on_repeated_page(self, same_content):
+
+        url = self.json_mock_url
+        # The remote ignores the page parameter after the second page
+        pages = [self._json_page(1, 2), self._json_page(3)]
+        if same_content:
+            pages.append(pages[1])
+        else:
+            # Same guids, different content
+            pages.append(self._json_page(3, title='Modified dataset'))
+        pages.append(self._json_page(4))
+
+        self._add_responses_solr_passthru()
+        calls = self._add_json_pages(url, pages)
+
+        harvest_source = self._create_harvest_source(url, source_type='dcat_json')
+
+        self._run_full_job(harvest_source['id'], num_objects=3)
+
+        assert calls == [1, 2, 3]
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+        assert sorted(d['title'] for d in results['results']) == [
+            'Example dataset 1', 'Example dataset 2', 'Example dataset 3']
+
+    @responses.activate
+    def test_harvest_deleted_datasets(self):
+
+        url = self.json_mock_url
+        pages = [self._json_page(1, 2), self._json_page(3)]
+
+        self._add_responses_solr_passthru()
+        self._add_json_pages(url, pages)
+
+        harvest_source = self._create_harvest_source(url, source_type='dcat_json')
+
+        self._run_full_job(harvest_source['id'], num_objects=3)
+        self._run_jobs()
+
+        # Dataset 2 is no longer in the remote
+        pages[:] = [self._json_page(1), self._json_page(3)]
+
+        self._run_full_job(harvest_source['id'], num_objects=3)
+
+        statuses = {}
+        for obj in harvest_model.Session.query(harvest_model.HarvestObject):
+            status = [e.value for e in obj.extras if e.key == 'status'][0]
+            statuses.setdefault(obj.guid, set()).add(status)
+
+        assert statuses == {
+            'http://example.com/datasets/1': {'new', 'change'},
+            'http://example.com/datasets/2': {'new', 'delete'},
+            'http://example.com/datasets/3': {'new', 'change'},
+        }
+
+        fq = "+type:dataset harvest_source_id:{0}".format(harvest_source['id'])
+        results = helpers.call_action('package_search', {}, fq=fq)
+        assert sorted(d['title'] for d in results['results']) == [
+            'Example dataset 1', 'Example dataset 3']
+
+
+def _chunks(content, size):
+    content = content.encode('utf8')
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+class TestIterJSONDatasets(object):
+
+    doc = {
+        '@context': 'https://project-open-data.cio.gov/v1.1/schema/catalog.jsonld',
+        'conformsTo': ['https://project-open-data.cio.gov/v1.1/schema'],
+        'dataset': [
+            {'identifier': 'dataset-{0}'.format(i), 'title': 'Dataset ñ {0}'.format(i),
+             'keyword': ['a', 'b'], 'size': i * 1.5, 'accessLevel': None}
+            for i in range(10)
+        ],
+        'describedBy': 'https://project-open-data.cio.gov/v1.1/schema/catalog.json',
+    }
+
+    @pytest.mark.parametrize('size', [1, 2, 7, 1024 * 512])
+    def test_object_in_chunks(self, size):
+
+        content = json.dumps(self.doc, indent=2, ensure_ascii=False)
+
+        items = list(iter_json_datasets(_chunks(content, size)))
+
+        assert [dataset for dataset, _ in items] == self.doc['dataset']
+        for dataset, raw in items:
+            assert json.loads(raw) == dataset
+
+    def test_list(self):
+
+        content = json.dumps(self.doc['dataset'])
+
+        items = list(iter_json_datasets(_chunks(content, 3)))
+
+        assert [dataset for dataset, _ in items] == self.doc['dataset']
+
+    @pytest.mark.parametrize('content', [
+        '[]', '{}', '{"dataset": []}', '{"title": "No datasets"}'
+    ])
+    def test_no_datasets(self, content):
+
+        assert list(iter_json_datasets([content])) == []
+
+    @pytest.mark.parametrize('content', [
+        '', '"dataset"', '[{"title": "a"}', '[{"title": "a"} {"title": "b"}]',
+        '{"dataset": [{"title": }]}',
+    ])
+    def test_wrong_documents(self, content):
+
+        with pytest.raises(ValueError):
+            list(iter_json_datasets(_chunks(content, 2)))
+
 
 class TestCopyAcrossResourceIds(object):
     def test_copied_because_same_uri(self):
@@ -0,0 +1,258 @@
+import datetime
+from email.utils import format_datetime
+from unittest import mock
+
+import pytest
+import requests
+
+from ckanext.dcat.harvesters import ratelimit
+from ckanext.dcat.harvesters.ratelimit import (
+    RequestStats,
+    TokenBucket,
+    get_request_settings,
+    get_retry_after,
+    send_request,
+    validate_request_settings,
+)
+
+
+URL = 'http://some.dcat.file.rdf'
+
+SETTINGS = {'rate_limit': 0, 'max_retries': 3, 'timeout': 10}
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _response(status_code=200, headers=None):
+    response = mock.Mock(status_code=status_code)
+    response.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    return response
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with mock.patch('ckanext.dcat.harvesters.ratelimit.time.sleep',
+                    side_effect=clock.sleep):
+        yield clock
+
+
+@pytest.fixture
+def buckets(clock):
+    '''Host buckets using the fake clock, not shared with other tests'''
+    with mock.patch.dict(ratelimit._buckets, clear=True):
+        with mock.patch(
+                'ckanext.dcat.harvesters.ratelimit.TokenBucket',
+                side_effect=lambda rate: TokenBucket(rate, clock=clock)):
+            yield ratelimit._buckets
+
+
+class TestTokenBucket(object):
+
+    def test_no_limit(self, clock):
+
+        bucket = TokenBucket(None, clock=clock)
+
+        assert sum(bucket.acquire() for i in range(10)) == 0
+
+    def test_rate_limit(self, clock):
+
+        bucket = TokenBucket(2, clock=clock)
+
+        for i in range(5):
+            bucket.acquire()
+
+        # The first request is made straight away, then two per second
+        assert clock.now == pytest.approx(2)
+
+    def test_throttled_halves_rate(self, clock):
+
+        bucket = TokenBucket(2, clock=clock)
+        bucket.throttled()
+
+        assert bucket.rate == 1
+
+        bucket.succeeded()
+
+        assert bucket.rate == pytest.approx(1.1)
+
+        for i in range(20):
+            bucket.succeeded()
+
+        assert bucket.rate == 2
+
+    def test_throttled_no_limit(self, clock):
+
+        bucket = TokenBucket(None, clock=clock)
+        bucket.throttled()
+
+        assert bucket.rate == ratelimit.INITIAL_THROTTLED_RATE / 2
+
+        while bucket.rate:
+            bucket.succeeded()
+
+        assert bucket.rate is None
+
+    def test_throttled_retry_after(self, clock):
+
+        bucket = TokenBucket(None, clock=clock)
+        bucket.throttled(retry_after=30)
+
+        assert bucket.acquire() == 30
+
+
+class TestRetryAfter(object):
+
+    def test_seconds(self):
+
+        assert get_retry_after(_response(429, {'Retry-After': '120'})) == 120
+
+    def test_date(self):
+
+        date = datetime.datetime.now(datetime.timezone.utc) + \
+            datetime.timedelta(seconds=60)
+
+        retry_after = get_retry_after(
+            _response(429, {'Retry-After': format_datetime(date, usegmt=True)}))
+
+        assert 55 < retry_after <= 60
+
+    @pytest.mark.parametrize('value', [None, '', 'soon'])
+    def test_invalid(self, value):
+
+        headers = {'Retry-After': value} if value is not None else {}
+
+        assert get_retry_after(_response(429, headers)) is None
+
+
+class TestSendRequest(object):
+
+    def test_success(self, buckets):
+
+        session = mock.Mock()
+        session.request.return_value = _response(200)
+        stats = RequestStats()
+
+        response = send_request(session, 'GET', URL, SETTINGS, stats, stream=True)
+
+        assert response.status_code == 200
+        session.request.assert_called_once_with(
+            'GET', URL, stream=True, timeout=10)
+        assert stats.requests == 1
+        assert stats.retries == 0
+
+    def test_retry_after(self, buckets, clock):
+
+        session = mock.Mock()
+        session.request.side_effect = [
+            _response(429, {'Retry-After': '30'}),
+            _response(200),
+        ]
+        stats = RequestStats()
+
+        response = send_request(session, 'GET', URL, SETTINGS, stats)
+
+        assert response.status_code == 200
+        assert stats.requests == 2
+        assert stats.retries == 1
+        assert stats.throttled == 1
+        assert clock.now == pytest.approx(30)
+
+        # Later requests to the host are slowed down
+        assert buckets[('some.dcat.file.rdf', None)].rate == \
+            ratelimit.INITIAL_THROTTLED_RATE / 2 + ratelimit.RATE_INCREASE
+
+    def test_sources_with_different_limits(self, buckets):
+
+        session = mock.Mock()
+        session.request.side_effect = [
+            _response(429), _response(200), _response(200)]
+
+        send_request(session, 'GET', URL, dict(SETTINGS, rate_limit=2))
+        # Another source on the same host, with a different limit
+        send_request(session, 'GET', URL, dict(SETTINGS, rate_limit=5))
+
+        assert sorted(buckets) == [
+            ('some.dcat.file.rdf', 2), ('some.dcat.file.rdf', 5)]
+        # The throttling of the first source is kept
+        assert buckets[('some.dcat.file.rdf', 2)].rate == \
+            pytest.approx(1 + ratelimit.RATE_INCREASE)
+        assert buckets[('some.dcat.file.rdf', 5)].rate == 5
+
+    def test_exponential_backoff(self, buckets, clock):
+
+        session = mock.Mock()
+        session.request.side_effect = [
+            _response(502), _response(504), _response(502), _response(504)]
+        stats = RequestStats()
+
+        response = send_request(session, 'GET', URL, SETTINGS, stats)
+
+        # Gives up after max_retries and returns the last response
+        assert response.status_code == 504
+        assert stats.requests == 4
+        assert stats.retries == 3
+        assert stats.throttled == 0
+        # 1 + 2 + 4 seconds, plus up to 50% of jitter
+        assert 7 <= clock.now <= 10.5
+
+    def test_connection_errors(self, buckets):
+
+        session = mock.Mock()
+        session.request.side_effect = requests.exceptions.ConnectionError()
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            send_request(session, 'GET', URL, dict(SETTINGS, max_retries=1))
+
+        assert session.request.call_count == 2
+
+    def test_other_errors_not_retried(self, buckets):
+
+        session = mock.Mock()
+        session.request.return_value = _response(500)
+
+        response = send_request(session, 'GET', URL, SETTINGS)
+
+        assert response.status_code == 500
+        assert session.request.call_count == 1
+
+
+class TestRequestSettings(object):
+
+    def test_defaults(self):
+
+        assert get_request_settings() == {
+            'rate_limit': 0, 'max_retries': 3, 'timeout': 60}
+
+    @pytest.mark.ckan_config('ckanext.dcat.harvest_max_retries', '5')
+    def test_source_config_overrides(self):
+
+        settings = get_request_settings({'rate_limit': 2, 'timeout': 5})
+
+        assert settings == {'rate_limit': 2, 'max_retries': 5, 'timeout': 5}
+
+    @pytest.mark.parametrize('source_config', [
+        {'rate_limit': -1},
+        {'rate_limit': 'fast'},
+        {'max_retries': 1.5},
+        {'timeout': 0},
+    ])
+    def test_validate_invalid(self, source_config):
+
+        with pytest.raises(ValueError):
+            validate_request_settings(source_config)
+
+    def test_validate_valid(self):
+
+        validate_request_settings(
+            {'rate_limit': 0.5, 'max_retries': 0, 'timeout': 30})
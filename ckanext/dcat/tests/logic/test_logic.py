@@ -3,17 +3,21 @@ try:
     from unittest import mock
 except ImportError:
     import mock
+from urllib.parse import parse_qs, urlparse
+
 import pytest
+from rdflib.namespace import RDF
 
 
-from ckan.plugins import toolkit
+from ckan.plugins import toolkit, PluginImplementations
 
 from ckantoolkit import config
 from ckantoolkit.tests import helpers, factories
 
 
+from ckanext.dcat.interfaces import IDCATURIGenerator
 from ckanext.dcat.logic import _pagination_info
-from ckanext.dcat.processors import RDFParser
+from ckanext.dcat.processors import RDFParser, AS
 
 
 # Custom actions
@@ -65,6 +69,206 @@ def test_dataset_show_without_format():
     assert dcat_dataset['notes'] == dataset['notes']
 
 
+@pytest.mark.usefixtures('with_plugins', 'clean_db')
+def test_catalog_index():
+    org = factories.Organization()
+    dataset1 = factories.Dataset()
+    dataset2 = factories.Dataset(extras=[{'key': 'uri', 'value': 'https://example.org/ds2'}])
+    dataset3 = factories.Dataset()
+    factories.Dataset(private=True, owner_org=org['id'])
+    helpers.call_action('package_delete', id=dataset3['id'])
+
+    result = helpers.call_action('dcat_catalog_index')
+
+    site_url = config.get('ckan.site_url').rstrip('/')
+    assert result['datasets'] == [
+        {
+            'uri': '{}/dataset/{}'.format(site_url, dataset1['id']),
+            'metadata_modified': dataset1['metadata_modified'],
+            'state': 'active',
+        },
+        {
+            'uri': 'https://example.org/ds2',
+            'metadata_modified': dataset2['metadata_modified'],
+            'state': 'active',
+        },
+        {
+            'uri': '{}/dataset/{}'.format(site_url, dataset3['id']),
+            'metadata_modified': helpers.call_action(
+                'package_show', id=dataset3['id'])['metadata_modified'],
+            'state': 'deleted',
+        },
+    ]
+    assert result['next'] is None
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db')
+def test_catalog_index_pagination():
+    datasets = [factories.Dataset() for i in range(5)]
+
+    uris = []
+    cursor = None
+    for page in range(3):
+        result = helpers.call_action('dcat_catalog_index', limit=2, cursor=cursor)
+        uris.extend(d['uri'] for d in result['datasets'])
+        cursor = result['next']
+
+    assert cursor is None
+    assert [uri.split('/')[-1] for uri in uris] == [d['id'] for d in datasets]
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db')
+def test_catalog_index_modified_since():
+    factories.Dataset()
+    dataset2 = factories.Dataset()
+
+    result = helpers.call_action(
+        'dcat_catalog_index', modified_since=dataset2['metadata_modified'])
+
+    assert [d['uri'].split('/')[-1] for d in result['datasets']] == [dataset2['id']]
+
+
+class _NameURIGenerator(object):
+
+    def catalog_uri(self, default_uri):
+        return None
+
+    def dataset_uri(self, dataset_dict, default_uri):
+        doi = [extra['value'] for extra in dataset_dict['extras']
+               if extra['key'] == 'doi'][0]
+        return 'https://example.org/{}/{}/{}'.format(
+            dataset_dict['organization']['name'], dataset_dict['name'], doi)
+
+    def resource_uri(self, resource_dict, default_uri):
+        return None
+
+    def publisher_uri(self, dataset_dict, default_uri):
+        return None
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db')
+def test_catalog_index_uri_generator():
+    org = factories.Organization()
+    dataset = factories.Dataset(
+        owner_org=org['id'], extras=[{'key': 'doi', 'value': '10.1234/5678'}])
+
+    plugin_implementations = PluginImplementations
+
+    def _plugin_implementations(interface):
+        if interface is IDCATURIGenerator:
+            return [_NameURIGenerator()]
+        return plugin_implementations(interface)
+
+    with mock.patch('ckanext.dcat.utils.plugins.PluginImplementations',
+                    side_effect=_plugin_implementations):
+        result = helpers.call_action('dcat_catalog_index')
+        content = helpers.call_action(
+            'dcat_dataset_show', id=dataset['id'], _format='ttl')
+
+    p = RDFParser()
+    p.parse(content, _format='turtle')
+
+    # The same URI as in the RDF serializations
+    uri = 'https://example.org/{}/{}/10.1234/5678'.format(
+        org['name'], dataset['name'])
+    assert [d['uri'] for d in result['datasets']] == [uri]
+    assert [str(s) for s in p._datasets()] == [uri]
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db')
+@pytest.mark.parametrize('params', [
+    {'cursor': 'wrong'},
+    {'limit': 0},
+    {'modified_since': 'wrong_date'},
+])
+def test_catalog_index_wrong_params(params):
+
+    with pytest.raises(toolkit.ValidationError):
+        helpers.call_action('dcat_catalog_index', **params)
+
+
+def _catalog_changes_tombstones():
+    org = factories.Organization()
+    dataset1 = factories.Dataset()
+    dataset2 = factories.Dataset()
+    dataset3 = factories.Dataset(owner_org=org['id'])
+    dataset4 = factories.Dataset(owner_org=org['id'], private=True)
+
+    since = helpers.call_action('package_show', id=dataset2['id'])['metadata_modified']
+
+    helpers.call_action('package_delete', id=dataset1['id'])
+    helpers.call_action('package_patch', id=dataset2['id'], title='Updated title')
+    helpers.call_action('package_patch', id=dataset3['id'], private=True)
+
+    content = helpers.call_action(
+        'dcat_catalog_changes', modified_since=since, format='ttl')
+
+    p = RDFParser()
+    p.parse(content, _format='turtle')
+
+    dcat_datasets = [d for d in p.datasets()]
+
+    assert len(dcat_datasets) == 1
+    assert dcat_datasets[0]['title'] == 'Updated title'
+
+    site_url = config.get('ckan.site_url').rstrip('/')
+    tombstones = sorted(str(t) for t in p.g.subjects(RDF.type, AS.Tombstone))
+
+    return tombstones, [
+        '{}/dataset/{}'.format(site_url, dataset['id'])
+        for dataset in (dataset1, dataset3, dataset4)]
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db', 'clean_index', 'with_request_context')
+def test_catalog_changes():
+
+    tombstones, uris = _catalog_changes_tombstones()
+
+    # Only the deleted dataset, private datasets are not exposed
+    assert tombstones == uris[:1]
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db', 'clean_index', 'with_request_context')
+@pytest.mark.ckan_config('ckanext.dcat.changes_include_private', True)
+def test_catalog_changes_include_private():
+
+    tombstones, uris = _catalog_changes_tombstones()
+
+    # The dataset that was always private is also included, as it was
+    # modified since the date
+    assert tombstones == sorted(uris)
+
+
+@pytest.mark.usefixtures('with_plugins', 'clean_db', 'clean_index', 'with_request_context')
+@pytest.mark.ckan_config('ckanext.dcat.datasets_per_page', 2)
+def test_catalog_changes_pagination():
+    datasets = [factories.Dataset() for i in range(3)]
+    # Deleting a dataset updates its modification date
+    helpers.call_action('package_delete', id=datasets[0]['id'])
+
+    content = helpers.call_action('dcat_catalog_changes', format='ttl')
+
+    p = RDFParser()
+    p.parse(content, _format='turtle')
+
+    assert sorted(d['title'] for d in p.datasets()) == sorted(
+        [datasets[1]['title'], datasets[2]['title']])
+    assert len(list(p.g.subjects(RDF.type, AS.Tombstone))) == 0
+
+    next_page = p.next_page()
+    cursor = parse_qs(urlparse(next_page).query)['cursor'][0]
+
+    content = helpers.call_action('dcat_catalog_changes', format='ttl', cursor=cursor)
+
+    p = RDFParser()
+    p.parse(content, _format='turtle')
+
+    assert list(p.datasets()) == []
+    assert [str(t) for t in p.g.subjects(RDF.type, AS.Tombstone)] == [
+        '{}/dataset/{}'.format(config.get('ckan.site_url').rstrip('/'), datasets[0]['id'])]
+    assert p.next_page() is None
+
+
 # Pagination
 
 @pytest.mark.usefixtures("with_request_context")
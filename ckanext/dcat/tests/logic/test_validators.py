@@ -2,9 +2,14 @@ import datetime
 import json
 
 import pytest
+from dateutil.parser import parse as parse_date
 
 from ckantoolkit import StopOnError, Invalid
-from ckanext.dcat.validators import scheming_multiple_number, dcat_date
+from ckanext.dcat.validators import (
+    scheming_multiple_number,
+    dcat_date,
+    parse_dcat_date,
+)
 
 
 def test_scheming_multiple_number():
@@ -114,3 +119,36 @@ def test_dcat_date_empty_values():
         dcat_date(key, data, errors, {}), value
 
         assert data[key] is None
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("2024", ("gYear", "2024")),
+    ("2024-07", ("gYearMonth", "2024-07")),
+    ("2024-07-01", ("date", "2024-07-01")),
+    ("1905-03-01T10:07:31.182680", ("dateTime", "1905-03-01T10:07:31.182680")),
+    ("2024-04-10T10:07:31", ("dateTime", "2024-04-10T10:07:31")),
+    ("2024-04-10 10:07", ("dateTime", "2024-04-10T10:07:00")),
+    ("2024-04-10T10:07:31.000Z", ("dateTime", "2024-04-10T10:07:31+00:00")),
+    ("2024-04-10T10:07:31.5-0530", ("dateTime", "2024-04-10T10:07:31.500000-05:30")),
+    ("April 10 2024", ("dateTime", "2024-04-10T00:00:00")),
+    ("2024-02-30T10:00:00", (None, None)),
+    ("not_a_date", (None, None)),
+])
+def test_parse_dcat_date(value, expected):
+
+    assert parse_dcat_date(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "2024-04-10T10:07:31.182680",
+    "2024-04-10T10:07:31+02:00",
+    "2024-04-10T10:07Z",
+    "0999-12-31T23:59:59.1",
+])
+def test_parse_dcat_date_same_as_dateutil(value):
+
+    default = datetime.datetime(1, 1, 1, 0, 0, 0)
+
+    assert parse_dcat_date(value) == (
+        "dateTime", parse_date(value, default=default).isoformat()
+    )
@@ -1,10 +1,13 @@
 
+from unittest import mock
+
 import pytest
 
 from rdflib import Graph, URIRef, Literal
 from rdflib.namespace import Namespace
 
-from ckanext.dcat.profiles import RDFProfile, CleanedURIRef
+from ckanext.dcat.profiles import RDFProfile, CleanedURIRef, SubjectView, LOCN
+from ckanext.dcat.profiles.base import _GeometryCache
 
 from ckanext.dcat.tests.profiles.base.test_base_parser import _default_graph
 
@@ -84,6 +87,47 @@ class TestBaseRDFProfile(object):
         assert isinstance(_object, Literal)
         assert str(_object) == 'Test Dataset 1'
 
+    @pytest.mark.parametrize('value,expected', [
+        ('{"type": "Point", "coordinates": [1, 2]}',
+         '{"type": "Point", "coordinates": [1, 2]}'),
+        ('[]', '[]'),
+        ('0', '0'),
+        ('not json', None),
+    ])
+    def test_parse_geodata_geojson(self, value, expected):
+
+        g = Graph()
+        spatial = URIRef('http://example.org/spatial/1')
+        g.add((spatial, LOCN.geometry, Literal(value)))
+
+        p = RDFProfile(g)
+
+        assert p._parse_geodata(spatial, LOCN.geometry, None) == expected
+
+    def test_subject_view(self):
+
+        g = _default_graph()
+        dataset = URIRef('http://example.org/datasets/1')
+
+        view = SubjectView(g, dataset)
+
+        for predicate in g.predicates(dataset, None):
+            assert view.objects(predicate) == list(g.objects(dataset, predicate))
+            assert predicate in view.predicates()
+        assert view.objects(DCT.unknown_property) == []
+
+    def test_objects_with_subject_views(self):
+
+        p = RDFProfile(_default_graph())
+        p._subject_views = {}
+        dataset = URIRef('http://example.org/datasets/1')
+
+        assert str(p._object(dataset, DCT.title)) == 'Test Dataset 1'
+        assert p._object(dataset, DCT.unknown_property) is None
+        assert len(list(p._distributions(dataset))) == 2
+
+        assert list(p._subject_views.keys()) == [dataset]
+
     def test_object_not_found(self):
 
         p = RDFProfile(_default_graph())
@@ -946,3 +990,94 @@ class TestBaseRDFProfile(object):
         assert contact['email'] == 'contact@some.org'
 
         assert contact['identifier'] == 'https://orcid.org/0000-0002-9095-9201'
+
+    def _extras_dict(self):
+
+        return {
+            'name': 'test-dataset',
+            'issued': '2024-01-01',
+            'extras': [
+                {'key': 'dcat_version', 'value': '1.0'},
+                {'key': 'version', 'value': '2.0'},
+                {'key': 'issued', 'value': '2023-01-01'},
+                {'key': 'publisher_name', 'value': 'Publisher'},
+            ],
+        }
+
+    @pytest.mark.parametrize('dict_indexes', [None, {}])
+    def test_get_dict_value(self, dict_indexes):
+
+        p = RDFProfile(Graph())
+        p._dict_indexes = dict_indexes
+
+        _dict = self._extras_dict()
+
+        assert p._get_dict_value(_dict, 'name') == 'test-dataset'
+        # Root level values take precedence
+        assert p._get_dict_value(_dict, 'issued') == '2024-01-01'
+        # First matching extra wins, with or without prefix
+        assert p._get_dict_value(_dict, 'version') == '1.0'
+        assert p._get_dict_value(_dict, 'dcat_version') == '1.0'
+        assert p._get_dict_value(_dict, 'publisher_name') == 'Publisher'
+        assert p._get_dict_value(_dict, 'unknown') is None
+        assert p._get_dict_value(_dict, 'unknown', 'default') == 'default'
+
+    def test_get_dict_value_index_updated(self):
+
+        p = RDFProfile(Graph())
+        p._dict_indexes = {}
+
+        _dict = self._extras_dict()
+
+        assert p._get_dict_value(_dict, 'contact_name') is None
+
+        _dict['extras'].append({'key': 'dcat_contact_name', 'value': 'Contact'})
+
+        assert p._get_dict_value(_dict, 'contact_name') == 'Contact'
+        assert len(p._dict_indexes) == 1
+
+
+class TestGeometryCache(object):
+
+    def test_lru_eviction(self):
+
+        cache = _GeometryCache(2, 100, 100)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        cache.get('a')
+        cache.set('c', 'C')
+
+        assert cache.get('a') == 'A'
+        with pytest.raises(KeyError):
+            cache.get('b')
+
+    def test_total_size(self):
+
+        cache = _GeometryCache(10, 100, 60)
+        cache.set('a', 'x' * 60)
+        cache.set('b', {'wkt': 'x' * 20, 'geojson': 'x' * 20})
+        cache.set('c', None)
+
+        assert cache.size == 100
+
+        cache.set('d', 'x' * 10)
+
+        # The oldest result was evicted to keep the total size
+        assert cache.size == 50
+        with pytest.raises(KeyError):
+            cache.get('a')
+        assert cache.get('c') is None
+
+    def test_big_results_not_cached(self):
+
+        p = RDFProfile(Graph())
+        cache = _GeometryCache(10, 1000, 100)
+        convert = mock.Mock(side_effect=lambda value: value * 2)
+
+        with mock.patch.object(RDFProfile, '_geometry_cache', cache):
+            for i in range(2):
+                assert p._convert_geometry('test', 'x' * 60, convert) == 'x' * 120
+                assert p._convert_geometry('test', 'y' * 10, convert) == 'y' * 20
+
+        assert len(cache) == 1
+        assert convert.call_count == 3
@@ -1,14 +1,18 @@
+import pytest
 
 from ckantoolkit import config
 
-from rdflib import URIRef, Literal
+from rdflib import URIRef, BNode, Literal, ConjunctiveGraph
+from rdflib.plugins.stores.memory import SimpleMemory
+from rdflib.compare import isomorphic
 from rdflib.namespace import Namespace, RDF
 
 from ckanext.dcat.processors import (
     RDFSerializer,
     RDFProfileException,
     DEFAULT_RDF_PROFILES,
-    RDF_PROFILES_CONFIG_OPTION
+    RDF_PROFILES_CONFIG_OPTION,
+    SERIALIZER_GRAPH_BACKEND_CONFIG_OPTION,
 )
 
 from ckanext.dcat.profiles import RDFProfile
@@ -53,6 +57,15 @@ class MockRDFProfile2(RDFProfile):
         self.g.add((dataset_ref, DCAT.keyword, Literal('profile_2')))
 
 
+class MockRDFProfileBNode(RDFProfile):
+
+    def graph_from_dataset(self, dataset_dict, dataset_ref):
+
+        contact = BNode('contact')
+        self.g.add((dataset_ref, DCAT.contactPoint, contact))
+        self.g.add((contact, DCT.title, Literal(dataset_dict['title'])))
+
+
 class TestRDFSerializer(BaseSerializeTest):
 
     def test_default_profile(self):
@@ -115,3 +128,82 @@ class TestRDFSerializer(BaseSerializeTest):
 
         assert self._triples(s.g, None, DCT.description, Literal('Lorem ipsum'))
         assert len(self._triples(s.g, None, DCAT.distribution, None)) == 1
+
+    def test_graph_backend(self):
+
+        s = RDFSerializer()
+        assert s.graph_backend == 'conjunctive'
+        assert isinstance(s.g, ConjunctiveGraph)
+
+        s = RDFSerializer(graph_backend='simple')
+        assert not isinstance(s.g, ConjunctiveGraph)
+        assert isinstance(s.g.store, SimpleMemory)
+
+    @pytest.mark.ckan_config(SERIALIZER_GRAPH_BACKEND_CONFIG_OPTION, 'graph')
+    def test_graph_backend_via_config_option(self):
+
+        s = RDFSerializer()
+
+        assert s.graph_backend == 'graph'
+        assert not isinstance(s.g, ConjunctiveGraph)
+
+    def test_graph_backend_not_found(self):
+
+        with pytest.raises(ValueError):
+            RDFSerializer(graph_backend='not_found')
+
+    def test_serialize_dataset_graph_backends(self):
+
+        s1 = RDFSerializer()
+        s1.serialize_dataset(_default_dict())
+
+        s2 = RDFSerializer(graph_backend='simple')
+        s2.serialize_dataset(_default_dict())
+
+        assert isomorphic(s1.g, s2.g)
+
+    def test_serialize_catalog_with_workers(self):
+
+        dataset_dicts = []
+        for i in range(5):
+            dataset = _default_dict()
+            dataset['id'] = '{}-{}'.format(dataset['id'][:-2], i)
+            dataset['name'] = 'test-dataset-{}'.format(i)
+            dataset['resources'][0]['id'] = '{}-{}'.format(
+                dataset['resources'][0]['id'][:-2], i)
+            dataset_dicts.append(dataset)
+
+        s1 = RDFSerializer()
+        s1.serialize_catalog({}, dataset_dicts, workers=1)
+
+        s2 = RDFSerializer()
+        s2.serialize_catalog({}, dataset_dicts, workers=3)
+
+        assert len(s2.g) == len(s1.g)
+        assert isomorphic(s1.g, s2.g)
+        assert len(self._triples(s2.g, None, DCAT.dataset, None)) == 5
+
+    def test_serialize_catalog_with_workers_blank_nodes(self):
+
+        dataset_dicts = []
+        for i in range(3):
+            dataset = _default_dict()
+            dataset['id'] = '{}-{}'.format(dataset['id'][:-2], i)
+            dataset['title'] = 'Test dataset {}'.format(i)
+            dataset_dicts.append(dataset)
+
+        s1 = RDFSerializer()
+        s1._profiles = [MockRDFProfileBNode]
+        s1.serialize_catalog({}, dataset_dicts, workers=1)
+
+        s2 = RDFSerializer()
+        s2._profiles = [MockRDFProfileBNode]
+        s2.serialize_catalog({}, dataset_dicts, workers=2)
+
+        assert isomorphic(s1.g, s2.g)
+
+        # Labelled blank nodes are shared by all datasets, as when
+        # serializing sequentially
+        contacts = set(s2.g.objects(None, DCAT.contactPoint))
+        assert contacts == {BNode('contact')}
+        assert len(self._triples(s2.g, BNode('contact'), DCT.title, None)) == 3
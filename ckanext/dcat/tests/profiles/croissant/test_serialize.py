@@ -335,6 +335,88 @@ class TestCroissantProfileSerializeDataset(BaseSerializeTest):
                 g, recordset_ref, CR.key, URIRef(f"{resource_id}/records/name")
             )
 
+    def _recordset_dataset_dict(self, resource_ids):
+        return {
+            "id": str(uuid.uuid4()),
+            "name": "test-dataset",
+            "title": "Test Dataset",
+            "resources": [
+                {
+                    "id": resource_id,
+                    "url": "http://example.com/data.csv",
+                    "datastore_active": True,
+                }
+                for resource_id in resource_ids
+            ],
+        }
+
+    def test_graph_from_dataset_with_recordset_batched_fields(self):
+
+        resource_ids = [str(uuid.uuid4()) for i in range(3)]
+
+        subresource_id = str(uuid.uuid4())
+
+        dataset_dict = self._recordset_dataset_dict(resource_ids)
+        dataset_dict["resources"][0]["subresources"] = [
+            {"id": subresource_id, "datastore_active": True}
+        ]
+
+        fields = {
+            resource_id: [
+                {"id": "name", "type": "text", "schema": {"is_index": True}}
+            ]
+            for resource_id in resource_ids + [subresource_id]
+        }
+
+        with mock.patch(
+            "ckanext.dcat.profiles.croissant._query_datastore_fields",
+            return_value=fields,
+        ) as mock_query, mock.patch(
+            "ckanext.dcat.profiles.croissant.get_action"
+        ) as mock_get_action:
+
+            s = RDFSerializer(profiles=["croissant"])
+            dataset_ref = s.graph_from_dataset(dataset_dict)
+
+            assert len(list(s.g.objects(dataset_ref, CR.recordSet))) == 4
+
+            # All resources and subresources were queried at once
+            mock_query.assert_called_once_with(
+                [resource_ids[0], subresource_id] + resource_ids[1:]
+            )
+            mock_get_action.assert_not_called()
+
+    def test_graph_from_dataset_with_recordset_datastore_info_fallback(self):
+
+        resource_ids = [str(uuid.uuid4()) for i in range(3)]
+
+        dataset_dict = self._recordset_dataset_dict(resource_ids)
+
+        mock_datastore_info = mock.Mock(
+            return_value={
+                "fields": [
+                    {"id": "name", "type": "text", "schema": {"is_index": True}}
+                ]
+            }
+        )
+
+        with mock.patch(
+            "ckanext.dcat.profiles.croissant._query_datastore_fields",
+            return_value=None,
+        ), mock.patch(
+            "ckanext.dcat.profiles.croissant.get_action"
+        ) as mock_get_action:
+            mock_get_action.return_value = mock_datastore_info
+
+            for i in range(2):
+                s = RDFSerializer(profiles=["croissant"])
+                dataset_ref = s.graph_from_dataset(dataset_dict)
+
+                assert len(list(s.g.objects(dataset_ref, CR.recordSet))) == 3
+
+            # Fields are not cached across serializations
+            assert mock_datastore_info.call_count == 6
+
     @pytest.mark.usefixtures("with_plugins", "clean_db")
     def test_graph_from_dataset_org_fallback(self):
 
@@ -8,10 +8,12 @@ except ImportError:
     pass
 
 import pytest
+from pyld import jsonld
 
 from ckan.tests.helpers import call_action
 
-from ckanext.dcat.helpers import croissant
+from ckanext.dcat.helpers import croissant, _compiled_frame
+from ckanext.dcat.profiles.croissant import JSONLD_CONTEXT
 from ckanext.dcat.tests.utils import get_file_contents
 
 
@@ -64,3 +66,26 @@ def test_valid_output_with_recordset():
             mlc.Dataset(croissant_dict)
         except mlc.ValidationError as exception:
             raise
+
+
+def test_compiled_frame_is_reused():
+
+    frame, options = _compiled_frame(JSONLD_CONTEXT, "sc:Dataset")
+
+    assert frame == {"@context": JSONLD_CONTEXT, "@type": "sc:Dataset"}
+    assert _compiled_frame(dict(JSONLD_CONTEXT), "sc:Dataset")[0] is frame
+
+
+def test_framing_does_not_load_remote_contexts():
+
+    dataset_dict = json.loads(
+        get_file_contents("ckan/ckan_full_dataset_croissant.json")
+    )
+
+    with mock.patch("requests.get") as mock_get:
+        with pytest.raises(jsonld.JsonLdError):
+            croissant(
+                dataset_dict, jsonld_context=["https://example.org/context.jsonld"]
+            )
+
+        mock_get.assert_not_called()
@@ -1,6 +1,8 @@
 import json
+import math
 import uuid
 from decimal import Decimal
+from unittest import mock
 
 import pytest
 
@@ -15,11 +17,11 @@ from geomet import wkt
 from ckantoolkit.tests import helpers, factories
 
 from ckanext.dcat import utils
-from ckanext.dcat.processors import RDFSerializer, HYDRA
+from ckanext.dcat.processors import RDFSerializer, HYDRA, AS
 from ckanext.dcat.profiles import (
     DCAT, DCT, ADMS, XSD, VCARD, FOAF, SCHEMA,
     SKOS, LOCN, GSP, OWL, SPDX, GEOJSON_IMT,
-    RDFS,
+    RDFS, RDFProfile,
 )
 from ckanext.dcat.profiles.euro_dcat_ap_base import DISTRIBUTION_LICENSE_FALLBACK_CONFIG
 from ckanext.dcat.utils import DCAT_EXPOSE_SUBCATALOGS
@@ -585,6 +587,105 @@ class TestEuroDCATAPProfileSerializeDataset(BaseSerializeTest):
 
         assert len([t for t in g.triples((spatial, LOCN.geometry, None))]) == 0
 
+    def _large_polygon_dataset(self, vertices=1000):
+        ring = [
+            [round(math.cos(2 * math.pi * i / vertices), 4),
+             round(math.sin(2 * math.pi * i / vertices), 4)]
+            for i in range(vertices)
+        ]
+        ring.append(ring[0])
+
+        return {
+            'id': '4b6fe9ca-dc77-4cec-92a4-55c6624a5bd6',
+            'name': 'test-dataset',
+            'extras': [
+                {'key': 'spatial', 'value': json.dumps(
+                    {'type': 'Polygon', 'coordinates': [ring]})},
+            ]
+        }
+
+    @pytest.mark.ckan_config('ckanext.dcat.output_spatial_max_vertices', '100')
+    def test_spatial_large_geometry_bbox(self):
+
+        s = RDFSerializer(profiles=['euro_dcat_ap'])
+        g = s.g
+
+        dataset_ref = s.graph_from_dataset(self._large_polygon_dataset())
+
+        spatial = self._triple(g, dataset_ref, DCT.spatial, None)[2]
+        geometry = self._triple(g, spatial, LOCN.geometry, None)[2]
+
+        assert str(geometry) == (
+            'POLYGON ((-1.0000 -1.0000, 1.0000 -1.0000, 1.0000 1.0000, '
+            '-1.0000 1.0000, -1.0000 -1.0000))'
+        )
+
+    @pytest.mark.ckan_config('ckanext.dcat.output_spatial_format', 'geojson')
+    @pytest.mark.ckan_config('ckanext.dcat.output_spatial_max_vertices', '100')
+    @pytest.mark.ckan_config('ckanext.dcat.output_spatial_large_geometries', 'simplify')
+    def test_spatial_large_geometry_simplify(self):
+
+        s = RDFSerializer(profiles=['euro_dcat_ap'])
+        g = s.g
+
+        dataset_ref = s.graph_from_dataset(self._large_polygon_dataset())
+
+        spatial = self._triple(g, dataset_ref, DCT.spatial, None)[2]
+        geometry = json.loads(
+            str(self._triple(g, spatial, LOCN.geometry, None)[2]))
+
+        ring = geometry['coordinates'][0]
+        assert geometry['type'] == 'Polygon'
+        assert len(ring) <= 101
+        assert ring[0] == ring[-1] == [1.0, 0.0]
+
+    @pytest.mark.ckan_config('ckanext.dcat.output_spatial_max_vertices', '100')
+    @pytest.mark.ckan_config('ckanext.dcat.output_spatial_large_geometries', 'hull')
+    def test_spatial_large_geometry_unknown_mode(self):
+
+        s = RDFSerializer(profiles=['euro_dcat_ap'])
+
+        with pytest.raises(ValueError):
+            s.graph_from_dataset(self._large_polygon_dataset())
+
+    @pytest.mark.parametrize('output_format', ['wkt', 'geojson', 'wkt geojson'])
+    def test_spatial_geometry_parsed_once(self, output_format):
+
+        dataset = self._large_polygon_dataset()
+
+        RDFProfile._geometry_cache.clear()
+
+        with helpers.changed_config(
+            'ckanext.dcat.output_spatial_format', output_format
+        ), mock.patch(
+            'ckanext.dcat.profiles.base.limit_geometry_vertices',
+            side_effect=lambda geometry, *args: geometry,
+        ) as mock_limit:
+            s = RDFSerializer(profiles=['euro_dcat_ap'])
+            dataset_ref = s.graph_from_dataset(dataset)
+
+            mock_limit.assert_called_once()
+
+        spatial = self._triple(s.g, dataset_ref, DCT.spatial, None)[2]
+        geometries = list(s.g.objects(spatial, LOCN.geometry))
+        assert len(geometries) == len(output_format.split())
+
+    def test_spatial_geometry_conversion_cached(self):
+
+        dataset = self._large_polygon_dataset()
+
+        s = RDFSerializer(profiles=['euro_dcat_ap'])
+        s.graph_from_dataset(dataset)
+
+        with mock.patch('ckanext.dcat.profiles.base.wkt.dumps') as mock_dumps:
+            s = RDFSerializer(profiles=['euro_dcat_ap'])
+            dataset_ref = s.graph_from_dataset(dataset)
+
+            mock_dumps.assert_not_called()
+
+        spatial = self._triple(s.g, dataset_ref, DCT.spatial, None)[2]
+        assert self._triple(s.g, spatial, LOCN.geometry, None)
+
     def test_distributions(self):
 
         dataset = {
@@ -1283,6 +1384,36 @@ class TestEuroDCATAPProfileSerializeCatalog(BaseSerializeTest):
         assert len(dataset_title) == 1
         assert str(dataset_title[0]) == dataset['title']
 
+    def test_catalog_prefetch_organizations(self):
+        org = factories.Organization(title='Prefetched Publisher')
+        datasets = [
+            {
+                'id': str(uuid.uuid4()),
+                'name': 'test-dataset-{}'.format(i),
+                'title': 'test dataset',
+                'organization': {
+                    'id': org['id'],
+                    'name': org['name'],
+                    'title': org['title'],
+                }
+            }
+            for i in range(3)
+        ]
+
+        s = RDFSerializer(profiles=['euro_dcat_ap'])
+        g = s.g
+
+        with mock.patch('ckanext.dcat.profiles.euro_dcat_ap_base.toolkit.get_action') as mock_get_action:
+            s.serialize_catalog({}, dataset_dicts=datasets)
+
+            # organization_show was not called, the details were prefetched
+            mock_get_action.assert_not_called()
+
+        for dataset in datasets:
+            dataset_ref = URIRef(utils.dataset_uri(dataset))
+            publisher = self._triple(g, dataset_ref, DCT.publisher, None)[2]
+            assert self._triple(g, publisher, FOAF.name, org['title'])
+
     def test_catalog_pagination(self):
         dataset = {
             'id': '4b6fe9ca-dc77-4cec-92a4-55c6624a5bd6',
@@ -1354,6 +1485,35 @@ class TestEuroDCATAPProfileSerializeCatalog(BaseSerializeTest):
         assert len(items_per_page) == 1
         assert str(items_per_page[0]) == "5"
 
+    def test_catalog_tombstones(self):
+        dataset = {
+            'id': '4b6fe9ca-dc77-4cec-92a4-55c6624a5bd6',
+            'name': 'test-dataset',
+            'title': 'test dataset',
+        }
+        tombstones = [
+            {'uri': 'http://example.com/dataset/deleted-1', 'deleted': '2024-01-01T10:00:00'},
+            {'uri': 'http://example.com/dataset/deleted-2', 'deleted': '2024-01-02T10:00:00'},
+        ]
+
+        s = RDFSerializer(profiles=['euro_dcat_ap'])
+        g = s.g
+
+        s.serialize_catalog({}, dataset_dicts=[dataset], tombstones=tombstones)
+
+        assert len(list(g.subjects(RDF.type, DCAT.Dataset))) == 1
+        assert sorted(str(t) for t in g.subjects(RDF.type, AS.Tombstone)) == [
+            'http://example.com/dataset/deleted-1',
+            'http://example.com/dataset/deleted-2',
+        ]
+
+        tombstone = URIRef('http://example.com/dataset/deleted-1')
+        assert self._triple(g, tombstone, AS.formerType, DCAT.Dataset)
+        assert self._triple(g, tombstone, AS.deleted, '2024-01-01T10:00:00', XSD.dateTime)
+
+        # Tombstones are not linked to the catalog
+        assert len(list(g.objects(None, DCAT.dataset))) == 1
+
     @pytest.mark.ckan_config(DISTRIBUTION_LICENSE_FALLBACK_CONFIG, 'true')
     def test_set_missing_license_for_resource(self):
         ''' Check the behavior if param in config is set: Add license_id to the resource'''
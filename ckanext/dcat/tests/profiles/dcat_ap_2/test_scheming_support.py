@@ -7,10 +7,12 @@ from rdflib.namespace import RDF
 from rdflib.term import URIRef
 from geomet import wkt
 
+from ckan import plugins
 from ckan.tests import factories
 from ckan.tests.helpers import call_action
 
 from ckanext.dcat import utils
+from ckanext.dcat.plugins import _get_index_plan
 from ckanext.dcat.processors import RDFSerializer, RDFParser
 from ckanext.dcat.profiles import (
     DCAT,
@@ -1114,3 +1116,38 @@ class TestSchemingIndexFields:
             assert search_dict["spatial"] == json.dumps(
                 dataset_dict["spatial_coverage"][0]["centroid"]
             )
+
+    def test_index_plan_computed_once_per_schema(self):
+
+        schema = call_action("scheming_dataset_schema_show", type="dataset")
+
+        plan = _get_index_plan("dataset", schema)
+
+        contact = [p for p in plan if p[0] == "contact"][0]
+        assert contact[1]["name"] == "extras_contact__name"
+        assert contact[1]["email"] == "extras_contact__email"
+        assert "spatial_coverage" in [p[0] for p in plan]
+        assert "title" not in [p[0] for p in plan]
+
+        assert _get_index_plan("dataset", schema) is plan
+
+        other_schema = dict(schema)
+        assert _get_index_plan("dataset", other_schema) is not plan
+
+    def test_repeating_subfields_index_json_string(self):
+
+        dataset_dict = {
+            "type": "dataset",
+            "contact": json.dumps([
+                {"name": "Contact 1", "email": "contact1@example.org"},
+                {"name": "Contact 2"},
+            ]),
+            "extras_contact__name": "Contact 0",
+        }
+
+        plugin = plugins.get_plugin("dcat")
+        search_dict = plugin.before_dataset_index(dataset_dict)
+
+        assert "contact" not in search_dict
+        assert search_dict["extras_contact__name"] == "Contact 0 Contact 1 Contact 2"
+        assert search_dict["extras_contact__email"] == "contact1@example.org"
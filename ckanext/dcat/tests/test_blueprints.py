@@ -10,13 +10,14 @@ import pytest
 from ckan import plugins as p
 
 from rdflib import Graph, ConjunctiveGraph, URIRef
+from rdflib.namespace import OWL
 from ckantoolkit import url_for
-from ckantoolkit.tests import factories
+from ckantoolkit.tests import helpers, factories
 
 from ckanext.dcat.utils import dataset_uri
 from ckanext.dcat.processors import RDFParser
-from ckanext.dcat.profiles import RDF, DCAT
-from ckanext.dcat.processors import HYDRA
+from ckanext.dcat.profiles import RDF, DCAT, DCT
+from ckanext.dcat.processors import HYDRA, AS
 
 
 def _sort_query_params(url):
@@ -444,6 +445,102 @@ class TestEndpoints:
             )
         )
 
+    def test_catalog_index_jsonl(self, app):
+
+        datasets = [factories.Dataset() for i in range(3)]
+
+        url = url_for("dcat.read_catalog_index", _format="jsonl")
+
+        response = app.get(url)
+
+        assert response.headers["Content-Type"].startswith("application/jsonl")
+        assert "Link" not in response.headers
+
+        lines = [json.loads(line) for line in response.body.splitlines()]
+
+        assert [line["uri"] for line in lines] == [
+            dataset_uri(dataset) for dataset in datasets
+        ]
+        assert lines[0]["state"] == "active"
+        assert lines[0]["metadata_modified"] == datasets[0]["metadata_modified"]
+
+    def test_catalog_index_ntriples(self, app):
+
+        datasets = [factories.Dataset() for i in range(3)]
+        # Deleting a dataset updates its modification date
+        helpers.call_action("package_delete", id=datasets[0]["id"])
+
+        url = url_for("dcat.read_catalog_index", _format="nt", limit=2)
+
+        response = app.get(url)
+
+        assert response.headers["Content-Type"].startswith("application/n-triples")
+
+        g = Graph()
+        g.parse(data=response.body, format="nt")
+
+        assert len(set(g.subjects(DCT.modified, None))) == 2
+        assert (URIRef(dataset_uri(datasets[1])), DCT.modified, None) in g
+        assert (None, OWL.deprecated, None) not in g
+
+        pagination = next(g.subjects(RDF.type, HYDRA.PagedCollection))
+        next_url = str(g.value(pagination, HYDRA.next))
+
+        assert response.headers["Link"] == '<{}>; rel="next"'.format(next_url)
+
+        next_url = urlparse(next_url)
+        response = app.get(next_url.path + "?" + next_url.query)
+
+        g = Graph()
+        g.parse(data=response.body, format="nt")
+
+        assert list(g.subjects(DCT.modified, None)) == [
+            URIRef(dataset_uri(datasets[0]))
+        ]
+        assert g.value(URIRef(dataset_uri(datasets[0])), OWL.deprecated).toPython() is True
+
+    def test_catalog_index_wrong_params(self, app):
+
+        url = url_for("dcat.read_catalog_index", _format="jsonl", cursor="wrong")
+
+        app.get(url, status=409)
+
+        url = url_for("dcat.read_catalog_index", _format="ttl")
+
+        app.get(url, status=404)
+
+    def test_catalog_changes(self, app):
+
+        dataset1 = factories.Dataset()
+        dataset2 = factories.Dataset()
+        helpers.call_action("package_delete", id=dataset1["id"])
+
+        url = url_for("dcat.read_catalog_changes", _format="ttl")
+
+        response = app.get(url)
+
+        assert response.headers["Content-Type"] == "text/turtle"
+
+        g = Graph()
+        g.parse(data=response.body, format="turtle")
+
+        assert list(g.subjects(RDF.type, DCAT.Dataset)) == [
+            URIRef(dataset_uri(dataset2))
+        ]
+        assert list(g.subjects(RDF.type, AS.Tombstone)) == [
+            URIRef(dataset_uri(dataset1))
+        ]
+
+    def test_catalog_changes_wrong_params(self, app):
+
+        url = url_for("dcat.read_catalog_changes", _format="ttl", cursor="wrong")
+
+        app.get(url, status=409)
+
+        url = url_for("dcat.read_catalog_changes", _format="jsonl")
+
+        app.get(url, status=404)
+
     def test_catalog_profiles_not_found(self, app):
 
         url = url_for("dcat.read_catalog", _format="jsonld", profiles="nope")
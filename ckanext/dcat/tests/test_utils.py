@@ -1,3 +1,6 @@
+from unittest import mock
+
+from ckanext.dcat import utils
 from ckanext.dcat.utils import parse_accept_header
 
 
@@ -120,3 +123,40 @@ def test_accept_header_html_multiple():
     _format = parse_accept_header(header)
 
     assert _format is None
+
+
+@mock.patch("ckanext.dcat.utils._field_labels_cache", {})
+@mock.patch("ckanext.dcat.utils.h")
+def test_field_labels_cached_per_locale(mock_h):
+
+    with mock.patch(
+        "ckanext.dcat.utils._translated_field_labels",
+        side_effect=lambda: {"uri": "URI"},
+    ) as mock_labels:
+
+        mock_h.lang.return_value = "en"
+        labels = utils.field_labels()
+        assert utils.field_labels() is labels
+        assert mock_labels.call_count == 1
+
+        mock_h.lang.return_value = "es"
+        assert utils.field_labels() is not labels
+        assert mock_labels.call_count == 2
+
+
+@mock.patch("ckanext.dcat.utils._field_labels_cache", {})
+@mock.patch("ckanext.dcat.utils.h")
+def test_field_labels_not_cached_outside_request(mock_h):
+
+    mock_h.lang.side_effect = RuntimeError
+
+    with mock.patch(
+        "ckanext.dcat.utils._translated_field_labels",
+        return_value={"uri": "URI"},
+    ) as mock_labels:
+
+        utils.field_labels()
+        utils.field_labels()
+
+        assert mock_labels.call_count == 2
+        assert utils._field_labels_cache == {}
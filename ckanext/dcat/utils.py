@@ -4,8 +4,12 @@ import logging
 import uuid
 import simplejson as json
 import re
+import threading
 import operator
+from urllib.parse import urlencode
 
+from rdflib import URIRef, Literal
+from rdflib.namespace import OWL, RDF, XSD
 
 from ckantoolkit import config, h
 
@@ -38,6 +42,13 @@ CONTENT_TYPES = {
 DCAT_CLEAN_TAGS = 'ckanext.dcat.clean_tags'
 
 DEFAULT_CATALOG_ENDPOINT = '/catalog.{_format}'
+CATALOG_INDEX_ENDPOINT = '/catalog/index.<_format>'
+CATALOG_CHANGES_ENDPOINT = '/catalog/changes.<_format>'
+
+CATALOG_INDEX_CONTENT_TYPES = {
+    'jsonl': 'application/jsonl',
+    'nt': 'application/n-triples',
+}
 ENABLE_CONTENT_NEGOTIATION_CONFIG = 'ckanext.dcat.enable_content_negotiation'
 
 
@@ -52,11 +63,38 @@ def _get_package_type(id):
     return None
 
 
+# Translated field labels per locale
+_field_labels_cache = {}
+_field_labels_lock = threading.Lock()
+
+
 def field_labels():
     '''
     Returns a dict with the user friendly translatable field labels that
     can be used in the frontend.
+
+    The labels are translated once per locale and cached, so the returned
+    dict is shared and should not be modified.
     '''
+    try:
+        locale = h.lang()
+    except (RuntimeError, HelperError):
+        # Outside a request, don't cache
+        locale = None
+
+    if locale:
+        with _field_labels_lock:
+            labels = _field_labels_cache.get(locale)
+        if labels is None:
+            labels = _translated_field_labels()
+            with _field_labels_lock:
+                labels = _field_labels_cache.setdefault(locale, labels)
+        return labels
+
+    return _translated_field_labels()
+
+
+def _translated_field_labels():
 
     return {
         'uri': _('URI'),
@@ -450,3 +488,101 @@ def read_catalog_page(_format):
     response.headers['Content-type'] = CONTENT_TYPES[_format]
 
     return response
+
+
+def read_catalog_changes_page(_format):
+    if _format not in CONTENT_TYPES:
+        return toolkit.abort(404)
+
+    _profiles = toolkit.request.args.get('profiles')
+    if _profiles:
+        _profiles = _profiles.split(',')
+
+    data_dict = {
+        'modified_since': toolkit.request.args.get('modified_since'),
+        'cursor': toolkit.request.args.get('cursor'),
+        'format': _format,
+        'profiles': _profiles,
+    }
+
+    try:
+        response = toolkit.get_action('dcat_catalog_changes')({}, data_dict)
+    except (toolkit.ValidationError, RDFProfileException) as e:
+        toolkit.abort(409, str(e))
+
+    from flask import make_response
+    response = make_response(response)
+    response.headers['Content-type'] = CONTENT_TYPES[_format]
+
+    return response
+
+
+def _catalog_index_jsonl(datasets):
+    for dataset in datasets:
+        yield json.dumps(dataset) + '\n'
+
+
+def _catalog_index_ntriples(datasets, page_url, next_url):
+    '''
+    Yields the N-Triples lines of a catalog index page: the `dct:modified`
+    date of each dataset and `owl:deprecated true` for the deleted ones,
+    plus Hydra pagination triples if there is a next page
+    '''
+    from ckanext.dcat.processors import HYDRA
+    from ckanext.dcat.profiles import DCT
+
+    def triple(s, p, o):
+        return '{0} {1} {2} .\n'.format(s.n3(), p.n3(), o.n3())
+
+    for dataset in datasets:
+        uri = URIRef(dataset['uri'])
+        try:
+            uri.n3()
+        except Exception:
+            # rdflib refuses to serialize invalid URIs
+            log.warning('Invalid dataset URI in catalog index: %s', uri)
+            continue
+        yield triple(uri, DCT.modified, Literal(
+            dataset['metadata_modified'], datatype=XSD.dateTime))
+        if dataset['state'] == 'deleted':
+            yield triple(uri, OWL.deprecated, Literal(True))
+
+    if next_url:
+        yield triple(URIRef(page_url), RDF.type, HYDRA.PagedCollection)
+        yield triple(URIRef(page_url), HYDRA.next, URIRef(next_url))
+
+
+def read_catalog_index_page(_format):
+    from flask import Response
+
+    if _format not in CATALOG_INDEX_CONTENT_TYPES:
+        return toolkit.abort(404)
+
+    params = dict(
+        (key, toolkit.request.args.get(key))
+        for key in ('modified_since', 'limit', 'cursor')
+        if toolkit.request.args.get(key))
+
+    try:
+        result = toolkit.get_action('dcat_catalog_index')({}, params)
+    except toolkit.ValidationError as e:
+        return toolkit.abort(409, str(e))
+
+    base_url = catalog_uri().rstrip('/') + toolkit.request.path
+    page_url = base_url + ('?' + urlencode(params) if params else '')
+    next_url = None
+    if result['next']:
+        params['cursor'] = result['next']
+        next_url = base_url + '?' + urlencode(params)
+
+    if _format == 'nt':
+        output = _catalog_index_ntriples(
+            result['datasets'], page_url, next_url)
+    else:
+        output = _catalog_index_jsonl(result['datasets'])
+
+    response = Response(output, mimetype=CATALOG_INDEX_CONTENT_TYPES[_format])
+    if next_url:
+        response.headers['Link'] = '<{0}>; rel="next"'.format(next_url)
+
+    return response
@@ -1,6 +1,7 @@
 import datetime
 import json
 import re
+from functools import lru_cache
 
 from dateutil.parser import parse as parse_date
 from ckantoolkit import (
@@ -32,6 +33,19 @@ regexp_xsd_date = re.compile(
 )
 
 
+# Common ISO 8601 date and time values (eg `2024-04-10T10:07:31.182680`), which
+# can be parsed without falling back to dateutil
+regexp_iso_datetime = re.compile(
+    r"([0-9]{4})-([0-9]{2})-([0-9]{2})[T ]([0-9]{2}):([0-9]{2})"
+    r"(?::([0-9]{2})(?:\.([0-9]{1,6}))?)?(Z|[+-][0-9]{2}:?[0-9]{2})?"
+)
+
+# Number of recently parsed date strings to keep in memory
+DATE_CACHE_SIZE = 4096
+
+DEFAULT_DATETIME = datetime.datetime(1, 1, 1, 0, 0, 0)
+
+
 def is_year(value):
     return regexp_xsd_year.fullmatch(value)
 
@@ -44,6 +58,78 @@ def is_date(value):
     return regexp_xsd_date.fullmatch(value)
 
 
+def _parse_iso_datetime(value):
+    """
+    Returns a datetime object for the most common ISO 8601 date and time
+    values, or None if the value needs to be parsed with dateutil
+    """
+    match = regexp_iso_datetime.fullmatch(value)
+    if not match:
+        return None
+
+    year, month, day, hour, minute, second, fraction, tz = match.groups()
+
+    tzinfo = None
+    if tz == "Z":
+        tzinfo = datetime.timezone.utc
+    elif tz:
+        sign = -1 if tz[0] == "-" else 1
+        tz = tz[1:].replace(":", "")
+        offset = datetime.timedelta(hours=int(tz[:2]), minutes=int(tz[2:]))
+        try:
+            tzinfo = datetime.timezone(sign * offset)
+        except ValueError:
+            return None
+
+    try:
+        return datetime.datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour),
+            int(minute),
+            int(second or 0),
+            int((fraction or "0").ljust(6, "0")),
+            tzinfo=tzinfo,
+        )
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_dcat_date(value):
+    """
+    Returns a tuple with the XSD type and the value to use for a date string
+
+    The type is one of `gYear`, `gYearMonth`, `date` or `dateTime`. Years,
+    year-months and dates are returned as they are, other values are
+    parsed and returned as an ISO 8601 date and time string. Common ISO 8601
+    values are parsed directly, anything else is parsed with dateutil.
+
+    If the value is not a valid date, `(None, None)` is returned.
+
+    Results are cached for the most recently used values, as the same
+    dates tend to be repeated a lot (eg `metadata_modified` values in a
+    catalog page).
+    """
+    _datetime = _parse_iso_datetime(value)
+    if _datetime:
+        return "dateTime", _datetime.isoformat()
+
+    if is_year(value):
+        return "gYear", value
+    elif is_year_month(value):
+        return "gYearMonth", value
+    elif is_date(value):
+        return "date", value
+
+    try:
+        _datetime = parse_date(value, default=DEFAULT_DATETIME)
+        return "dateTime", _datetime.isoformat()
+    except ValueError:
+        return None, None
+
+
 def dcat_date(key, data, errors, context):
     value = data[key]
 
@@ -54,15 +140,13 @@ def dcat_date(key, data, errors, context):
     if isinstance(value, datetime.datetime):
         return
 
-    try:
-        if is_year(value) or is_year_month(value) or is_date(value):
-            return
-    except TypeError:
+    if not isinstance(value, str):
         raise Invalid(_("Dates must be provided as strings or datetime objects"))
 
-    try:
-        parse_date(value)
-    except ValueError:
+    xsd_type, _value = parse_dcat_date(value)
+    if xsd_type in ("gYear", "gYearMonth", "date"):
+        return
+    elif not xsd_type:
         raise Invalid(
             _(
                 "Date format incorrect. Supported formats are YYYY, YYYY-MM, YYYY-MM-DD and YYYY-MM-DDTHH:MM:SS"